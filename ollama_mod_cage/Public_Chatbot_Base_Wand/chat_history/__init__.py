@@ -1,2 +1,5 @@
 #__init__.py
-from .json_chat_history import json_chat_history
\ No newline at end of file
+from .json_chat_history import json_chat_history
+from .conversation_memory import conversation_memory
+from .jsonl_conversation_store import jsonl_conversation_store
+from .conversation_search_index import conversation_search_index
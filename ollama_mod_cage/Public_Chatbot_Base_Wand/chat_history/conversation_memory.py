@@ -0,0 +1,222 @@
+""" conversation_memory.py
+
+        A class for keeping the multi turn chat_history inside the context window of the model. The
+    token count of the history is estimated locally from its utf-8 length instead of running a
+    tokenizer, and the budget is the model's num_ctx less room for the response. Once the history
+    passes the budget the oldest turns are dropped in one go, down to low_water_ratio of the budget,
+    and folded into a short extractive summary kept right after the system prompt. Between trims
+    every turn only appends to the history, so the messages sent to ollama start with the same
+    prefix turn after turn and the ollama kv cache of that prefix is reused instead of prefilled.
+"""
+
+import re
+import threading
+
+# -------------------------------------------------------------------------------------------------
+class conversation_memory:
+    """ a class for fitting the chat history to a per model token budget
+    """
+    # ollama's context size when the modelfile does not set num_ctx
+    DEFAULT_CONTEXT_TOKENS = 2048
+    # role & template tokens around every message
+    MESSAGE_OVERHEAD_TOKENS = 4
+    SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, ollama_client_manager_instance=None, context_tokens=None, response_reserve_ratio=0.25,
+                 low_water_ratio=0.6, summary_ratio=0.15, summary_sentence_chars=160):
+        """a method for initializing the class
+            args: ollama_client_manager_instance, to read num_ctx of each model, context_tokens,
+                overrides num_ctx for every model when above 0, response_reserve_ratio, of the context
+                kept for the response, low_water_ratio, of the budget left after a trim, summary_ratio,
+                of the budget the summary may use, summary_sentence_chars, per summarized message
+        """
+        self.ollama_client_manager_instance = ollama_client_manager_instance
+        self.context_tokens = int(context_tokens or 0) or None
+        self.response_reserve_ratio = response_reserve_ratio
+        self.low_water_ratio = low_water_ratio
+        self.summary_ratio = summary_ratio
+        self.summary_sentence_chars = summary_sentence_chars
+
+        # model name -> num_ctx, read once per model
+        self.model_context_tokens = {}
+        self.context_lock = threading.Lock()
+
+        # the summary message is rebuilt only when turns are trimmed
+        self.summary_lines = []
+        self.summary_message = None
+
+        self.stats = {"trims": 0, "turns_trimmed": 0, "history_tokens": 0, "budget_tokens": 0}
+
+    # -------------------------------------------------------------------------------------------------
+    def estimate_tokens(self, text):
+        """ a method for estimating the token count of a text, about 4 bytes of utf-8 per token for
+        the llama & mistral tokenizers on english text
+            args: text
+            returns: token estimate
+        """
+        return (len(text.encode("utf-8")) + 3) // 4
+
+    # -------------------------------------------------------------------------------------------------
+    def estimate_message_tokens(self, message):
+        """ a method for estimating the token count of a chat message
+            args: message dict
+            returns: token estimate
+        """
+        return self.estimate_tokens(message.get("content") or "") + self.MESSAGE_OVERHEAD_TOKENS
+
+    # -------------------------------------------------------------------------------------------------
+    def get_context_tokens(self, model_name):
+        """ a method for getting the context size of a model, from num_ctx in its modelfile parameters
+            args: model_name
+            returns: context_tokens
+        """
+        if self.context_tokens is not None:
+            return self.context_tokens
+        with self.context_lock:
+            if model_name not in self.model_context_tokens:
+                context_tokens = self.DEFAULT_CONTEXT_TOKENS
+                try:
+                    if self.ollama_client_manager_instance is not None:
+                        modelfile_data = self.ollama_client_manager_instance.show(model_name)
+                        match = re.search(r"num_ctx\s+(\d+)", modelfile_data.get("parameters") or "")
+                        if match:
+                            context_tokens = int(match.group(1))
+                except Exception as e:
+                    print(f"Failed to read the context size of {model_name}. Reason: {e}")
+                self.model_context_tokens[model_name] = context_tokens
+            return self.model_context_tokens[model_name]
+
+    # -------------------------------------------------------------------------------------------------
+    def get_budget_tokens(self, model_name):
+        """ a method for getting the tokens the history may use, the rest is kept for the response
+            args: model_name
+            returns: budget_tokens
+        """
+        return int(self.get_context_tokens(model_name) * (1.0 - self.response_reserve_ratio))
+
+    # -------------------------------------------------------------------------------------------------
+    def fit(self, chat_history, model_name, next_message=None):
+        """ a method for fitting the chat history to the budget of the model before the next prompt,
+        the same list is returned until a trim is needed so the prefix stays the same
+            args: chat_history, model_name, next_message, the message about to be appended
+            returns: chat_history
+        """
+        budget_tokens = self.get_budget_tokens(model_name)
+        history_tokens = sum(self.estimate_message_tokens(message) for message in chat_history)
+        if next_message is not None:
+            history_tokens += self.estimate_message_tokens(next_message)
+        self.stats["budget_tokens"] = budget_tokens
+        self.stats["history_tokens"] = history_tokens
+        if history_tokens <= budget_tokens:
+            return chat_history
+        return self.trim(chat_history, budget_tokens, history_tokens)
+
+    # -------------------------------------------------------------------------------------------------
+    def trim(self, chat_history, budget_tokens, history_tokens):
+        """ a method for dropping the oldest turns down to the low water mark, the system prompt is
+        kept and the dropped turns are added to the summary
+            args: chat_history, budget_tokens, history_tokens
+            returns: trimmed chat_history
+        """
+        prefix, turns = self.split_turns(chat_history)
+        low_water_tokens = int(budget_tokens * self.low_water_ratio)
+        dropped_turns = []
+        # the latest turn is never dropped
+        while len(turns) > 1 and history_tokens > low_water_tokens:
+            turn = turns.pop(0)
+            dropped_turns.append(turn)
+            history_tokens -= sum(self.estimate_message_tokens(message) for message in turn)
+        if not dropped_turns:
+            return chat_history
+
+        self.add_to_summary(dropped_turns, budget_tokens)
+        self.stats["trims"] += 1
+        self.stats["turns_trimmed"] += len(dropped_turns)
+        trimmed_history = list(prefix)
+        if self.summary_message is not None:
+            trimmed_history.append(self.summary_message)
+        for turn in turns:
+            trimmed_history.extend(turn)
+        self.stats["history_tokens"] = sum(self.estimate_message_tokens(message) for message in trimmed_history)
+        return trimmed_history
+
+    # -------------------------------------------------------------------------------------------------
+    def split_turns(self, chat_history):
+        """ a method for splitting the history into the leading system messages and the turns, a turn
+        starts at a user message, the llava follow up prompt stays with its turn
+            args: chat_history
+            returns: prefix, turns
+        """
+        prefix = []
+        turns = []
+        for message in chat_history:
+            if message is self.summary_message:
+                continue
+            if not turns and message.get("role") == "system":
+                prefix.append(message)
+                continue
+            previous_content = turns[-1][-1].get("content") or "" if turns else ""
+            if not turns or (message.get("role") == "user" and not previous_content.startswith("LLAVA_DATA")):
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return prefix, turns
+
+    # -------------------------------------------------------------------------------------------------
+    def add_to_summary(self, dropped_turns, budget_tokens):
+        """ a method for adding the first sentence of each side of the dropped turns to the summary,
+        the oldest lines go once the summary passes its share of the budget
+            args: dropped_turns, budget_tokens
+            returns: none
+        """
+        for turn in dropped_turns:
+            user_text = next((message.get("content") or "" for message in turn if message.get("role") == "user"), "")
+            assistant_text = next((message.get("content") or "" for message in reversed(turn) if message.get("role") == "assistant"), "")
+            summary_line = f"- user: {self.first_sentence(user_text)}"
+            if assistant_text:
+                summary_line += f" | you: {self.first_sentence(assistant_text)}"
+            self.summary_lines.append(summary_line)
+
+        summary_budget_tokens = int(budget_tokens * self.summary_ratio)
+        while len(self.summary_lines) > 1 and self.estimate_tokens("\n".join(self.summary_lines)) > summary_budget_tokens:
+            self.summary_lines.pop(0)
+        self.summary_message = {"role": "system", "content": self.SUMMARY_HEADER + "\n" + "\n".join(self.summary_lines)}
+
+    # -------------------------------------------------------------------------------------------------
+    def first_sentence(self, text):
+        """ a method for getting the first sentence of a message, cut at summary_sentence_chars
+            args: text
+            returns: sentence
+        """
+        text = " ".join(text.split())
+        match = re.match(r"(.+?[.!?])(\s|$)", text)
+        sentence = match.group(1) if match else text
+        if len(sentence) > self.summary_sentence_chars:
+            sentence = sentence[:self.summary_sentence_chars].rsplit(" ", 1)[0] + "..."
+        return sentence
+
+    # -------------------------------------------------------------------------------------------------
+    def reset(self):
+        """ a method for forgetting the summary, when the chat history is cleared or swapped
+            args: none
+            returns: none
+        """
+        self.summary_lines = []
+        self.summary_message = None
+
+    # -------------------------------------------------------------------------------------------------
+    def print_stats(self, colors, chat_history, model_name):
+        """ a method for printing the history size against the model budget
+            args: colors, chat_history, model_name
+            returns: none
+        """
+        stats = dict(self.stats)
+        stats["context_tokens"] = self.get_context_tokens(model_name)
+        stats["budget_tokens"] = self.get_budget_tokens(model_name)
+        stats["history_tokens"] = sum(self.estimate_message_tokens(message) for message in chat_history)
+        stats["history_messages"] = len(chat_history)
+        stats["summary_lines"] = len(self.summary_lines)
+        for key, value in stats.items():
+            print(colors['OKCYAN'] + f"{key}: " + colors['OKBLUE'] + f"{value}" + colors['END'])
+        return
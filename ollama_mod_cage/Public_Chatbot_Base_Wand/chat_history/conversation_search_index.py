@@ -0,0 +1,243 @@
+""" conversation_search_index.py
+
+        A class for searching every saved conversation of the conversation library through one
+    sqlite index, with the model, conversation, role, time & content of each message. The content
+    is indexed with sqlite's fts5 full text search, and a sqlite built without fts5 falls back to a
+    LIKE scan. The jsonl logs are append only, so each one is indexed from the byte offset reached
+    last time, a log replaced by compaction is indexed again from the start, and the older json
+    saves are indexed again when their modified time changes.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# -------------------------------------------------------------------------------------------------
+class conversation_search_index:
+    """ a class for indexing & full text searching the conversation library
+    """
+    INDEX_FILE_NAME = "conversation_index.db"
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, conversation_library, index_path=None):
+        """a method for initializing the class
+            args: conversation_library, index_path, defaults to conversation_index.db in the library
+        """
+        self.conversation_library = conversation_library
+        os.makedirs(self.conversation_library, exist_ok=True)
+        self.index_path = index_path or os.path.join(self.conversation_library, self.INDEX_FILE_NAME)
+
+        # one connection shared by the chatbot & the library sync thread
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.fts_flag = self.create_tables()
+
+        self.stats = {"files_indexed": 0, "messages_indexed": 0, "searches": 0, "last_search_ms": 0.0}
+
+    # -------------------------------------------------------------------------------------------------
+    def create_tables(self):
+        """ a method for creating the index tables, the fts5 table is kept in step by triggers
+            args: none
+            returns: fts_flag, False when sqlite was built without fts5
+        """
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS conversations (path TEXT PRIMARY KEY, model TEXT, conversation TEXT, inode INTEGER, mtime REAL, indexed_bytes INTEGER)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, path TEXT, model TEXT, conversation TEXT, role TEXT, content TEXT, created REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS messages_path ON messages (path)")
+        try:
+            with self.connection:
+                self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id')")
+                self.connection.execute("CREATE TRIGGER IF NOT EXISTS messages_insert AFTER INSERT ON messages BEGIN "
+                                        "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END")
+                self.connection.execute("CREATE TRIGGER IF NOT EXISTS messages_delete AFTER DELETE ON messages BEGIN "
+                                        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END")
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"Failed to create the fts5 index, searching with LIKE instead. Reason: {e}")
+            return False
+
+    # -------------------------------------------------------------------------------------------------
+    def sync_conversation(self, user_input_model_select, conversation_name):
+        """ a method for indexing the new messages of one conversation log, called after it is saved
+            args: user_input_model_select, conversation_name
+            returns: none
+        """
+        log_path = os.path.join(self.conversation_library, *user_input_model_select.split("/"), f"{conversation_name}.jsonl")
+        with self.lock:
+            self.sync_file(log_path)
+
+    # -------------------------------------------------------------------------------------------------
+    def sync_library(self):
+        """ a method for indexing every conversation of the library changed since the last sync, run on
+        a worker thread at startup
+            args: none
+            returns: none
+        """
+        start_time = time.perf_counter()
+        with self.lock:
+            indexed_paths = {row[0] for row in self.connection.execute("SELECT path FROM conversations")}
+        found_paths = set()
+        for dir_path, dir_names, file_names in os.walk(self.conversation_library):
+            for file_name in file_names:
+                if not file_name.endswith((".jsonl", ".json")):
+                    continue
+                file_path = os.path.join(dir_path, file_name)
+                relative_path = self.get_relative_path(file_path)
+                found_paths.add(relative_path)
+                try:
+                    with self.lock:
+                        self.sync_file(file_path)
+                except Exception as e:
+                    print(f"Failed to index the conversation {file_path}. Reason: {e}")
+        # forget the conversations deleted from the library
+        with self.lock, self.connection:
+            for relative_path in indexed_paths - found_paths:
+                self.connection.execute("DELETE FROM messages WHERE path = ?", (relative_path,))
+                self.connection.execute("DELETE FROM conversations WHERE path = ?", (relative_path,))
+        print(f"Conversation index synced in {time.perf_counter() - start_time:.2f}s")
+
+    # -------------------------------------------------------------------------------------------------
+    def sync_file(self, file_path):
+        """ a method for indexing the messages of a conversation file not yet indexed, called with the lock held
+            args: file_path
+            returns: none
+        """
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            return
+        relative_path = self.get_relative_path(file_path)
+        indexed_state = self.connection.execute("SELECT inode, mtime, indexed_bytes FROM conversations WHERE path = ?", (relative_path,)).fetchone()
+        inode, mtime, start_bytes = indexed_state if indexed_state is not None else (None, None, 0)
+        if file_path.endswith(".jsonl"):
+            # a compacted log is a new file, index it again from the start
+            if inode != file_stat.st_ino or file_stat.st_size < start_bytes:
+                start_bytes = 0
+            elif file_stat.st_size == start_bytes:
+                return
+        elif mtime == file_stat.st_mtime:
+            return
+        else:
+            start_bytes = 0
+
+        model_name = os.path.dirname(relative_path).replace(os.sep, "/")
+        conversation_name = os.path.splitext(os.path.basename(relative_path))[0]
+        reset_flag = False
+        if file_path.endswith(".jsonl"):
+            messages, indexed_bytes, reset_flag = self.read_log_messages(file_path, start_bytes)
+        else:
+            with open(file_path, "r", encoding="utf-8") as json_file:
+                messages = [(message, file_stat.st_mtime) for message in json.load(json_file)]
+            indexed_bytes = file_stat.st_size
+
+        with self.connection:
+            # a reset record replaces the history indexed so far with the messages after it
+            if start_bytes == 0 or reset_flag:
+                self.connection.execute("DELETE FROM messages WHERE path = ?", (relative_path,))
+            self.connection.executemany("INSERT INTO messages (path, model, conversation, role, content, created) VALUES (?, ?, ?, ?, ?, ?)",
+                                        [(relative_path, model_name, conversation_name, message.get("role"), message.get("content") or "", created)
+                                         for message, created in messages])
+            self.connection.execute("INSERT OR REPLACE INTO conversations (path, model, conversation, inode, mtime, indexed_bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                                    (relative_path, model_name, conversation_name, file_stat.st_ino, file_stat.st_mtime, indexed_bytes))
+        self.stats["files_indexed"] += 1
+        self.stats["messages_indexed"] += len(messages)
+
+    # -------------------------------------------------------------------------------------------------
+    def read_log_messages(self, log_path, start_bytes):
+        """ a method for reading the complete records of a jsonl log from start_bytes, a line still
+        being written is left for the next sync, only the messages after the last reset record are kept
+            args: log_path, start_bytes
+            returns: list of (message, created), the byte offset indexed up to, reset_flag
+        """
+        with open(log_path, "rb") as log_file:
+            log_file.seek(start_bytes)
+            new_bytes = log_file.read()
+        complete_bytes = new_bytes[:new_bytes.rfind(b"\n") + 1]
+        messages = []
+        reset_flag = False
+        for line in complete_bytes.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("op") == "message":
+                messages.append((record["message"], record.get("time")))
+            elif record.get("op") == "reset":
+                messages = []
+                reset_flag = True
+        return messages, start_bytes + len(complete_bytes), reset_flag
+
+    # -------------------------------------------------------------------------------------------------
+    def get_relative_path(self, file_path):
+        """ a method for getting the path of a conversation file inside the library
+            args: file_path
+            returns: relative_path
+        """
+        return os.path.relpath(file_path, self.conversation_library)
+
+    # -------------------------------------------------------------------------------------------------
+    def search(self, query, user_input_model_select=None, limit=10):
+        """ a method for searching the content of every indexed message, best match first with fts5
+        & newest first with LIKE
+            args: query, user_input_model_select, None for every model, limit
+            returns: list of result dicts, model, conversation, role, created & snippet
+        """
+        terms = (query or "").split()
+        if not terms:
+            return []
+        start_time = time.perf_counter()
+        model_filter = "" if user_input_model_select is None else " AND m.model = ?"
+        model_args = () if user_input_model_select is None else (user_input_model_select,)
+        if self.fts_flag is True:
+            # every term quoted, so the query is never read as fts5 syntax
+            match_query = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+            sql = ("SELECT m.model, m.conversation, m.role, m.created, snippet(messages_fts, 0, '[', ']', '...', 16) "
+                   "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                   f"WHERE messages_fts MATCH ?{model_filter} ORDER BY rank LIMIT ?")
+            args = (match_query,) + model_args + (limit,)
+        else:
+            like_filter = " AND ".join("m.content LIKE ? ESCAPE '\\'" for term in terms)
+            sql = ("SELECT m.model, m.conversation, m.role, m.created, m.content FROM messages m "
+                   f"WHERE {like_filter}{model_filter} ORDER BY m.created DESC LIMIT ?")
+            like_terms = tuple("%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%" for term in terms)
+            args = like_terms + model_args + (limit,)
+
+        with self.lock:
+            rows = self.connection.execute(sql, args).fetchall()
+        self.stats["searches"] += 1
+        self.stats["last_search_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+        return [{"model": model_name, "conversation": conversation_name, "role": role, "created": created, "snippet": snippet}
+                for model_name, conversation_name, role, created, snippet in rows]
+
+    # -------------------------------------------------------------------------------------------------
+    def print_search(self, colors, query, user_input_model_select=None, limit=10):
+        """ a method for printing the search results of a query
+            args: colors, query, user_input_model_select, limit
+            returns: none
+        """
+        if not query:
+            print("Invalid choice. Please provide a search query.")
+            return
+        try:
+            results = self.search(query, user_input_model_select, limit)
+        except Exception as e:
+            print(f"Failed to search the conversation history. Reason: {e}")
+            return
+        print(colors['OKCYAN'] + f"<<< {len(results)} RESULTS FOR {query} IN {self.stats['last_search_ms']}ms >>>" + colors['END'])
+        for result in results:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(result["created"])) if result["created"] else "-"
+            print(colors['OKCYAN'] + f"{result['model']}/{result['conversation']} {created} {result['role']}: " + colors['OKBLUE'] + " ".join(result["snippet"].split()) + colors['END'])
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def close(self):
+        """ a method for closing the index connection
+            args: none
+            returns: none
+        """
+        with self.lock:
+            self.connection.close()
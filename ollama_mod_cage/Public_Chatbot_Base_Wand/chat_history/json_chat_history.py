@@ -10,7 +10,6 @@ by @LeoBorcherding
 import os
 import json
 
-from Public_Chatbot_Base_Wand.directory_manager import directory_manager_class
 
 class json_chat_history:
     """ a class for writing the json history to the json files
@@ -25,27 +24,28 @@ class json_chat_history:
         self.conversation_library = developer_tools_dict['conversation_library_dir']
 
     # -------------------------------------------------------------------------------------------------
-    def save_to_json(self, save_name, user_input_model_select):
-        """ a method for saving the current agent conversation history
-            Args: filename
+    def save_to_json(self, save_name, user_input_model_select, chat_history):
+        """ a method for saving the current agent conversation history, the chatbot appends to its
+        jsonl_conversation_store logs instead, this writes the whole history as one json file
+            Args: filename, user_input_model_select, chat_history
             Returns: none
         """
         self.save_name = save_name
         self.user_input_model_select = user_input_model_select
         file_save_path_dir = os.path.join(self.conversation_library, f"{self.user_input_model_select}")
         file_save_path_str = os.path.join(file_save_path_dir, f"{self.save_name}.json")
-        directory_manager_class.create_directory_if_not_exists(file_save_path_dir)
+        os.makedirs(file_save_path_dir, exist_ok=True)
         
         print(f"file path 1:{file_save_path_dir} \n")
         print(f"file path 2:{file_save_path_str} \n")
         with open(file_save_path_str, "w") as json_file:
-            json.dump(self.chat_history, json_file, indent=2)
+            json.dump(chat_history, json_file, indent=2)
 
     def load_from_json(self, load_name, user_input_model_select):
         """ a method for loading the directed conversation history to the current agent, mis matching
         agents and history may be bizarre
-            Args: filename
-            Returns: none
+            Args: filename, user_input_model_select
+            Returns: chat_history
         """
         self.load_name = load_name
         self.user_input_model_select = user_input_model_select
@@ -58,8 +58,9 @@ class json_chat_history:
             file_load_path_dir = os.path.join(self.conversation_library, self.user_input_model_select)
 
         file_load_path_str = os.path.join(file_load_path_dir, f"{self.load_name}.json")
-        directory_manager_class.create_directory_if_not_exists(file_load_path_dir)
+        os.makedirs(file_load_path_dir, exist_ok=True)
         print(f"file path 1:{file_load_path_dir} \n")
         print(f"file path 2:{file_load_path_str} \n")
         with open(file_load_path_str, "r") as json_file:
-            self.chat_history = json.load(json_file)
\ No newline at end of file
+            chat_history = json.load(json_file)
+        return chat_history
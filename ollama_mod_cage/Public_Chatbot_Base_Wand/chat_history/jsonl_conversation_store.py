@@ -0,0 +1,271 @@
+""" jsonl_conversation_store.py
+
+        A class for keeping the conversation library as append only json lines logs, one record per
+    message, so saving a turn writes only that turn instead of dumping the whole history again.
+    Every record is flushed to the os as it is written, which survives a crash of the chatbot, and
+    the fsync to disk is batched every fsync_every_records records or fsync_interval_seconds. A
+    reset record starts the conversation over, the records before the last reset are dead and the
+    log is compacted once they pass compact_min_bytes and half of the file, a log opened again finds
+    its last reset by the same backwards read, so old logs are compacted too. tail reads the file
+    backwards from its end, so loading the last n turns of a long log never parses the whole of it.
+"""
+
+import os
+import json
+import time
+import threading
+
+# -------------------------------------------------------------------------------------------------
+class jsonl_conversation_store:
+    """ a class for appending, tail reading & compacting the jsonl conversation logs
+    """
+    # every record is written with its op first, so a reset line starts with these bytes
+    RESET_LINE_PREFIX = b'{"op": "reset"'
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, conversation_library, fsync_every_records=16, fsync_interval_seconds=1.0, compact_min_bytes=256 * 1024, read_block_bytes=64 * 1024):
+        """a method for initializing the class
+            args: conversation_library, fsync_every_records, fsync_interval_seconds, compact_min_bytes,
+                read_block_bytes, read per step of a tail
+        """
+        self.conversation_library = conversation_library
+        self.fsync_every_records = fsync_every_records
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.compact_min_bytes = compact_min_bytes
+        self.read_block_bytes = read_block_bytes
+
+        # log path -> {"file", "pending_records", "last_fsync_time", "dead_bytes"}
+        self.open_logs = {}
+        self.lock = threading.Lock()
+
+        self.stats = {"records_written": 0, "fsyncs": 0, "compactions": 0, "bytes_compacted": 0}
+
+    # -------------------------------------------------------------------------------------------------
+    def get_log_dir(self, user_input_model_select):
+        """ a method for getting the conversation directory of the model, user/model names are nested
+            args: user_input_model_select
+            returns: log_dir
+        """
+        return os.path.join(self.conversation_library, *user_input_model_select.split("/"))
+
+    # -------------------------------------------------------------------------------------------------
+    def get_log_path(self, user_input_model_select, conversation_name):
+        """ a method for getting the log path of a conversation
+            args: user_input_model_select, conversation_name
+            returns: log_path
+        """
+        return os.path.join(self.get_log_dir(user_input_model_select), f"{conversation_name}.jsonl")
+
+    # -------------------------------------------------------------------------------------------------
+    def append(self, user_input_model_select, conversation_name, messages):
+        """ a method for appending messages to the end of the conversation log
+            args: user_input_model_select, conversation_name, messages list
+            returns: none
+        """
+        message_time = time.time()
+        records = [{"op": "message", "time": message_time, "message": message} for message in messages]
+        self.write_records(self.get_log_path(user_input_model_select, conversation_name), records)
+
+    # -------------------------------------------------------------------------------------------------
+    def reset(self, user_input_model_select, conversation_name, messages=()):
+        """ a method for starting the conversation over, with messages as the new history, the earlier
+        records are dropped at the next compaction
+            args: user_input_model_select, conversation_name, messages
+            returns: none
+        """
+        log_path = self.get_log_path(user_input_model_select, conversation_name)
+        message_time = time.time()
+        records = [{"op": "reset", "time": message_time}] + [{"op": "message", "time": message_time, "message": message} for message in messages]
+        self.write_records(log_path, records, reset=True)
+
+    # -------------------------------------------------------------------------------------------------
+    def write_records(self, log_path, records, reset=False):
+        """ a method for writing records to the log, the fsync is batched
+            args: log_path, records, reset bool, True when the records start with a reset
+            returns: none
+        """
+        record_bytes = b"".join(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n" for record in records)
+        with self.lock:
+            open_log = self.open_log(log_path)
+            if reset is True:
+                # everything before the reset is dead
+                open_log["dead_bytes"] = open_log["file"].tell()
+            open_log["file"].write(record_bytes)
+            open_log["file"].flush()
+            open_log["pending_records"] += len(records)
+            self.stats["records_written"] += len(records)
+            if reset is True or open_log["pending_records"] >= self.fsync_every_records or \
+                    time.monotonic() - open_log["last_fsync_time"] >= self.fsync_interval_seconds:
+                self.fsync_log(open_log)
+            if open_log["dead_bytes"] >= self.compact_min_bytes and open_log["dead_bytes"] * 2 >= open_log["file"].tell():
+                self.compact(log_path)
+
+    # -------------------------------------------------------------------------------------------------
+    def open_log(self, log_path):
+        """ a method for getting the open append handle of a log, called with the lock held
+            args: log_path
+            returns: open_log dict
+        """
+        if log_path not in self.open_logs:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            log_file = open(log_path, "ab+")
+            # end a line torn by a crash so the next record starts on its own line
+            if log_file.seek(0, os.SEEK_END) > 0:
+                log_file.seek(-1, os.SEEK_END)
+                if log_file.read(1) != b"\n":
+                    log_file.write(b"\n")
+            dead_bytes = self.find_dead_bytes(log_file)
+            log_file.seek(0, os.SEEK_END)
+            self.open_logs[log_path] = {"file": log_file, "pending_records": 0, "last_fsync_time": time.monotonic(), "dead_bytes": dead_bytes}
+        return self.open_logs[log_path]
+
+    # -------------------------------------------------------------------------------------------------
+    def find_dead_bytes(self, log_file):
+        """ a method for finding the offset of the last reset record of a log, reading backwards from
+        its end, the bytes before it are dead
+            args: log_file
+            returns: dead_bytes, 0 when the log has no reset past its first line
+        """
+        reset_marker = b"\n" + self.RESET_LINE_PREFIX
+        position = log_file.seek(0, os.SEEK_END)
+        overlap = b""
+        while position > 0:
+            read_size = min(self.read_block_bytes, position)
+            position -= read_size
+            log_file.seek(position)
+            block = log_file.read(read_size) + overlap
+            marker_index = block.rfind(reset_marker)
+            if marker_index != -1:
+                return position + marker_index + 1
+            # a marker may straddle the block boundary
+            overlap = block[:len(reset_marker) - 1]
+        return 0
+
+    # -------------------------------------------------------------------------------------------------
+    def fsync_log(self, open_log):
+        """ a method for syncing the written records to disk, called with the lock held
+            args: open_log
+            returns: none
+        """
+        if open_log["pending_records"] == 0:
+            return
+        os.fsync(open_log["file"].fileno())
+        open_log["pending_records"] = 0
+        open_log["last_fsync_time"] = time.monotonic()
+        self.stats["fsyncs"] += 1
+
+    # -------------------------------------------------------------------------------------------------
+    def compact(self, log_path):
+        """ a method for rewriting the log from its last reset, the new file replaces the old one
+        atomically so a crash leaves one or the other, called with the lock held
+            args: log_path
+            returns: none
+        """
+        open_log = self.open_logs.pop(log_path, None)
+        if open_log is not None:
+            self.fsync_log(open_log)
+            open_log["file"].close()
+        try:
+            live_lines = self.read_tail_lines(log_path, None)
+            compact_path = log_path + ".compact"
+            with open(compact_path, "wb") as compact_file:
+                compact_file.write(b"".join(line + b"\n" for line in live_lines))
+                compact_file.flush()
+                os.fsync(compact_file.fileno())
+            bytes_before = os.path.getsize(log_path)
+            os.replace(compact_path, log_path)
+            self.stats["compactions"] += 1
+            self.stats["bytes_compacted"] += bytes_before - os.path.getsize(log_path)
+        except Exception as e:
+            print(f"Failed to compact the conversation log {log_path}. Reason: {e}")
+
+    # -------------------------------------------------------------------------------------------------
+    def tail(self, user_input_model_select, conversation_name, num_turns=None):
+        """ a method for loading the last turns of a conversation, a turn starts at a user message
+            args: user_input_model_select, conversation_name, num_turns, None for every turn since the last reset
+            returns: messages list, or None when the log does not exist
+        """
+        log_path = self.get_log_path(user_input_model_select, conversation_name)
+        with self.lock:
+            if log_path in self.open_logs:
+                self.open_logs[log_path]["file"].flush()
+            if not os.path.isfile(log_path):
+                return None
+            lines = self.read_tail_lines(log_path, num_turns)
+        messages = []
+        for line in lines:
+            record = json.loads(line)
+            if record.get("op") == "message":
+                messages.append(record["message"])
+        return messages
+
+    # -------------------------------------------------------------------------------------------------
+    def read_tail_lines(self, log_path, num_turns):
+        """ a method for reading the record lines backwards from the end of the log, until num_turns
+        user messages or the last reset
+            args: log_path, num_turns, None for every line since the last reset
+            returns: record lines in file order
+        """
+        tail_lines = []
+        turns_found = 0
+        with open(log_path, "rb") as log_file:
+            position = log_file.seek(0, os.SEEK_END)
+            remainder = b""
+            while position > 0:
+                read_size = min(self.read_block_bytes, position)
+                position -= read_size
+                log_file.seek(position)
+                block_lines = (log_file.read(read_size) + remainder).split(b"\n")
+                # the first line may continue in the next block back
+                remainder = block_lines.pop(0) if position > 0 else b""
+                for line in reversed(block_lines):
+                    if self.collect_line(line, tail_lines) is False:
+                        return tail_lines[::-1]
+                    if num_turns is not None and tail_lines and self.is_user_line(tail_lines[-1]):
+                        turns_found += 1
+                        if turns_found >= num_turns:
+                            return tail_lines[::-1]
+            if remainder:
+                self.collect_line(remainder, tail_lines)
+        return tail_lines[::-1]
+
+    # -------------------------------------------------------------------------------------------------
+    def collect_line(self, line, tail_lines):
+        """ a method for adding a record line to the tail, a torn last line from a crash is skipped
+            args: line, tail_lines
+            returns: False at a reset record, True otherwise
+        """
+        line = line.strip()
+        if not line:
+            return True
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return True
+        if record.get("op") == "reset":
+            return False
+        tail_lines.append(line)
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def is_user_line(self, line):
+        """ a method for checking if a record line is a user message
+            args: line
+            returns: user bool
+        """
+        return json.loads(line).get("message", {}).get("role") == "user"
+
+    # -------------------------------------------------------------------------------------------------
+    def close(self):
+        """ a method for syncing & closing every open log
+            args: none
+            returns: none
+        """
+        with self.lock:
+            for open_log in self.open_logs.values():
+                try:
+                    self.fsync_log(open_log)
+                    open_log["file"].close()
+                except Exception as e:
+                    print(f"Failed to close a conversation log. Reason: {e}")
+            self.open_logs = {}
@@ -2,12 +2,14 @@
 """
 import os
 import glob
-import pyautogui
 import time
 import subprocess
 from Public_Chatbot_Base_Wand.ollama_add_on_library import ollama_commands
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
 import shutil
 
+pyautogui = lazy_module("pyautogui")
+
 # -------------------------------------------------------------------------------------------------
 class create_convert_manager:
 
@@ -1,3 +1,8 @@
 #__init__.py
 from .data_set_constructor import data_set_constructor
-from .screen_shot_collector import screen_shot_collector
\ No newline at end of file
+from .screen_shot_collector import screen_shot_collector
+from .perceptual_hash import perceptual_hash
+from .llava_response_cache import llava_response_cache
+from .llava_vision_sampler import llava_vision_sampler
+from .video_frame_extractor import video_frame_extractor
+from .frame_dedup_index import frame_dedup_index
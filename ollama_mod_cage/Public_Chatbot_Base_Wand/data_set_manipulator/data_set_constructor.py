@@ -1,13 +1,10 @@
-""" tts_processor.py
-    A class for processing the response sentences and audio generation for the ollama_chat_bot_class
-
-
-    python llama.cpp\convert-hf-to-gguf.py --outtype q8_0 --model-name Phi-3-mini-4k-instruct-q8_0 Phi-3-mini-4k-instruct
-    python llama.cpp\convert-hf-to-gguf.py --outtype q8_0 --model-name Phi-3-mini-4k-instruct-q8_0 --outfile converted\Phi-3-mini-4k-instruct-q8_0.gguf Phi-3-mini-4k-instruct
+""" data_set_constructor.py
+    A class for splicing the videos of the video set into the image set used to build data sets,
+    through the video_frame_extractor, set splice_interval_seconds, splice_image_format,
+    splice_video_workers, splice_writer_threads, splice_dedup_mode & splice_dedup_threshold in
+    developer_custom.json
 """
-import os
-from moviepy.editor import VideoFileClip
-from PIL import Image
+from Public_Chatbot_Base_Wand.data_set_manipulator.video_frame_extractor import video_frame_extractor
 
 # -------------------------------------------------------------------------------------------------
 class data_set_constructor:
@@ -21,34 +18,37 @@ class data_set_constructor:
         self.ignored_pipeline_dir = self.developer_tools_dict['ignored_pipeline_dir']
         self.image_dir = self.developer_tools_dict['image_dir']
         self.video_dir = self.developer_tools_dict['video_dir']
-        
-    # -------------------------------------------------------------------------------------------------
-    def splice_video(self, video_path):
-        # Load video
-        clip = VideoFileClip(video_path)
-
-        # Get the video name (without extension) to use in the image name
-        video_name = os.path.splitext(os.path.basename(video_path))[0]
 
-        # Create a new directory for this video's images
-        video_image_dir = os.path.join(self.image_dir, video_name)
-        os.makedirs(video_image_dir, exist_ok=True)
+        self.video_frame_extractor_instance = video_frame_extractor(
+            self.image_dir,
+            interval_seconds=float(self.developer_tools_dict.get('splice_interval_seconds') or 10),
+            image_format=self.developer_tools_dict.get('splice_image_format') or "png",
+            video_workers=int(self.developer_tools_dict.get('splice_video_workers') or 0),
+            writer_threads=int(self.developer_tools_dict.get('splice_writer_threads') or 4),
+            dedup_mode=self.developer_tools_dict.get('splice_dedup_mode') or "off",
+            dedup_threshold=int(self.developer_tools_dict.get('splice_dedup_threshold') or 3),
+        )
 
-        # Iterate over the duration of the clip with a step size of 'interval'
-        for i in range(0, int(clip.duration), 10):
-            # Get a frame at 'i' seconds
-            frame = clip.get_frame(i)
-            
-            # Save the frame as an image
-            frame_image = Image.fromarray(frame)
-            frame_image.save(os.path.join(video_image_dir, f'frame_{i}.png'))
+    # -------------------------------------------------------------------------------------------------
+    def splice_video(self, video_path):
+        """ a method for saving a frame every splice interval of one video, continuing from its checkpoint
+            args: video_path
+            returns: result dict
+        """
+        return self.video_frame_extractor_instance.extract_video(video_path)
 
-        print(f"Frames saved in directory {video_image_dir}")
+    # -------------------------------------------------------------------------------------------------
+    def generate_image_data(self):
+        """ a method for splicing every video in the video directory, in parallel across worker processes
+            args: none
+            returns: list of result dicts
+        """
+        return self.video_frame_extractor_instance.extract_videos(self.video_dir)
 
     # -------------------------------------------------------------------------------------------------
-    def generate_image_data(self):  # Changed interval to 30
-        # Iterate over all videos in the video directory
-        for video_file in os.listdir(self.video_dir):
-            if video_file.endswith('.mp4'):
-                video_path = os.path.join(self.video_dir, video_file)
-                self.splice_video(video_path)  # Splice video every 'interval' seconds
\ No newline at end of file
+    def print_dedup_stats(self, colors):
+        """ a method for printing the near duplicate frame counters of the image set
+            args: colors
+            returns: none
+        """
+        self.video_frame_extractor_instance.print_dedup_stats(colors)
@@ -0,0 +1,136 @@
+""" frame_dedup_index.py
+
+        A class for finding near duplicate frames of the image set by their perceptual hash, kept in
+    one sqlite index across runs. Each 64 bit hash is split into 4 bands of 16 bits, indexed on their
+    own, and by the pigeonhole principle two hashes within 3 differing bits share at least one band
+    exactly, so a lookup is 4 indexed equality probes & a popcount of the few candidates instead of
+    a scan, which stays fast at hundreds of thousands of frames. The check & the insert of a frame
+    run in one immediate transaction, so the worker processes of the frame extractor can share the
+    index without two near duplicates both being kept.
+"""
+
+import time
+import sqlite3
+import threading
+
+from Public_Chatbot_Base_Wand.data_set_manipulator.perceptual_hash import perceptual_hash
+
+# -------------------------------------------------------------------------------------------------
+class frame_dedup_index:
+    """ a class for the banded perceptual hash index of the image set frames
+    """
+    BAND_COUNT = 4
+    BAND_BITS = 16
+    INDEX_FILE_NAME = "frame_index.db"
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, index_path, hash_threshold=3, busy_timeout_seconds=60):
+        """a method for initializing the class
+            args: index_path, hash_threshold, differing bits still counted as a duplicate, at most 3 so
+                every match shares a band, busy_timeout_seconds, waiting on another process's insert
+        """
+        self.index_path = index_path
+        self.hash_threshold = max(0, min(int(hash_threshold), self.BAND_COUNT - 1))
+
+        # shared by the writer threads of one process, transactions are opened explicitly
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.index_path, timeout=busy_timeout_seconds, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS frames (id INTEGER PRIMARY KEY, path TEXT UNIQUE, video TEXT, hash INTEGER, "
+                                "band0 INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER, duplicate_of INTEGER, created REAL)")
+        for band in range(self.BAND_COUNT):
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS frames_band{band} ON frames (band{band})")
+
+    # -------------------------------------------------------------------------------------------------
+    def get_bands(self, image_hash):
+        """ a method for splitting a 64 bit hash into its bands
+            args: image_hash
+            returns: list of band values
+        """
+        band_mask = (1 << self.BAND_BITS) - 1
+        return [(image_hash >> (band * self.BAND_BITS)) & band_mask for band in range(self.BAND_COUNT)]
+
+    # -------------------------------------------------------------------------------------------------
+    def to_signed(self, image_hash):
+        """ a method for storing an unsigned 64 bit hash in a signed sqlite integer
+            args: image_hash
+            returns: signed hash
+        """
+        return image_hash - (1 << 64) if image_hash >= (1 << 63) else image_hash
+
+    # -------------------------------------------------------------------------------------------------
+    def find_duplicate(self, image_hash):
+        """ a method for finding the nearest kept frame within hash_threshold of a hash
+            args: image_hash
+            returns: (frame_id, path) of the kept frame, or None
+        """
+        bands = self.get_bands(image_hash)
+        band_filter = " OR ".join(f"band{band} = ?" for band in range(self.BAND_COUNT))
+        best_match = None
+        best_distance = self.hash_threshold + 1
+        for frame_id, path, frame_hash in self.connection.execute(f"SELECT id, path, hash FROM frames WHERE duplicate_of IS NULL AND ({band_filter})", bands):
+            distance = perceptual_hash.hamming_distance(frame_hash & ((1 << 64) - 1), image_hash)
+            if distance < best_distance:
+                best_match, best_distance = (frame_id, path), distance
+        return best_match
+
+    # -------------------------------------------------------------------------------------------------
+    def add_frame(self, frame_path, video_name, image_hash):
+        """ a method for adding a frame, a near duplicate of a kept frame is recorded as its duplicate,
+        a frame added again on a resumed run keeps its first decision
+            args: frame_path, relative to the image set, video_name, image_hash
+            returns: path of the kept frame it duplicates, or None when the frame is kept
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.connection.execute("SELECT duplicate_of FROM frames WHERE path = ?", (frame_path,)).fetchone()
+                if row is not None:
+                    duplicate_path = None
+                    if row[0] is not None:
+                        duplicate_path = self.connection.execute("SELECT path FROM frames WHERE id = ?", (row[0],)).fetchone()[0]
+                    self.connection.execute("COMMIT")
+                    return duplicate_path
+                duplicate = self.find_duplicate(image_hash)
+                self.connection.execute("INSERT INTO frames (path, video, hash, band0, band1, band2, band3, duplicate_of, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                        (frame_path, video_name, self.to_signed(image_hash), *self.get_bands(image_hash),
+                                         duplicate[0] if duplicate is not None else None, time.time()))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return duplicate[1] if duplicate is not None else None
+
+    # -------------------------------------------------------------------------------------------------
+    def get_stats(self, video_name=None):
+        """ a method for counting the kept & duplicate frames
+            args: video_name, None for the whole image set
+            returns: stats dict, frames, unique_frames, duplicate_frames & dedup_ratio
+        """
+        video_filter, args = (" WHERE video = ?", (video_name,)) if video_name is not None else ("", ())
+        with self.lock:
+            frames, duplicate_frames = self.connection.execute(f"SELECT COUNT(*), COUNT(duplicate_of) FROM frames{video_filter}", args).fetchone()
+        return {"frames": frames, "unique_frames": frames - duplicate_frames, "duplicate_frames": duplicate_frames,
+                "dedup_ratio": round(duplicate_frames / frames, 3) if frames else 0.0}
+
+    # -------------------------------------------------------------------------------------------------
+    def print_stats(self, colors):
+        """ a method for printing the dedup counters of the image set
+            args: colors
+            returns: none
+        """
+        stats = self.get_stats()
+        stats["hash_threshold"] = self.hash_threshold
+        for key, value in stats.items():
+            print(colors['OKCYAN'] + f"{key}: " + colors['OKBLUE'] + f"{value}" + colors['END'])
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def close(self):
+        """ a method for closing the index connection
+            args: none
+            returns: none
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,115 @@
+""" llava_response_cache.py
+
+        A class for reusing the llava description of a screenshot when the screen has barely changed.
+    Each description is kept with the perceptual hash of its frame, the llava model & the prompt, and
+    a frame within hash_threshold bits of a cached frame, for the same model & prompt, gets the cached
+    description instead of a new multimodal inference. The cache holds the last max_entries frames,
+    and a description older than max_age_seconds is asked again so a frozen screen still refreshes.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+from Public_Chatbot_Base_Wand.data_set_manipulator.perceptual_hash import perceptual_hash
+
+# -------------------------------------------------------------------------------------------------
+class llava_response_cache:
+    """ a class for the frame similarity gate & response cache of the llava prompts
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, hash_threshold=4, max_entries=32, max_age_seconds=60.0):
+        """a method for initializing the class
+            args: hash_threshold, differing bits of 64 still counted as the same frame, max_entries,
+                max_age_seconds, 0 to keep descriptions until they are evicted
+        """
+        self.hash_threshold = hash_threshold
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+
+        # (model, prompt, image_hash) -> (response, created_time), oldest first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.stats = {"hits": 0, "exact_hits": 0, "misses": 0, "expired": 0, "llava_calls_skipped": 0, "llava_seconds_saved": 0.0}
+        # the average llava call, for the time saved by each hit
+        self.llava_seconds_total = 0.0
+        self.llava_calls = 0
+
+    # -------------------------------------------------------------------------------------------------
+    def get(self, image_hash, model_name, prompt):
+        """ a method for getting the cached response of the nearest frame within hash_threshold
+            args: image_hash, model_name, prompt
+            returns: response, or None on a miss
+        """
+        if image_hash is None:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            best_key = None
+            best_distance = self.hash_threshold + 1
+            for key, (response, created_time) in list(self.entries.items()):
+                if self.max_age_seconds and now - created_time > self.max_age_seconds:
+                    del self.entries[key]
+                    self.stats["expired"] += 1
+                    continue
+                if key[0] != model_name or key[1] != prompt:
+                    continue
+                distance = perceptual_hash.hamming_distance(key[2], image_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(best_key)
+            self.stats["hits"] += 1
+            if best_distance == 0:
+                self.stats["exact_hits"] += 1
+            self.stats["llava_calls_skipped"] += 1
+            if self.llava_calls:
+                self.stats["llava_seconds_saved"] += self.llava_seconds_total / self.llava_calls
+            return self.entries[best_key][0]
+
+    # -------------------------------------------------------------------------------------------------
+    def put(self, image_hash, model_name, prompt, response, llava_seconds=None):
+        """ a method for caching the response of a frame, the least recently used frame is evicted
+            args: image_hash, model_name, prompt, response, llava_seconds, how long the llava call took
+            returns: none
+        """
+        with self.lock:
+            if llava_seconds is not None:
+                self.llava_seconds_total += llava_seconds
+                self.llava_calls += 1
+            if image_hash is None:
+                return
+            key = (model_name, prompt, image_hash)
+            self.entries[key] = (response, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # -------------------------------------------------------------------------------------------------
+    def clear(self):
+        """ a method for forgetting every cached response
+            args: none
+            returns: none
+        """
+        with self.lock:
+            self.entries.clear()
+
+    # -------------------------------------------------------------------------------------------------
+    def print_stats(self, colors):
+        """ a method for printing the gate & cache counters
+            args: colors
+            returns: none
+        """
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = f"{stats['hits'] / lookups:.0%}" if lookups else "-"
+        stats["llava_calls"] = self.llava_calls
+        stats["llava_seconds_average"] = round(self.llava_seconds_total / self.llava_calls, 2) if self.llava_calls else "-"
+        stats["llava_seconds_saved"] = round(stats["llava_seconds_saved"], 2)
+        stats["cached_frames"] = len(self.entries)
+        for key, value in stats.items():
+            print(colors['OKCYAN'] + f"{key}: " + colors['OKBLUE'] + f"{value}" + colors['END'])
+        return
@@ -0,0 +1,137 @@
+""" llava_vision_sampler.py
+
+        A class for describing the screen in the background while /llava flow is on. A worker thread
+    takes a screenshot every sample_seconds, has llava describe it, and keeps the latest description
+    with its time, so a prompt reads the freshest scene right away instead of waiting on the
+    screenshot & the multimodal inference before the text model starts. The describe function goes
+    through the llava response cache, so a screen that has not changed costs a screenshot & a hash.
+"""
+
+import time
+import threading
+
+# -------------------------------------------------------------------------------------------------
+class llava_vision_sampler:
+    """ a class for the background screenshot & llava description worker
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, screen_shot_collector_instance, describe_func, sample_seconds=2.0):
+        """a method for initializing the class
+            args: screen_shot_collector_instance, describe_func, called with the base64 screenshot & its
+                hash, returning its description, sample_seconds, from the start of one sample to the next
+        """
+        self.screen_shot_collector_instance = screen_shot_collector_instance
+        self.describe_func = describe_func
+        self.sample_seconds = sample_seconds
+
+        self.stop_event = threading.Event()
+        self.sampler_thread = None
+
+        # the latest scene description slot, notified on each new description
+        self.latest_lock = threading.Condition()
+        self.latest_description = None
+        self.latest_time = None
+
+        self.stats = {"samples": 0, "errors": 0, "last_sample_seconds": 0.0, "overruns": 0}
+
+    # -------------------------------------------------------------------------------------------------
+    def start(self):
+        """ a method for starting the sampler thread, a running sampler is left as it is
+            args: none
+            returns: none
+        """
+        if self.is_running():
+            return
+        # a new event per thread, so a stopped thread still finishing its llava call never restarts
+        self.stop_event = threading.Event()
+        with self.latest_lock:
+            self.latest_description = None
+            self.latest_time = None
+        self.sampler_thread = threading.Thread(target=self.sample_loop, args=(self.stop_event,), daemon=True)
+        self.sampler_thread.start()
+
+    # -------------------------------------------------------------------------------------------------
+    def stop(self):
+        """ a method for stopping the sampler thread, the llava call in flight finishes on its own
+            args: none
+            returns: none
+        """
+        self.stop_event.set()
+        self.sampler_thread = None
+
+    # -------------------------------------------------------------------------------------------------
+    def is_running(self):
+        """ a method for checking if the sampler thread is running
+            args: none
+            returns: running bool
+        """
+        return self.sampler_thread is not None and self.sampler_thread.is_alive() and not self.stop_event.is_set()
+
+    # -------------------------------------------------------------------------------------------------
+    def sample_loop(self, stop_event):
+        """ a method for the sampler thread, sampling until stop
+            args: stop_event
+            returns: none
+        """
+        while not stop_event.is_set():
+            start_time = time.perf_counter()
+            try:
+                screenshot_base64, screenshot_hash = self.screen_shot_collector_instance.take_screenshot()
+                description = self.describe_func(screenshot_base64, screenshot_hash)
+                if description and not description.startswith("Error") and not stop_event.is_set():
+                    with self.latest_lock:
+                        self.latest_description = description
+                        self.latest_time = time.monotonic()
+                        self.latest_lock.notify_all()
+                self.stats["samples"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Failed to sample the screen for llava. Reason: {e}")
+            sample_seconds = time.perf_counter() - start_time
+            self.stats["last_sample_seconds"] = round(sample_seconds, 2)
+            # a slow llava call runs the next sample right away
+            if sample_seconds >= self.sample_seconds:
+                self.stats["overruns"] += 1
+            stop_event.wait(max(0.0, self.sample_seconds - sample_seconds))
+
+    # -------------------------------------------------------------------------------------------------
+    def get_cycle_seconds(self):
+        """ a method for the observed time between two descriptions, a llava call slower than
+        sample_seconds sets the pace of the sampler
+            args: none
+            returns: cycle_seconds
+        """
+        return max(self.sample_seconds, self.stats["last_sample_seconds"])
+
+    # -------------------------------------------------------------------------------------------------
+    def get_latest_description(self, max_age_seconds=None, wait_seconds=0.0):
+        """ a method for reading the latest scene description, waiting up to wait_seconds for a fresh
+        one, right after the sampler starts
+            args: max_age_seconds, None for any age, wait_seconds
+            returns: description, or None when there is no description within max_age_seconds
+        """
+        def is_fresh():
+            if self.latest_description is None:
+                return False
+            return max_age_seconds is None or time.monotonic() - self.latest_time <= max_age_seconds
+
+        with self.latest_lock:
+            if not is_fresh() and (wait_seconds <= 0 or not self.latest_lock.wait_for(is_fresh, wait_seconds)):
+                return None
+            return self.latest_description
+
+    # -------------------------------------------------------------------------------------------------
+    def print_stats(self, colors):
+        """ a method for printing the sampler counters
+            args: colors
+            returns: none
+        """
+        stats = dict(self.stats)
+        stats["running"] = self.is_running()
+        stats["sample_seconds"] = self.sample_seconds
+        stats["cycle_seconds"] = self.get_cycle_seconds()
+        with self.latest_lock:
+            stats["description_age_seconds"] = round(time.monotonic() - self.latest_time, 1) if self.latest_time is not None else "-"
+        for key, value in stats.items():
+            print(colors['OKCYAN'] + f"{key}: " + colors['OKBLUE'] + f"{value}" + colors['END'])
+        return
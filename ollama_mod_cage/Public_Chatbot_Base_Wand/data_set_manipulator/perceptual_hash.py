@@ -0,0 +1,47 @@
+""" perceptual_hash.py
+
+        A class for the difference hash of an image, the image is shrunk to hash_size + 1 by hash_size
+    gray pixels and each bit is set where a pixel is brighter than its right neighbour. Resizing,
+    recompression & small changes of the frame flip few of the 64 bits, so near identical frames are
+    found by the hamming distance of their hashes instead of comparing pixels.
+"""
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+Image = lazy_module("PIL.Image")
+
+# -------------------------------------------------------------------------------------------------
+class perceptual_hash:
+    """ a class for the difference hash of an image & the distance between two hashes
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, hash_size=8):
+        """a method for initializing the class
+            args: hash_size, hash_size * hash_size bits per hash
+        """
+        self.hash_size = hash_size
+
+    # -------------------------------------------------------------------------------------------------
+    def dhash(self, image):
+        """ a method for getting the difference hash of an image
+            args: image, a PIL image
+            returns: image_hash int
+        """
+        gray_image = image.convert("L").resize((self.hash_size + 1, self.hash_size), Image.BILINEAR)
+        pixels = gray_image.tobytes()
+        image_hash = 0
+        row_width = self.hash_size + 1
+        for row in range(self.hash_size):
+            row_pixels = pixels[row * row_width:(row + 1) * row_width]
+            for column in range(self.hash_size):
+                image_hash = (image_hash << 1) | (row_pixels[column] > row_pixels[column + 1])
+        return image_hash
+
+    # -------------------------------------------------------------------------------------------------
+    @staticmethod
+    def hamming_distance(hash_a, hash_b):
+        """ a method for counting the bits that differ between two hashes
+            args: hash_a, hash_b
+            returns: distance
+        """
+        return bin(hash_a ^ hash_b).count("1")
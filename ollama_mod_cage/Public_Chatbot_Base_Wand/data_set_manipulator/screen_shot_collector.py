@@ -1,40 +1,98 @@
 """ screen_shot_collector.py
+
+        A class for taking the screenshots sent to the llava model. The screenshot is kept in memory,
+    downscaled to the input resolution of the vision model and encoded once, as a jpeg by default,
+    straight to the base64 string sent in the ollama request, so no file is written, read back or
+    waited on between the screenshot & the prompt.
 """
-import os
-import glob
-import pyautogui
+import io
 import time
+import base64
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+from Public_Chatbot_Base_Wand.data_set_manipulator.perceptual_hash import perceptual_hash
+
+pyautogui = lazy_module("pyautogui")
+Image = lazy_module("PIL.Image")
 # -------------------------------------------------------------------------------------------------
 class screen_shot_collector:
     # -------------------------------------------------------------------------------------------------
     def __init__(self, developer_tools_dict):
-        """a method for initializing the class
+        """a method for initializing the class, set llava_image_max_size, llava_image_format &
+        llava_image_quality in developer_custom.json
         """
         self.developer_tools_dict = developer_tools_dict
         self.current_dir = self.developer_tools_dict['current_dir']
         self.parent_dir = self.developer_tools_dict['parent_dir']
         self.pipeline = self.developer_tools_dict['ignored_pipeline_dir']
+        self.llava_library = self.developer_tools_dict['llava_library_dir']
+
+        # llava 1.6 tiles up to 672 pixels, larger screenshots only cost encode & upload time
+        self.image_max_size = int(self.developer_tools_dict.get('llava_image_max_size') or 672)
+        self.image_format = str(self.developer_tools_dict.get('llava_image_format') or "JPEG").upper()
+        self.image_quality = int(self.developer_tools_dict.get('llava_image_quality') or 85)
+
+        # the latest screenshot, base64 encoded for the llava request, with its difference hash, read
+        # together through latest_screenshot so a description is never keyed by a newer hash
+        self.screenshot_base64 = None
+        self.screenshot_hash = None
+        self.latest_screenshot = None
+        self.perceptual_hash_instance = perceptual_hash()
+        self.stats = {"screenshots": 0, "capture_ms": 0.0, "encode_ms": 0.0, "image_bytes": 0}
+
     # -------------------------------------------------------------------------------------------------
     def get_screenshot(self):
-        """ a method for taking a screenshot
+        """ a method for taking a screenshot, kept in memory as screenshot_base64 & screenshot_hash
             args: none
-            returns: none
+            returns: screen_shot_flag
         """
-        # Clear the llava_library directory
-        files = glob.glob(os.path.join(self.llava_library, '*'))
-        for f in files:
-            os.remove(f)
+        self.take_screenshot()
+        screen_shot_flag = True
+        return screen_shot_flag
 
-        # Take a screenshot using PyAutoGUI
+    # -------------------------------------------------------------------------------------------------
+    def take_screenshot(self):
+        """ a method for taking a screenshot & returning it with its own hash
+            args: none
+            returns: (screenshot_base64, screenshot_hash)
+        """
+        start_time = time.perf_counter()
         user_screen = pyautogui.screenshot()
+        capture_time = time.perf_counter()
+        user_screen = self.downscale_image(user_screen)
+        screenshot_hash = self.perceptual_hash_instance.dhash(user_screen)
+        screenshot_base64 = self.encode_image(user_screen)
+        self.latest_screenshot = (screenshot_base64, screenshot_hash)
+        self.screenshot_base64, self.screenshot_hash = screenshot_base64, screenshot_hash
+        self.stats["screenshots"] += 1
+        self.stats["capture_ms"] = round((capture_time - start_time) * 1000, 1)
+        self.stats["encode_ms"] = round((time.perf_counter() - capture_time) * 1000, 1)
+        return screenshot_base64, screenshot_hash
 
-        # Create a path for the screenshot in the llava_library directory
-        self.screenshot_path = os.path.join(self.llava_library, 'screenshot.png')
-
-        # Save the screenshot to the file
-        user_screen.save(self.screenshot_path)
+    # -------------------------------------------------------------------------------------------------
+    def downscale_image(self, image):
+        """ a method for downscaling an image to image_max_size
+            args: image, a PIL image
+            returns: image
+        """
+        # jpeg has no alpha channel
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        # reducing_gap shrinks by whole factors first, much faster than a full resample of a 4k screen
+        image.thumbnail((self.image_max_size, self.image_max_size), Image.BILINEAR, reducing_gap=2.0)
+        return image
 
-        # Add a delay to ensure the screenshot is saved before it is read
-        time.sleep(1)  # delay for 1 second
-        screen_shot_flag = True
-        return screen_shot_flag
\ No newline at end of file
+    # -------------------------------------------------------------------------------------------------
+    def encode_image(self, image):
+        """ a method for encoding a downscaled image to base64
+            args: image, a PIL image
+            returns: image_base64
+        """
+        image_buffer = io.BytesIO()
+        if self.image_format == "PNG":
+            image.save(image_buffer, format="PNG")
+        else:
+            image.save(image_buffer, format=self.image_format, quality=self.image_quality)
+        image_bytes = image_buffer.getvalue()
+        self.stats["image_bytes"] = len(image_bytes)
+        return base64.b64encode(image_bytes).decode("ascii")
@@ -0,0 +1,293 @@
+""" video_frame_extractor.py
+
+        A class for extracting a frame every interval_seconds from a library of videos. Each video is
+    decoded front to back in one ffmpeg pass, and ffmpeg's fps filter drops the frames in between,
+    so no frame costs a seek & a decode from the previous keyframe. The videos are shared across a
+    pool of spawned worker processes, ffmpeg's decode threads are divided between them, and in each
+    worker the frames are compressed & written by a small thread pool behind a bounded queue so the
+    decoder never waits on the disk and memory stays flat. A checkpoint file in each video's image
+    directory lets an interrupted run continue from the last written frame. With dedup_mode on, each
+    frame is looked up in the frame dedup index of the image set before it is written, and a near
+    duplicate of a kept frame is dropped, or hard linked to the kept frame's file.
+"""
+
+import os
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+from Public_Chatbot_Base_Wand.data_set_manipulator.perceptual_hash import perceptual_hash
+from Public_Chatbot_Base_Wand.data_set_manipulator.frame_dedup_index import frame_dedup_index
+
+imageio_ffmpeg = lazy_module("imageio_ffmpeg")
+Image = lazy_module("PIL.Image")
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm")
+CHECKPOINT_FILE_NAME = "extract_checkpoint.json"
+DEDUP_MODES = ("off", "drop", "link")
+
+# -------------------------------------------------------------------------------------------------
+def extract_video_in_worker(video_path, image_dir, interval_seconds, image_format, writer_threads, writer_queue_depth, decode_threads, checkpoint_frames,
+                            dedup_mode="off", dedup_threshold=3):
+    """ a method for extracting the frames of one video in a pool worker process
+        args: video_path, image_dir, interval_seconds, image_format, writer_threads, writer_queue_depth,
+            decode_threads, checkpoint_frames, dedup_mode, dedup_threshold
+        returns: result dict
+    """
+    video_frame_extractor_instance = video_frame_extractor(image_dir, interval_seconds, image_format, video_workers=1,
+                                                           writer_threads=writer_threads, writer_queue_depth=writer_queue_depth, checkpoint_frames=checkpoint_frames,
+                                                           dedup_mode=dedup_mode, dedup_threshold=dedup_threshold)
+    return video_frame_extractor_instance.extract_video(video_path, decode_threads)
+
+# -------------------------------------------------------------------------------------------------
+class video_frame_extractor:
+    """ a class for sequential, parallel & resumable frame extraction from videos
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, image_dir, interval_seconds=10, image_format="png", video_workers=0, writer_threads=4, writer_queue_depth=32, checkpoint_frames=50,
+                 dedup_mode="off", dedup_threshold=3):
+        """a method for initializing the class
+            args: image_dir, interval_seconds, image_format, png, jpg or webp, video_workers, videos
+                extracted at once, 0 for half the cpu cores, writer_threads, writer_queue_depth, frames
+                waiting to be written, checkpoint_frames, frames between checkpoints, dedup_mode, off,
+                drop or link, dedup_threshold, differing hash bits still counted as a duplicate
+        """
+        self.image_dir = image_dir
+        self.interval_seconds = float(interval_seconds)
+        self.image_format = image_format.lower().lstrip(".")
+        self.video_workers = int(video_workers) or max(1, (os.cpu_count() or 2) // 2)
+        self.writer_threads = max(1, int(writer_threads))
+        self.writer_queue_depth = max(1, int(writer_queue_depth))
+        self.checkpoint_frames = max(1, int(checkpoint_frames))
+        self.dedup_mode = dedup_mode.lower() if dedup_mode.lower() in DEDUP_MODES else "off"
+        self.dedup_threshold = int(dedup_threshold)
+        self.dedup_index_path = os.path.join(self.image_dir, frame_dedup_index.INDEX_FILE_NAME)
+        self.perceptual_hash_instance = perceptual_hash()
+
+    # -------------------------------------------------------------------------------------------------
+    def extract_videos(self, video_dir):
+        """ a method for extracting the frames of every video in video_dir, across the worker processes
+            args: video_dir
+            returns: list of result dicts
+        """
+        video_paths = sorted(os.path.join(video_dir, video_file) for video_file in os.listdir(video_dir) if video_file.lower().endswith(VIDEO_EXTENSIONS))
+        if not video_paths:
+            print(f"No videos found in {video_dir}")
+            return []
+        num_workers = min(self.video_workers, len(video_paths))
+        # ffmpeg decodes with every core by default, split them between the videos
+        decode_threads = max(1, (os.cpu_count() or 2) // num_workers)
+        start_time = time.perf_counter()
+        results = []
+        if num_workers == 1:
+            for video_path in video_paths:
+                results.append(self.extract_video(video_path, decode_threads))
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                futures = {executor.submit(extract_video_in_worker, video_path, self.image_dir, self.interval_seconds, self.image_format,
+                                           self.writer_threads, self.writer_queue_depth, decode_threads, self.checkpoint_frames,
+                                           self.dedup_mode, self.dedup_threshold): video_path
+                           for video_path in video_paths}
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        print(f"Failed to extract the frames of {futures[future]}. Reason: {e}")
+        total_frames = sum(result["frames"] for result in results)
+        print(f"Extracted {total_frames} frames from {len(results)} of {len(video_paths)} videos in {time.perf_counter() - start_time:.1f}s with {num_workers} workers")
+        if self.dedup_mode != "off":
+            total_duplicates = sum(result["duplicates"] for result in results)
+            print(f"{total_duplicates} of {total_frames} frames were near duplicates ({total_duplicates / total_frames if total_frames else 0.0:.1%}), "
+                  f"dedup ratio of the image set: {self.get_dedup_stats()['dedup_ratio']:.1%}")
+        return results
+
+    # -------------------------------------------------------------------------------------------------
+    def extract_video(self, video_path, decode_threads=0):
+        """ a method for extracting a frame every interval_seconds from one video, from its checkpoint
+            args: video_path, decode_threads, 0 for ffmpeg's default
+            returns: result dict, video, frames, duplicates, start_seconds, seconds & skipped
+        """
+        start_time = time.perf_counter()
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        video_image_dir = os.path.join(self.image_dir, video_name)
+        os.makedirs(video_image_dir, exist_ok=True)
+
+        video_stat = os.stat(video_path)
+        checkpoint = {"video_size": video_stat.st_size, "video_mtime": video_stat.st_mtime, "interval_seconds": self.interval_seconds,
+                      "image_format": self.image_format, "next_seconds": 0.0, "done": False}
+        saved_checkpoint = self.read_checkpoint(video_image_dir)
+        # a checkpoint of the same video & settings is continued, anything else starts over
+        if saved_checkpoint is not None and all(saved_checkpoint.get(key) == checkpoint[key] for key in ("video_size", "video_mtime", "interval_seconds", "image_format")):
+            checkpoint = saved_checkpoint
+        result = {"video": video_path, "frames": 0, "duplicates": 0, "start_seconds": checkpoint["next_seconds"], "seconds": 0.0, "skipped": checkpoint["done"]}
+        if checkpoint["done"]:
+            print(f"Frames already extracted in directory {video_image_dir}")
+            return result
+
+        input_params = ["-threads", str(decode_threads)] if decode_threads else []
+        skip_frames = 0
+        if checkpoint["next_seconds"] > 0:
+            # the one seek of the run, an interval before the first frame not yet written, the first
+            # decoded frame lands just after the seek point, so that slot is padded & dropped and the
+            # next one is the frame at next_seconds
+            input_params += ["-ss", f"{checkpoint['next_seconds'] - self.interval_seconds:.3f}"]
+            skip_frames = 1
+        # round=up keeps the last frame at or before each n * interval_seconds, ffmpeg's default rounds
+        # to the nearest slot and would take the frame half an interval later
+        frame_reader = imageio_ffmpeg.read_frames(video_path, pix_fmt="rgb24", input_params=input_params,
+                                                  output_params=["-vf", f"fps=1/{self.interval_seconds}:round=up:start_time=0"])
+        frame_meta = next(frame_reader)
+        frame_size = frame_meta["size"]
+        # frames up to the last whole second, the same times as range(0, int(duration), interval)
+        end_seconds = int(frame_meta["duration"]) if frame_meta.get("duration") else None
+
+        # each process opens its own connection, the index serializes the processes' inserts
+        dedup_index = frame_dedup_index(self.dedup_index_path, self.dedup_threshold) if self.dedup_mode != "off" else None
+        writer_slots = threading.BoundedSemaphore(self.writer_queue_depth)
+        pending_writes = []
+        with ThreadPoolExecutor(max_workers=self.writer_threads) as writer_pool:
+            try:
+                for frame_bytes in frame_reader:
+                    if skip_frames:
+                        skip_frames -= 1
+                        continue
+                    frame_seconds = checkpoint["next_seconds"]
+                    if end_seconds is not None and frame_seconds >= end_seconds:
+                        break
+                    frame_path = os.path.join(video_image_dir, f"frame_{self.format_seconds(frame_seconds)}.{self.image_format}")
+                    # blocks while writer_queue_depth frames are waiting, the decoder runs at the disk's pace
+                    writer_slots.acquire()
+                    future = writer_pool.submit(self.write_frame, frame_bytes, frame_size, frame_path, video_name, dedup_index)
+                    future.add_done_callback(lambda done_future: writer_slots.release())
+                    pending_writes.append(future)
+                    checkpoint["next_seconds"] = frame_seconds + self.interval_seconds
+                    result["frames"] += 1
+                    if result["frames"] % self.checkpoint_frames == 0:
+                        result["duplicates"] += self.flush_writes(pending_writes)
+                        self.write_checkpoint(video_image_dir, checkpoint)
+            finally:
+                frame_reader.close()
+                try:
+                    result["duplicates"] += self.flush_writes(pending_writes)
+                finally:
+                    if dedup_index is not None:
+                        dedup_index.close()
+        checkpoint["done"] = True
+        self.write_checkpoint(video_image_dir, checkpoint)
+
+        result["seconds"] = round(time.perf_counter() - start_time, 2)
+        dedup_note = f", {result['duplicates']} near duplicates {'dropped' if self.dedup_mode == 'drop' else 'linked'}" if dedup_index is not None else ""
+        print(f"{result['frames']} frames saved in directory {video_image_dir} in {result['seconds']}s{dedup_note}")
+        return result
+
+    # -------------------------------------------------------------------------------------------------
+    def write_frame(self, frame_bytes, frame_size, frame_path, video_name=None, dedup_index=None):
+        """ a method for compressing & writing one frame, run on the writer threads, a near duplicate of
+        a kept frame in dedup_index is dropped or hard linked instead
+            args: frame_bytes, rgb24, frame_size, (width, height), frame_path, video_name, dedup_index
+            returns: duplicate bool
+        """
+        frame_image = Image.frombytes("RGB", tuple(frame_size), frame_bytes)
+        duplicate_path = None
+        if dedup_index is not None:
+            image_hash = self.perceptual_hash_instance.dhash(frame_image)
+            duplicate_path = dedup_index.add_frame(os.path.relpath(frame_path, self.image_dir), video_name, image_hash)
+            # a kept frame still being written by another thread or process is not linked yet, the
+            # duplicate is then written as its own file
+            if duplicate_path is not None and (self.dedup_mode == "drop" or self.link_frame(os.path.join(self.image_dir, duplicate_path), frame_path)):
+                return True
+        if self.image_format in ("jpg", "jpeg", "webp"):
+            frame_image.save(frame_path, quality=95)
+        else:
+            frame_image.save(frame_path)
+        return duplicate_path is not None
+
+    # -------------------------------------------------------------------------------------------------
+    def link_frame(self, kept_frame_path, frame_path):
+        """ a method for hard linking a duplicate frame to the file of its kept frame
+            args: kept_frame_path, frame_path
+            returns: linked bool
+        """
+        if not os.path.exists(kept_frame_path):
+            return False
+        try:
+            if os.path.lexists(frame_path):
+                os.remove(frame_path)
+            os.link(kept_frame_path, frame_path)
+            return True
+        except OSError as e:
+            print(f"Failed to link {frame_path} to {kept_frame_path}. Reason: {e}")
+            return False
+
+    # -------------------------------------------------------------------------------------------------
+    def flush_writes(self, pending_writes):
+        """ a method for waiting on the frames being written, raising the first write error
+            args: pending_writes, list of futures, emptied
+            returns: number of near duplicate frames
+        """
+        wait(pending_writes)
+        duplicates = sum(1 for future in pending_writes if future.result())
+        pending_writes.clear()
+        return duplicates
+
+    # -------------------------------------------------------------------------------------------------
+    def get_dedup_stats(self):
+        """ a method for reading the dedup counters of the whole image set from its index
+            args: none
+            returns: stats dict
+        """
+        dedup_index = frame_dedup_index(self.dedup_index_path, self.dedup_threshold)
+        try:
+            return dedup_index.get_stats()
+        finally:
+            dedup_index.close()
+
+    # -------------------------------------------------------------------------------------------------
+    def print_dedup_stats(self, colors):
+        """ a method for printing the dedup counters of the image set
+            args: colors
+            returns: none
+        """
+        if not os.path.exists(self.dedup_index_path):
+            print(colors['OKCYAN'] + f"No frame dedup index in {self.image_dir}, set splice_dedup_mode to drop or link" + colors['END'])
+            return
+        dedup_index = frame_dedup_index(self.dedup_index_path, self.dedup_threshold)
+        try:
+            print(colors['OKCYAN'] + "dedup_mode: " + colors['OKBLUE'] + f"{self.dedup_mode}" + colors['END'])
+            dedup_index.print_stats(colors)
+        finally:
+            dedup_index.close()
+
+    # -------------------------------------------------------------------------------------------------
+    def format_seconds(self, frame_seconds):
+        """ a method for the frame time in the frame file name, whole seconds when the interval is whole
+            args: frame_seconds
+            returns: seconds string
+        """
+        return f"{int(round(frame_seconds))}" if self.interval_seconds.is_integer() else f"{frame_seconds:.2f}"
+
+    # -------------------------------------------------------------------------------------------------
+    def read_checkpoint(self, video_image_dir):
+        """ a method for reading the checkpoint of a video
+            args: video_image_dir
+            returns: checkpoint dict, or None
+        """
+        try:
+            with open(os.path.join(video_image_dir, CHECKPOINT_FILE_NAME), "r") as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+
+    # -------------------------------------------------------------------------------------------------
+    def write_checkpoint(self, video_image_dir, checkpoint):
+        """ a method for writing the checkpoint of a video, replaced atomically
+            args: video_image_dir, checkpoint
+            returns: none
+        """
+        checkpoint_path = os.path.join(video_image_dir, CHECKPOINT_FILE_NAME)
+        with open(checkpoint_path + ".tmp", "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
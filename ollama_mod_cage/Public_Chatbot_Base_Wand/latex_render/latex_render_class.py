@@ -8,21 +8,24 @@ import queue
 import shutil
 import threading
 import subprocess
-import tkinter as tk
-import customtkinter as ctk
 import random
 
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+# heavy gui dependencies are imported on first use
+tk = lazy_module("tkinter")
+ctk = lazy_module("customtkinter")
+matplotlib_figure = lazy_module("matplotlib.figure")
+backend_tkagg = lazy_module("matplotlib.backends.backend_tkagg")
 
 class latex_render_class:
     def __init__(self):
         self.root = ctk.CTk()  # Use CTk instead of Tk
         self.root.configure(bg='black')  # Set the background color of the CTk window to black
 
-        self.fig = Figure(figsize=(5, 5), dpi=100)
+        self.fig = matplotlib_figure.Figure(figsize=(5, 5), dpi=100)
         self.fig.patch.set_facecolor('black')  # Set the background color of the figure to black
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
+        self.canvas = backend_tkagg.FigureCanvasTkAgg(self.fig, master=self.root)
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(side=ctk.TOP, fill=ctk.BOTH, expand=1)  # Use CTk constants instead of Tk constants
         self.latex_response = ""
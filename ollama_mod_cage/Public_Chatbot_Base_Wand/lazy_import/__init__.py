@@ -0,0 +1,2 @@
+#__init__.py
+from .lazy_module import lazy_module
\ No newline at end of file
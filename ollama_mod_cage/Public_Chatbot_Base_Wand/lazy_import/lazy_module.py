@@ -0,0 +1,66 @@
+""" lazy_module.py
+
+        A class for deferring the heavy imports of the wand subsystems until their first use,
+    torch, coqui-tts, pyaudio, speech recognition, matplotlib, customtkinter and imageio_ffmpeg are only
+    imported when a session actually speaks, listens, renders latex or splices video, so text only
+    launches with /leap on start without paying for them.
+
+        usage:
+            torch = lazy_module("torch")
+            torch.cuda.is_available()  # torch is imported here
+"""
+
+import time
+import importlib
+import threading
+
+# -------------------------------------------------------------------------------------------------
+class lazy_module:
+    """ a class standing in for a module until the first attribute access imports it
+    """
+    # module name -> seconds spent importing on first use
+    load_times = {}
+    load_lock = threading.Lock()
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, module_name):
+        """a method for initializing the class
+            args: module_name
+        """
+        self.__dict__["module_name"] = module_name
+        self.__dict__["module"] = None
+
+    # -------------------------------------------------------------------------------------------------
+    def _load_module(self):
+        """ a method for importing the module on first use, private so a module's own load, such as
+        torch.load, is still forwarded to the module
+            args: none
+            returns: module
+        """
+        module = self.__dict__["module"]
+        if module is None:
+            with lazy_module.load_lock:
+                module = self.__dict__["module"]
+                if module is None:
+                    start_time = time.perf_counter()
+                    module = importlib.import_module(self.__dict__["module_name"])
+                    lazy_module.load_times[self.__dict__["module_name"]] = time.perf_counter() - start_time
+                    self.__dict__["module"] = module
+        return module
+
+    # -------------------------------------------------------------------------------------------------
+    def __getattr__(self, name):
+        """ a method for forwarding attribute access to the imported module
+        """
+        return getattr(object.__getattribute__(self, "_load_module")(), name)
+
+    # -------------------------------------------------------------------------------------------------
+    def __setattr__(self, name, value):
+        """ a method for forwarding attribute assignment to the imported module
+        """
+        setattr(object.__getattribute__(self, "_load_module")(), name, value)
+
+    # -------------------------------------------------------------------------------------------------
+    def __repr__(self):
+        state = "loaded" if self.__dict__["module"] is not None else "not loaded"
+        return f"<lazy_module {self.__dict__['module_name']} ({state})>"
@@ -0,0 +1,73 @@
+""" startup_benchmark.py
+
+        A startup benchmark for ollama_agent_roll_cage, each module is imported in a fresh python
+    process so the reported time is the real cold import cost of that module alone. Run from the
+    ollama_mod_cage directory:
+
+        python -m Public_Chatbot_Base_Wand.lazy_import.startup_benchmark
+"""
+
+import os
+import sys
+import subprocess
+
+# the chatbot & wand modules, followed by the heavy dependencies they defer
+BENCHMARK_MODULES = [
+    "ollama_chatbot_base",
+    "Public_Chatbot_Base_Wand.ollama_add_on_library",
+    "Public_Chatbot_Base_Wand.speech_to_speech",
+    "Public_Chatbot_Base_Wand.latex_render",
+    "Public_Chatbot_Base_Wand.data_set_manipulator",
+    "Public_Chatbot_Base_Wand.create_convert_model",
+    "Public_Chatbot_Base_Wand.chat_history",
+    "ollama",
+    "numpy",
+    "torch",
+    "TTS.api",
+    "sounddevice",
+    "soundfile",
+    "pyaudio",
+    "speech_recognition",
+    "keyboard",
+    "pyautogui",
+    "matplotlib.figure",
+    "customtkinter",
+    "imageio_ffmpeg",
+]
+
+IMPORT_TIMER = "import time; start_time = time.perf_counter(); import {module_name}; print(time.perf_counter() - start_time)"
+
+# -------------------------------------------------------------------------------------------------
+def benchmark_import_time(module_name, ollama_mod_cage_dir, repeats=3):
+    """ a method for timing the cold import of a module
+        args: module_name, ollama_mod_cage_dir, repeats
+        returns: best import time in seconds, or None if the module failed to import
+    """
+    import_times = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", IMPORT_TIMER.format(module_name=module_name)],
+                                cwd=ollama_mod_cage_dir, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        import_times.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(import_times)
+
+# -------------------------------------------------------------------------------------------------
+def run_startup_benchmark(module_names=None):
+    """ a method for printing the cold import time of each module
+        args: module_names
+        returns: import_times dict
+    """
+    ollama_mod_cage_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+    import_times = {}
+    for module_name in module_names or BENCHMARK_MODULES:
+        import_time = benchmark_import_time(module_name, ollama_mod_cage_dir)
+        import_times[module_name] = import_time
+        if import_time is None:
+            print(f"{module_name:<50} failed to import")
+        else:
+            print(f"{module_name:<50} {import_time * 1000:10.1f} ms")
+    return import_times
+
+if __name__ == "__main__":
+    run_startup_benchmark(sys.argv[1:])
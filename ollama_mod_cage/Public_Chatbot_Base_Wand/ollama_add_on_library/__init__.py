@@ -1,2 +1,3 @@
 #__init__.py
-from .ollama_commands import ollama_commands
\ No newline at end of file
+from .ollama_commands import ollama_commands
+from .ollama_client_manager import ollama_client_manager
@@ -0,0 +1,255 @@
+""" ollama_client_manager.py
+
+        A class for sharing one ollama client per server across the process, instead of the module
+    level default client. The client keeps its http connections alive in a pool, so each prompt
+    reuses a warm connection to the ollama server, and the host & timeout come from ollama_url &
+    ollama_timeout in developer_custom.json. Every chatbot instance asking for the same host &
+    timeout gets the same manager. An async client is kept per event loop for the session engine,
+    and the latency of every request, and the first token latency of streamed chats, is kept for
+    /ollama stats.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+ollama = lazy_module("ollama")
+httpx = lazy_module("httpx")
+
+# -------------------------------------------------------------------------------------------------
+class ollama_client_manager:
+    """ a class for the shared, connection pooled ollama clients and their request latency
+    """
+    DEFAULT_HOST = "http://localhost:11434"
+    DEFAULT_TIMEOUT = 300.0
+
+    # (host, timeout) -> shared manager
+    shared_instances = {}
+    shared_instances_lock = threading.Lock()
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, host=None, timeout=None, max_connections=10):
+        """a method for initializing the class
+            args: host, ollama server url, timeout seconds, max_connections, kept alive in the pool
+        """
+        self.host = host or self.DEFAULT_HOST
+        self.timeout = float(timeout) if timeout else self.DEFAULT_TIMEOUT
+        self.max_connections = max_connections
+
+        self.client = None
+        self.client_lock = threading.Lock()
+        # httpx async connections belong to the loop they were opened on
+        self.async_clients = weakref.WeakKeyDictionary()
+
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    # -------------------------------------------------------------------------------------------------
+    @classmethod
+    def get_shared(cls, developer_tools_dict):
+        """ a method for getting the manager shared by every chatbot talking to the same server
+            args: developer_tools_dict
+            returns: ollama_client_manager_instance
+        """
+        host = cls.get_host(developer_tools_dict.get('ollama_url'))
+        timeout = float(developer_tools_dict.get('ollama_timeout') or cls.DEFAULT_TIMEOUT)
+        with cls.shared_instances_lock:
+            if (host, timeout) not in cls.shared_instances:
+                cls.shared_instances[(host, timeout)] = cls(host, timeout)
+            return cls.shared_instances[(host, timeout)]
+
+    # -------------------------------------------------------------------------------------------------
+    @classmethod
+    def get_host(cls, ollama_url):
+        """ a method for getting the server host from the ollama url, the api path is dropped
+            args: ollama_url, like http://localhost:11434/api/chat, falls back to OLLAMA_HOST
+            returns: host
+        """
+        ollama_url = ollama_url or os.environ.get("OLLAMA_HOST")
+        if not ollama_url:
+            return cls.DEFAULT_HOST
+        if "://" not in ollama_url:
+            ollama_url = f"http://{ollama_url}"
+        url_parts = urlsplit(ollama_url)
+        return f"{url_parts.scheme}://{url_parts.netloc}"
+
+    # -------------------------------------------------------------------------------------------------
+    def get_client(self):
+        """ a method for getting the keep-alive client, built on first use
+            args: none
+            returns: client
+        """
+        with self.client_lock:
+            if self.client is None:
+                limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+                self.client = ollama.Client(host=self.host, timeout=self.timeout, limits=limits)
+            return self.client
+
+    # -------------------------------------------------------------------------------------------------
+    def get_async_client(self):
+        """ a method for getting the keep-alive async client of the running event loop
+            args: none
+            returns: async_client
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self.async_clients:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self.async_clients[loop] = ollama.AsyncClient(host=self.host, timeout=self.timeout, limits=limits)
+        return self.async_clients[loop]
+
+    # -------------------------------------------------------------------------------------------------
+    def chat(self, **kwargs):
+        """ a method for the chat api, a streamed chat is timed until the stream is done or closed
+            args: model, messages, stream, ... as for ollama.chat
+            returns: response, or a generator of chunks when stream is True
+        """
+        start_time = time.perf_counter()
+        try:
+            response = self.get_client().chat(**kwargs)
+        except Exception:
+            self.record_latency("chat", start_time, failed=True)
+            raise
+        if kwargs.get("stream") is True:
+            return self.timed_stream(response, start_time)
+        self.record_latency("chat", start_time)
+        return response
+
+    # -------------------------------------------------------------------------------------------------
+    def timed_stream(self, response_stream, start_time):
+        """ a method for passing the chunks of a streamed chat through the latency counters, closing
+        this generator closes the response so ollama stops generating
+            args: response_stream, start_time
+            returns: generator of chunks
+        """
+        failed = False
+        first_chunk = True
+        try:
+            for chunk in response_stream:
+                if first_chunk:
+                    first_chunk = False
+                    self.record_latency("chat_first_token", start_time)
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if hasattr(response_stream, "close"):
+                response_stream.close()
+            self.record_latency("chat_stream", start_time, failed=failed)
+
+    # -------------------------------------------------------------------------------------------------
+    async def async_chat(self, **kwargs):
+        """ a method for the chat api on the async client
+            args: model, messages, stream, ... as for ollama.chat
+            returns: response, or an async generator of chunks when stream is True
+        """
+        start_time = time.perf_counter()
+        try:
+            response = await self.get_async_client().chat(**kwargs)
+        except Exception:
+            self.record_latency("async_chat", start_time, failed=True)
+            raise
+        if kwargs.get("stream") is True:
+            return self.async_timed_stream(response, start_time)
+        self.record_latency("async_chat", start_time)
+        return response
+
+    # -------------------------------------------------------------------------------------------------
+    async def async_timed_stream(self, response_stream, start_time):
+        """ a method for passing the chunks of an async streamed chat through the latency counters
+            args: response_stream, start_time
+            returns: async generator of chunks
+        """
+        failed = False
+        first_chunk = True
+        try:
+            async for chunk in response_stream:
+                if first_chunk:
+                    first_chunk = False
+                    self.record_latency("async_chat_first_token", start_time)
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if hasattr(response_stream, "aclose"):
+                await response_stream.aclose()
+            self.record_latency("async_chat_stream", start_time, failed=failed)
+
+    # -------------------------------------------------------------------------------------------------
+    def show(self, model):
+        """ a method for the show api
+            args: model
+            returns: modelfile_data
+        """
+        return self.timed_request("show", self.get_client().show, model)
+
+    # -------------------------------------------------------------------------------------------------
+    def list(self):
+        """ a method for the list api
+            args: none
+            returns: model list
+        """
+        return self.timed_request("list", self.get_client().list)
+
+    # -------------------------------------------------------------------------------------------------
+    def timed_request(self, operation, request, *args):
+        """ a method for timing a request
+            args: operation name, request function, *args
+            returns: the request result
+        """
+        start_time = time.perf_counter()
+        try:
+            result = request(*args)
+        except Exception:
+            self.record_latency(operation, start_time, failed=True)
+            raise
+        self.record_latency(operation, start_time)
+        return result
+
+    # -------------------------------------------------------------------------------------------------
+    def record_latency(self, operation, start_time, failed=False):
+        """ a method for adding a request to the latency counters
+            args: operation, start_time, failed
+            returns: none
+        """
+        latency = time.perf_counter() - start_time
+        with self.stats_lock:
+            operation_stats = self.stats.setdefault(operation, {"requests": 0, "failures": 0, "latency_seconds": 0.0, "max_latency_seconds": 0.0, "last_latency_seconds": 0.0})
+            operation_stats["requests"] += 1
+            operation_stats["failures"] += 1 if failed else 0
+            operation_stats["latency_seconds"] += latency
+            operation_stats["max_latency_seconds"] = max(operation_stats["max_latency_seconds"], latency)
+            operation_stats["last_latency_seconds"] = latency
+
+    # -------------------------------------------------------------------------------------------------
+    def get_stats(self):
+        """ a method for getting a copy of the latency counters
+            args: none
+            returns: stats dict, operation -> counters
+        """
+        with self.stats_lock:
+            return {operation: dict(operation_stats) for operation, operation_stats in self.stats.items()}
+
+    # -------------------------------------------------------------------------------------------------
+    def print_stats(self, colors):
+        """ a method for printing the request latency of each api used
+            args: colors
+            returns: none
+        """
+        stats = self.get_stats()
+        print(colors['OKCYAN'] + f"ollama host: {self.host}, timeout: {self.timeout:.0f}s" + colors['END'])
+        if not stats:
+            print(colors['OKCYAN'] + "no ollama requests yet" + colors['END'])
+            return
+        print(f"{'request':<24}{'count':>8}{'failures':>10}{'avg s':>9}{'max s':>9}{'last s':>9}")
+        for operation, operation_stats in stats.items():
+            average_latency = operation_stats["latency_seconds"] / operation_stats["requests"]
+            print(f"{operation:<24}{operation_stats['requests']:>8}{operation_stats['failures']:>10}{average_latency:>9.3f}"
+                  f"{operation_stats['max_latency_seconds']:>9.3f}{operation_stats['last_latency_seconds']:>9.3f}")
+        return
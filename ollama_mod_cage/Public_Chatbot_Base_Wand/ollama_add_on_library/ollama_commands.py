@@ -2,15 +2,18 @@
 
 """
 import os
-import ollama
 import sys
 
+from Public_Chatbot_Base_Wand.ollama_add_on_library.ollama_client_manager import ollama_client_manager
+
 class ollama_commands:
-    def __init__(self, user_input_model_select, developer_tools_dict):
+    def __init__(self, user_input_model_select, developer_tools_dict, ollama_client_manager_instance=None):
         """a method for initializing the class
         """
         self.user_input_model_select = user_input_model_select
         self.developer_tools_dict = developer_tools_dict
+        # the keep-alive client shared with the chatbot
+        self.ollama_client_manager_instance = ollama_client_manager_instance or ollama_client_manager.get_shared(developer_tools_dict)
         
         self.current_dir = developer_tools_dict['current_dir']
         self.parent_dir = developer_tools_dict['parent_dir']
@@ -71,7 +74,7 @@ class ollama_commands:
 
     def ollama_show_template(self):
         """ a method for getting the model template """
-        modelfile_data = ollama.show(f'{self.user_input_model_select}')
+        modelfile_data = self.ollama_client_manager_instance.show(f'{self.user_input_model_select}')
         for key, value in modelfile_data.items():
             if key == 'template':
                 self.template = value
@@ -79,7 +82,7 @@ class ollama_commands:
     
     def ollama_show_license(self):
         """ a method for showing the model license """
-        modelfile_data = ollama.show(f'{self.user_input_model_select}')
+        modelfile_data = self.ollama_client_manager_instance.show(f'{self.user_input_model_select}')
         for key, value in modelfile_data.items():
             if key == 'license':
                 print(self.colors['RED'] + f"<<< {self.user_input_model_select} >>> " + self.colors['OKBLUE'] + f"{key}: {value}")
@@ -87,7 +90,7 @@ class ollama_commands:
 
     def ollama_show_modelfile(self):
         """ a method for showing the modelfile """
-        modelfile_data = ollama.show(f'{self.user_input_model_select}')
+        modelfile_data = self.ollama_client_manager_instance.show(f'{self.user_input_model_select}')
         for key, value in modelfile_data.items():
             if key != 'license':
                 print(self.colors['RED'] + f"<<< {self.user_input_model_select} >>> " + self.colors['OKBLUE'] + f"{key}: {value}")
@@ -95,7 +98,7 @@ class ollama_commands:
 
     def ollama_list(self):
         """ a method for showing the ollama model list """
-        ollama_list = ollama.list()
+        ollama_list = self.ollama_client_manager_instance.list()
         for model_info in ollama_list.get('models', []):
             model_name = model_info.get('name')
             model = model_info.get('model')
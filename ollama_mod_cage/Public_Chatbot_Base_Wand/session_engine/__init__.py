@@ -0,0 +1,2 @@
+#__init__.py
+from .chatbot_session_engine import chatbot_session_engine
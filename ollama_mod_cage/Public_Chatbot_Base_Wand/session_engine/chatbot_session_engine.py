@@ -0,0 +1,355 @@
+""" chatbot_session_engine.py
+
+        A class for running the ollama_chatbot_base session as concurrent asyncio stages joined by
+    queues, instead of one blocking loop. The input stage captures & recognizes the next turn and
+    runs its commands, the llm stage streams the response of each prompt on the async ollama
+    client, and the speech stage splits the response into sentences for the tts scheduler, whose
+    workers generate & play the audio. No stage waits on the speech, so the next turn is captured
+    while the last answer is still being spoken. The keyboard hotkeys are posted to the event stage
+    as events from the keyboard thread, and blocking calls like input() run on daemon threads so
+    they never hold up the event loop or the exit.
+"""
+
+import asyncio
+import threading
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+from Public_Chatbot_Base_Wand.speech_to_speech.sentence_segmenter import sentence_segmenter
+from Public_Chatbot_Base_Wand.latex_render import latex_render_class
+
+keyboard = lazy_module("keyboard")
+sr = lazy_module("speech_recognition")
+
+# -------------------------------------------------------------------------------------------------
+class chatbot_session_engine:
+    """ a class for running the capture, recognition, llm, tts & playback stages of a chatbot session
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, chatbot, prompt_queue_depth=4):
+        """a method for initializing the class
+            args: chatbot, the ollama_chatbot_base instance, prompt_queue_depth, turns waiting on the llm
+        """
+        self.chatbot = chatbot
+        self.colors = chatbot.colors
+        self.prompt_queue_depth = prompt_queue_depth
+
+        # built on the event loop in run_session
+        self.loop = None
+        self.event_queue = None
+        self.prompt_queue = None
+        self.speech_queue = None
+        self.record_start_event = None
+        self.record_stop_event = None
+        self.llm_idle_event = None
+        self.hotkey_handles = []
+
+    # -------------------------------------------------------------------------------------------------
+    def run(self):
+        """ a method for running the session until /quit
+            args: none
+            returns: none
+        """
+        asyncio.run(self.run_session())
+
+    # -------------------------------------------------------------------------------------------------
+    async def run_session(self):
+        """ a method for starting the stages, the session ends when the input stage returns on /quit
+            args: none
+            returns: none
+        """
+        self.loop = asyncio.get_running_loop()
+        self.event_queue = asyncio.Queue()
+        self.prompt_queue = asyncio.Queue(maxsize=self.prompt_queue_depth)
+        self.speech_queue = asyncio.Queue()
+        self.record_start_event = asyncio.Event()
+        self.record_stop_event = asyncio.Event()
+        self.llm_idle_event = asyncio.Event()
+        self.llm_idle_event.set()
+
+        self.hotkey_handles = [
+            keyboard.add_hotkey('ctrl+w', self.post_event, args=("record_start",)),
+            keyboard.add_hotkey('ctrl+s', self.post_event, args=("record_stop",)),
+            keyboard.add_hotkey('ctrl+x', self.post_event, args=("interrupt",)),
+        ]
+
+        input_task = asyncio.create_task(self.input_stage())
+        stage_tasks = [
+            asyncio.create_task(self.event_stage()),
+            asyncio.create_task(self.llm_stage()),
+            asyncio.create_task(self.speech_stage()),
+        ]
+        try:
+            await input_task
+        finally:
+            for stage_task in stage_tasks:
+                stage_task.cancel()
+            await asyncio.gather(*stage_tasks, return_exceptions=True)
+            for hotkey_handle in self.hotkey_handles:
+                keyboard.remove_hotkey(hotkey_handle)
+            self.hotkey_handles = []
+
+    # -------------------------------------------------------------------------------------------------
+    def post_event(self, event_name):
+        """ a method for posting an event to the event stage, safe to call from any thread
+            args: event_name, record_start, record_stop or interrupt
+            returns: none
+        """
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.event_queue.put_nowait, event_name)
+
+    # -------------------------------------------------------------------------------------------------
+    async def run_blocking(self, func, *args):
+        """ a method for running a blocking call on a daemon thread and awaiting its result
+            args: func, *args
+            returns: the result of func
+        """
+        future = self.loop.create_future()
+
+        def blocking_worker():
+            try:
+                result = func(*args)
+            except BaseException as e:
+                self.loop.call_soon_threadsafe(self.resolve_future, future, None, e)
+            else:
+                self.loop.call_soon_threadsafe(self.resolve_future, future, result, None)
+
+        threading.Thread(target=blocking_worker, daemon=True).start()
+        return await future
+
+    # -------------------------------------------------------------------------------------------------
+    def resolve_future(self, future, result, exception):
+        """ a method for setting the result of a run_blocking future, unless it was cancelled
+            args: future, result, exception
+            returns: none
+        """
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    # -------------------------------------------------------------------------------------------------
+    async def event_stage(self):
+        """ a method for the event stage, handling the hotkeys as they are pressed
+            args: none
+            returns: none
+        """
+        while True:
+            event_name = await self.event_queue.get()
+            try:
+                if event_name == "interrupt":
+                    self.chatbot.interrupt()
+                elif event_name == "record_start":
+                    self.chatbot.auto_speech_set(True)
+                    self.record_start_event.set()
+                elif event_name == "record_stop":
+                    self.chatbot.chunk_speech(True)
+                    self.record_stop_event.set()
+            except Exception as e:
+                print(f"Failed to handle the {event_name} event. Reason: {e}")
+
+    # -------------------------------------------------------------------------------------------------
+    async def input_stage(self):
+        """ a method for the input stage, reading each turn, running its commands and queueing its
+        prompt for the llm stage
+            args: none
+            returns: none, on /quit
+        """
+        while True:
+            try:
+                user_input_prompt = await self.read_turn()
+                if user_input_prompt is None:
+                    continue
+                user_input_prompt = self.chatbot.voice_command_select_filter(user_input_prompt)
+                # commands may prompt with input(), so they run here before the next turn is read
+                cmd_run_flag = await self.run_blocking(self.chatbot.command_select, user_input_prompt)
+                # get screenshot, unless the background sampler is already describing the screen
+                if self.chatbot.llava_flag is True and not self.chatbot.llava_vision_sampler_instance.is_running():
+                    self.chatbot.screen_shot_flag = await self.run_blocking(self.chatbot.screen_shot_collector_instance.get_screenshot)
+                # splice videos
+                if self.chatbot.splice_flag is True:
+                    await self.run_blocking(self.chatbot.data_set_video_process_instance.generate_image_data)
+                if cmd_run_flag is False:
+                    print(self.colors["YELLOW"] + f"{user_input_prompt}" + self.colors["OKCYAN"])
+                    self.llm_idle_event.clear()
+                    await self.prompt_queue.put(user_input_prompt)
+            except SystemExit:
+                return
+            except Exception as e:
+                print(f"Failed to process the user input. Reason: {e}")
+
+    # -------------------------------------------------------------------------------------------------
+    async def read_turn(self):
+        """ a method for reading the next turn, by voice activity, by the ctrl+w & ctrl+s hotkeys or typed
+            args: none
+            returns: user_input_prompt, or None when nothing was recognized
+        """
+        if self.chatbot.listen_flag is True or self.chatbot.auto_speech_flag is True:
+            self.chatbot.tts_processor_instance = self.chatbot.instance_tts_processor()
+            try:
+                if self.chatbot.listen_flag is True and self.chatbot.vad_flag is True:
+                    # recognition starts as soon as the user stops talking
+                    audio, utterance_id = await self.run_blocking(self.chatbot.get_vad_audio)
+                else:
+                    audio = await self.read_hotkey_audio()
+                    utterance_id = None
+                if audio is None or self.chatbot.listen_flag is False:
+                    return None
+                user_input_prompt = await self.run_blocking(self.chatbot.recognize_speech, audio, utterance_id)
+                print(f">>SPEECH RECOGNIZED<< >> {user_input_prompt} <<")
+                self.chatbot.auto_speech_flag = False
+                return user_input_prompt
+            except sr.UnknownValueError:
+                print(self.colors["OKCYAN"] + "Speech Recognition could not understand audio" + self.colors["OKCYAN"])
+            except sr.RequestError as e:
+                print(self.colors["OKCYAN"] + "Could not request results from Google Speech Recognition service; {0}".format(e) + self.colors["OKCYAN"])
+            except Exception as e:
+                print(self.colors["OKCYAN"] + f"Failed to recognize speech. Reason: {e}" + self.colors["OKCYAN"])
+            return None
+
+        # the typed prompt waits for the response text, so the two don't print over each other
+        await self.llm_idle_event.wait()
+        print(self.colors["OKCYAN"] + "Please type your selected prompt:" + self.colors["OKCYAN"])
+        return await self.run_blocking(input, self.colors["GREEN"] + f"<<< USER >>> " + self.colors["END"])
+
+    # -------------------------------------------------------------------------------------------------
+    async def read_hotkey_audio(self):
+        """ a method for recording one utterance from the ctrl+w event to the ctrl+s event
+            args: none
+            returns: audio
+        """
+        audio_capture = await self.run_blocking(self.chatbot.instance_audio_capture)
+        if self.chatbot.auto_speech_flag is False:
+            await self.record_start_event.wait()
+        self.record_start_event.clear()
+        self.record_stop_event.clear()
+
+        print(">>AUDIO RECORDING<<")
+        audio_capture.begin_utterance()
+        await self.record_stop_event.wait()
+        self.record_stop_event.clear()
+        print(">>AUDIO RECEIVED<<")
+
+        self.chatbot.chunk_flag = False
+        return sr.AudioData(audio_capture.end_utterance(), audio_capture.sample_rate, 2)
+
+    # -------------------------------------------------------------------------------------------------
+    async def llm_stage(self):
+        """ a method for the llm stage, the response of each prompt is passed on to the speech stage
+        as it is generated
+            args: none
+            returns: none
+        """
+        while True:
+            user_input_prompt = await self.prompt_queue.get()
+            try:
+                self.chatbot.interrupt_event.clear()
+                self.speech_queue.put_nowait(("begin", self.chatbot.stream_flag))
+                if self.chatbot.stream_flag is True:
+                    response = await self.stream_response(user_input_prompt)
+                else:
+                    response = await self.run_blocking(self.generate_response, user_input_prompt)
+                self.speech_queue.put_nowait(("end", response))
+                # append the turn to the conversation log off the loop, the fsync is batched
+                await self.run_blocking(self.chatbot.autosave_turn)
+                self.chatbot.screen_shot_flag = False
+                # Check for latex and render it on its own gui thread
+                if self.chatbot.latex_flag:
+                    threading.Thread(target=self.render_latex, args=(response, self.chatbot.user_input_model_select), daemon=True).start()
+            except Exception as e:
+                print(f"Failed to generate the response. Reason: {e}")
+                self.speech_queue.put_nowait(("end", None))
+            finally:
+                if self.prompt_queue.empty():
+                    self.llm_idle_event.set()
+
+    # -------------------------------------------------------------------------------------------------
+    def render_latex(self, response, user_input_model_select):
+        """ a method for the latex gui thread, tk is bound to the thread that creates its root, so the
+        renderer is built & its mainloop run on this same thread
+            args: response, user_input_model_select
+            returns: none
+        """
+        try:
+            latex_render_instance = latex_render_class()
+            latex_render_instance.add_latex_code(response, user_input_model_select)
+        except Exception as e:
+            print(f"Failed to render the latex. Reason: {e}")
+
+    # -------------------------------------------------------------------------------------------------
+    async def stream_response(self, user_input_prompt):
+        """ a method for streaming the response on the async client, each token is printed and passed
+        to the speech stage as it arrives
+            args: user_input_prompt
+            returns: response
+        """
+        print(self.colors["RED"] + f"<<< {self.chatbot.user_input_model_select} >>> ", end="", flush=True)
+        response_tokens = []
+        response_stream = self.chatbot.send_prompt_stream_async(user_input_prompt)
+        try:
+            async for token in response_stream:
+                print(token, end="", flush=True)
+                response_tokens.append(token)
+                self.speech_queue.put_nowait(("token", token))
+        finally:
+            await response_stream.aclose()
+            print(self.colors["END"])
+        return "".join(response_tokens)
+
+    # -------------------------------------------------------------------------------------------------
+    def generate_response(self, user_input_prompt):
+        """ a method for prompting the model without streaming, run on a worker thread
+            args: user_input_prompt
+            returns: response
+        """
+        response = self.chatbot.send_prompt(user_input_prompt)
+        print(self.colors["RED"] + f"<<< {self.chatbot.user_input_model_select} >>> " + self.colors["RED"] + f"{response}" + self.colors["END"])
+        return response
+
+    # -------------------------------------------------------------------------------------------------
+    async def speech_stage(self):
+        """ a method for the speech stage, each sentence is queued on the tts scheduler as soon as the
+        segmenter finds its end, the scheduler workers generate & play it
+            args: none
+            returns: none
+        """
+        tts_scheduler = None
+        voice_name_path = None
+        streamed = False
+        sentence_segmenter_instance = None
+        while True:
+            event, value = await self.speech_queue.get()
+            try:
+                if event == "begin":
+                    tts_scheduler = None
+                    streamed = value
+                    sentence_segmenter_instance = sentence_segmenter()
+                    if self.chatbot.leap_flag is False:
+                        tts_processor_instance = self.chatbot.instance_tts_processor()
+                        tts_scheduler, voice_name_path = await self.run_blocking(tts_processor_instance.begin_response, self.chatbot.voice_name)
+                    continue
+                if tts_scheduler is None:
+                    continue
+                tts_processor_instance = self.chatbot.tts_processor_instance
+                if event == "token":
+                    sentences = sentence_segmenter_instance.feed(value)
+                elif streamed is True:
+                    sentences = sentence_segmenter_instance.flush()
+                else:
+                    sentences = tts_processor_instance.split_into_sentences(value or "")
+                    if tts_processor_instance.tts_batch_flag is True:
+                        sentences = tts_processor_instance.group_sentences(sentences, tts_processor_instance.tts_batch_max_chars)
+                for sentence in sentences:
+                    # barge-in, the rest of the response is not spoken
+                    if tts_processor_instance.tts_cancel_event.is_set():
+                        break
+                    tts_scheduler.put_sentence(sentence, voice_name_path)
+                if event == "end":
+                    tts_scheduler.end_response()
+                    tts_scheduler = None
+            except Exception as e:
+                print(f"Failed to queue the response speech. Reason: {e}")
+                if event == "end" and tts_scheduler is not None:
+                    tts_scheduler.end_response()
+                    tts_scheduler = None
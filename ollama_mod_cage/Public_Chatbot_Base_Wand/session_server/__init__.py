@@ -0,0 +1,2 @@
+#__init__.py
+from .chatbot_session import chatbot_session
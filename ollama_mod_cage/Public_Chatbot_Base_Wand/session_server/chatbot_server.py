@@ -0,0 +1,379 @@
+""" chatbot_server.py
+
+        A headless server for hosting many chatbot_session instances from one process, keyed by
+    session id. Every session shares the one ollama client manager & the one tts model, so the
+    model is loaded once no matter how many users are connected, and each request runs on its own
+    thread. The api is local json over http, a prompt streams its response back as newline
+    delimited json events, token events as the model generates them and, with speech, one audio
+    event per sentence of 16 bit pcm. Run it from the ollama_mod_cage directory after /developer new
+    has written developer_tools.json:
+
+        python -m Public_Chatbot_Base_Wand.session_server.chatbot_server --port 11435
+
+    POST   /sessions                    {"model", "voice_name", "system"} -> session
+    GET    /sessions                    -> sessions
+    GET    /sessions/{id}               -> session
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/prompt        {"prompt", "speech"} -> streamed events
+    POST   /sessions/{id}/interrupt
+    GET    /stats
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Public_Chatbot_Base_Wand.ollama_add_on_library import ollama_commands
+from Public_Chatbot_Base_Wand.ollama_add_on_library import ollama_client_manager
+from Public_Chatbot_Base_Wand.read_write_symbol_collector import read_write_symbol_collector
+from Public_Chatbot_Base_Wand.speech_to_speech.tts_processor_class import tts_processor_class
+from Public_Chatbot_Base_Wand.session_server.chatbot_session import chatbot_session
+
+# -------------------------------------------------------------------------------------------------
+class chatbot_server:
+    """ a class for hosting the chatbot sessions behind the local http api
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, developer_tools_dict, host="127.0.0.1", port=11435, max_sessions=64, session_idle_seconds=1800):
+        """a method for initializing the class
+            args: colors, developer_tools_dict, host, port, max_sessions, session_idle_seconds, idle
+                sessions are closed to make room once max_sessions is reached
+        """
+        self.colors = colors
+        self.developer_tools_dict = developer_tools_dict
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.session_idle_seconds = session_idle_seconds
+
+        # shared by every session
+        self.ollama_client_manager_instance = ollama_client_manager.get_shared(developer_tools_dict)
+        self.tts_processor_instance = None
+        self.tts_processor_lock = threading.Lock()
+
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        self.start_time = time.time()
+        self.stats = {"sessions_opened": 0, "sessions_expired": 0, "prompts": 0, "prompts_rejected": 0}
+
+        self.http_server = None
+
+    # -------------------------------------------------------------------------------------------------
+    def get_tts_processor(self):
+        """ a method for getting the shared tts processor, the xtts model is built on first use
+            args: none
+            returns: tts_processor_instance
+        """
+        with self.tts_processor_lock:
+            if self.tts_processor_instance is None:
+                self.tts_processor_instance = tts_processor_class(self.colors, self.developer_tools_dict)
+            return self.tts_processor_instance
+
+    # -------------------------------------------------------------------------------------------------
+    def is_voice_name(self, voice_name):
+        """ a method for checking that a requested voice is one voice directory of the voice reference
+        pack, so a request never points the tts at another path
+            args: voice_name
+            returns: valid bool
+        """
+        if not isinstance(voice_name, str) or voice_name in ("", ".", "..") or os.path.basename(voice_name) != voice_name:
+            return False
+        if os.sep in voice_name or (os.altsep and os.altsep in voice_name):
+            return False
+        voice_pack_path = os.path.realpath(self.developer_tools_dict['tts_voice_ref_wav_pack_path_dir'])
+        voice_path = os.path.realpath(os.path.join(voice_pack_path, voice_name))
+        return os.path.dirname(voice_path) == voice_pack_path and os.path.isdir(voice_path)
+
+    # -------------------------------------------------------------------------------------------------
+    def create_session(self, model_name, voice_name="C3PO", system_prompt=None):
+        """ a method for opening a session, idle sessions are closed first when the server is full
+            args: model_name, voice_name, system_prompt
+            returns: session, or None when every session is in use
+        """
+        with self.sessions_lock:
+            if len(self.sessions) >= self.max_sessions:
+                self.expire_idle_sessions()
+            if len(self.sessions) >= self.max_sessions:
+                return None
+            session_id = uuid.uuid4().hex
+            session = chatbot_session(session_id, model_name, self.ollama_client_manager_instance, voice_name, system_prompt,
+                                      self.developer_tools_dict.get('memory_context_tokens'))
+            self.sessions[session_id] = session
+            self.stats["sessions_opened"] += 1
+        return session
+
+    # -------------------------------------------------------------------------------------------------
+    def expire_idle_sessions(self):
+        """ a method for closing the sessions idle for longer than session_idle_seconds, called with
+        the sessions lock held
+            args: none
+            returns: none
+        """
+        now = time.time()
+        for session_id, session in list(self.sessions.items()):
+            if not session.prompt_lock.locked() and now - session.last_used_time > self.session_idle_seconds:
+                del self.sessions[session_id]
+                self.stats["sessions_expired"] += 1
+
+    # -------------------------------------------------------------------------------------------------
+    def get_session(self, session_id):
+        """ a method for getting an open session
+            args: session_id
+            returns: session, or None
+        """
+        with self.sessions_lock:
+            return self.sessions.get(session_id)
+
+    # -------------------------------------------------------------------------------------------------
+    def close_session(self, session_id):
+        """ a method for closing a session, a prompt still streaming is interrupted
+            args: session_id
+            returns: closed bool
+        """
+        with self.sessions_lock:
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.interrupt()
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def count(self, stat_name):
+        """ a method for adding one to a server counter
+            args: stat_name
+            returns: none
+        """
+        with self.sessions_lock:
+            self.stats[stat_name] += 1
+
+    # -------------------------------------------------------------------------------------------------
+    def get_stats(self):
+        """ a method for getting the server, ollama request & tts counters
+            args: none
+            returns: stats dict
+        """
+        with self.sessions_lock:
+            stats = dict(self.stats)
+            stats["open_sessions"] = len(self.sessions)
+            stats["busy_sessions"] = sum(1 for session in self.sessions.values() if session.prompt_lock.locked())
+        stats["uptime_seconds"] = round(time.time() - self.start_time, 1)
+        stats["ollama"] = self.ollama_client_manager_instance.get_stats()
+        if self.tts_processor_instance is not None:
+            stats["tts"] = self.tts_processor_instance.get_tts_status()
+        return stats
+
+    # -------------------------------------------------------------------------------------------------
+    def serve_forever(self):
+        """ a method for serving the api until ctrl+c
+            args: none
+            returns: none
+        """
+        chatbot_server_instance = self
+
+        class bound_request_handler(chatbot_request_handler):
+            server_instance = chatbot_server_instance
+
+        self.http_server = ThreadingHTTPServer((self.host, self.port), bound_request_handler)
+        self.http_server.daemon_threads = True
+        print(self.colors['OKCYAN'] + f"<<< CHATBOT SERVER >>> listening on http://{self.host}:{self.port}" + self.colors['END'])
+        try:
+            self.http_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.http_server.server_close()
+
+    # -------------------------------------------------------------------------------------------------
+    def shutdown(self):
+        """ a method for stopping serve_forever from another thread
+            args: none
+            returns: none
+        """
+        if self.http_server is not None:
+            self.http_server.shutdown()
+
+# -------------------------------------------------------------------------------------------------
+class chatbot_request_handler(BaseHTTPRequestHandler):
+    """ a class for routing the http requests of the chatbot_server
+    """
+    # chunked streaming needs http/1.1
+    protocol_version = "HTTP/1.1"
+    server_instance = None
+
+    # -------------------------------------------------------------------------------------------------
+    def do_GET(self):
+        """ a method for the GET routes
+        """
+        path_parts = self.get_path_parts()
+        if path_parts == ["stats"]:
+            self.send_json(200, self.server_instance.get_stats())
+        elif path_parts == ["sessions"]:
+            with self.server_instance.sessions_lock:
+                sessions = list(self.server_instance.sessions.values())
+            self.send_json(200, {"sessions": [session.get_state() for session in sessions]})
+        elif len(path_parts) == 2 and path_parts[0] == "sessions":
+            session = self.server_instance.get_session(path_parts[1])
+            if session is None:
+                self.send_json(404, {"error": "unknown session"})
+            else:
+                self.send_json(200, session.get_state())
+        else:
+            self.send_json(404, {"error": "unknown route"})
+
+    # -------------------------------------------------------------------------------------------------
+    def do_POST(self):
+        """ a method for the POST routes
+        """
+        path_parts = self.get_path_parts()
+        try:
+            request_body = self.read_json()
+        except ValueError as e:
+            self.send_json(400, {"error": f"invalid json: {e}"})
+            return
+
+        if path_parts == ["sessions"]:
+            if not request_body.get("model"):
+                self.send_json(400, {"error": "model is required"})
+                return
+            voice_name = request_body.get("voice_name") or "C3PO"
+            if "voice_name" in request_body and not self.server_instance.is_voice_name(voice_name):
+                self.send_json(400, {"error": f"unknown voice_name {voice_name!r}"})
+                return
+            session = self.server_instance.create_session(request_body["model"], voice_name, request_body.get("system"))
+            if session is None:
+                self.send_json(503, {"error": "every session is in use"})
+            else:
+                self.send_json(201, session.get_state())
+            return
+
+        if len(path_parts) != 3 or path_parts[0] != "sessions":
+            self.send_json(404, {"error": "unknown route"})
+            return
+        session = self.server_instance.get_session(path_parts[1])
+        if session is None:
+            self.send_json(404, {"error": "unknown session"})
+        elif path_parts[2] == "interrupt":
+            session.interrupt()
+            self.send_json(200, session.get_state())
+        elif path_parts[2] == "prompt":
+            self.stream_prompt(session, request_body)
+        else:
+            self.send_json(404, {"error": "unknown route"})
+
+    # -------------------------------------------------------------------------------------------------
+    def do_DELETE(self):
+        """ a method for the DELETE routes
+        """
+        path_parts = self.get_path_parts()
+        if len(path_parts) == 2 and path_parts[0] == "sessions" and self.server_instance.close_session(path_parts[1]):
+            self.send_json(200, {"session_id": path_parts[1], "closed": True})
+        else:
+            self.send_json(404, {"error": "unknown session"})
+
+    # -------------------------------------------------------------------------------------------------
+    def stream_prompt(self, session, request_body):
+        """ a method for streaming the response events of a prompt as chunked newline delimited json
+            args: session, request_body
+            returns: none
+        """
+        user_input_prompt = request_body.get("prompt")
+        if not user_input_prompt:
+            self.send_json(400, {"error": "prompt is required"})
+            return
+        if not session.prompt_lock.acquire(blocking=False):
+            self.server_instance.count("prompts_rejected")
+            self.send_json(409, {"error": "session is busy with another prompt"})
+            return
+        try:
+            self.server_instance.count("prompts")
+            tts_processor_instance = self.server_instance.get_tts_processor() if request_body.get("speech") is True else None
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            event_stream = session.stream_prompt(user_input_prompt, tts_processor_instance)
+            try:
+                for event in event_stream:
+                    self.write_chunk((json.dumps(event) + "\n").encode("utf-8"))
+                self.write_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                # the client went away, closing the events interrupts the response
+                self.close_connection = True
+            finally:
+                event_stream.close()
+        finally:
+            session.prompt_lock.release()
+
+    # -------------------------------------------------------------------------------------------------
+    def write_chunk(self, chunk_bytes):
+        """ a method for writing one chunk of a chunked response, an empty chunk ends the response
+            args: chunk_bytes
+            returns: none
+        """
+        self.wfile.write(f"{len(chunk_bytes):x}\r\n".encode("ascii") + chunk_bytes + b"\r\n")
+        self.wfile.flush()
+
+    # -------------------------------------------------------------------------------------------------
+    def get_path_parts(self):
+        """ a method for splitting the request path
+            args: none
+            returns: path_parts list
+        """
+        return [path_part for path_part in self.path.split("?", 1)[0].split("/") if path_part]
+
+    # -------------------------------------------------------------------------------------------------
+    def read_json(self):
+        """ a method for reading the json request body
+            args: none
+            returns: request_body dict
+        """
+        content_length = int(self.headers.get("Content-Length") or 0)
+        if content_length == 0:
+            return {}
+        request_body = json.loads(self.rfile.read(content_length))
+        if not isinstance(request_body, dict):
+            raise ValueError("the body must be a json object")
+        return request_body
+
+    # -------------------------------------------------------------------------------------------------
+    def send_json(self, status, body):
+        """ a method for sending a json response
+            args: status, body
+            returns: none
+        """
+        body_bytes = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body_bytes)))
+        self.end_headers()
+        self.wfile.write(body_bytes)
+
+    # -------------------------------------------------------------------------------------------------
+    def log_message(self, format, *args):
+        """ a method for keeping the request log off the console
+        """
+        return
+
+# -------------------------------------------------------------------------------------------------
+def run_chatbot_server():
+    """ a method for starting the chatbot server from the command line
+        args: none
+        returns: none
+    """
+    parser = argparse.ArgumentParser(description="headless multi session ollama_agent_roll_cage server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--session-idle-seconds", type=int, default=1800)
+    args = parser.parse_args()
+
+    developer_tools_dict = read_write_symbol_collector().read_developer_tools_json()
+    colors = ollama_commands(None, developer_tools_dict).colors
+    chatbot_server(colors, developer_tools_dict, args.host, args.port, args.max_sessions, args.session_idle_seconds).serve_forever()
+
+if __name__ == "__main__":
+    run_chatbot_server()
@@ -0,0 +1,197 @@
+""" chatbot_session.py
+
+        A class for one headless chat session of the chatbot_server, the state that
+    ollama_chatbot_base keeps on its instance, the model, chat_history, voice_name & the barge-in
+    event, is kept per session here, while the ollama client and the tts model are shared by every
+    session of the server. A prompt streams its response as events, the tokens as they arrive, and
+    with speech each sentence's audio as soon as it is synthesized, on a second worker so the text
+    never waits on the speech.
+"""
+
+import base64
+import queue
+import threading
+import time
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+from Public_Chatbot_Base_Wand.chat_history.conversation_memory import conversation_memory
+from Public_Chatbot_Base_Wand.speech_to_speech.sentence_segmenter import sentence_segmenter
+
+np = lazy_module("numpy")
+
+# -------------------------------------------------------------------------------------------------
+class chatbot_session:
+    """ a class for the state & the streamed prompts of one chatbot_server session
+    """
+    # a stream_prompt worker has finished
+    WORKER_DONE = object()
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, session_id, model_name, ollama_client_manager_instance, voice_name="C3PO", system_prompt=None, memory_context_tokens=None):
+        """a method for initializing the class
+            args: session_id, model_name, ollama_client_manager_instance, voice_name, system_prompt,
+                memory_context_tokens, overrides the model's num_ctx for the history budget
+        """
+        self.session_id = session_id
+        self.user_input_model_select = model_name
+        self.ollama_client_manager_instance = ollama_client_manager_instance
+        self.voice_name = voice_name
+        self.system_prompt = system_prompt
+
+        self.chat_history = []
+        if system_prompt:
+            self.chat_history.append({"role": "system", "content": system_prompt})
+        # the history is kept to the model's token budget across turns
+        self.conversation_memory_instance = conversation_memory(ollama_client_manager_instance, memory_context_tokens)
+
+        # one prompt at a time per session, each prompt gets its own cancel event so a new prompt never
+        # revives the workers of an interrupted one
+        self.prompt_lock = threading.Lock()
+        self.interrupt_event = threading.Event()
+
+        self.created_time = time.time()
+        self.last_used_time = self.created_time
+        self.prompt_count = 0
+
+    # -------------------------------------------------------------------------------------------------
+    def get_state(self):
+        """ a method for getting the session summary for the api
+            args: none
+            returns: state dict
+        """
+        return {
+            "session_id": self.session_id,
+            "model": self.user_input_model_select,
+            "voice_name": self.voice_name,
+            "messages": len(self.chat_history),
+            "memory": self.conversation_memory_instance.stats,
+            "prompts": self.prompt_count,
+            "busy": self.prompt_lock.locked(),
+            "idle_seconds": round(time.time() - self.last_used_time, 1),
+        }
+
+    # -------------------------------------------------------------------------------------------------
+    def interrupt(self):
+        """ a method for barging in on the response being streamed, the ollama request is closed and
+        the sentences not yet synthesized are dropped
+            args: none
+            returns: none
+        """
+        self.interrupt_event.set()
+
+    # -------------------------------------------------------------------------------------------------
+    def send_prompt_stream(self, user_input_prompt, cancel_event):
+        """ a method for prompting the model with a streamed response on the shared client
+            args: user_input_prompt, cancel_event, the barge-in event of this prompt
+            returns: generator of response tokens
+        """
+        user_message = {"role": "user", "content": user_input_prompt}
+        self.chat_history = self.conversation_memory_instance.fit(self.chat_history, self.user_input_model_select, user_message)
+        self.chat_history.append(user_message)
+
+        response_tokens = []
+        response_stream = None
+        try:
+            response_stream = self.ollama_client_manager_instance.chat(model=self.user_input_model_select, messages=(self.chat_history), stream=True )
+            for chunk in response_stream:
+                # barge-in, stop reading the response
+                if cancel_event.is_set():
+                    break
+                token = chunk["message"]["content"]
+                response_tokens.append(token)
+                yield token
+        finally:
+            # closing the stream drops the request, so ollama stops generating an interrupted response
+            if hasattr(response_stream, "close"):
+                response_stream.close()
+            # an interrupted response is kept as far as it was sent
+            if response_tokens:
+                self.chat_history.append({"role": "assistant", "content": "".join(response_tokens)})
+
+    # -------------------------------------------------------------------------------------------------
+    def stream_prompt(self, user_input_prompt, tts_processor_instance=None):
+        """ a method for streaming the response events of a prompt, the caller must hold prompt_lock
+            args: user_input_prompt, tts_processor_instance, to speak the response, None for text only
+            returns: generator of event dicts, token, audio, error & a final done event
+        """
+        cancel_event = threading.Event()
+        self.interrupt_event = cancel_event
+        self.prompt_count += 1
+        self.last_used_time = time.time()
+
+        event_queue = queue.Queue()
+        sentence_queue = queue.Queue() if tts_processor_instance is not None else None
+        response_tokens = []
+        workers = [threading.Thread(target=self.response_worker, args=(user_input_prompt, response_tokens, event_queue, sentence_queue, cancel_event), daemon=True)]
+        if tts_processor_instance is not None:
+            workers.append(threading.Thread(target=self.speech_worker, args=(tts_processor_instance, sentence_queue, event_queue, cancel_event), daemon=True))
+        for worker in workers:
+            worker.start()
+
+        workers_running = len(workers)
+        try:
+            while workers_running > 0:
+                event = event_queue.get()
+                if event is self.WORKER_DONE:
+                    workers_running -= 1
+                    continue
+                yield event
+            yield {"type": "done", "response": "".join(response_tokens), "interrupted": cancel_event.is_set()}
+        finally:
+            # the client went away, stop generating, and keep the caller's prompt_lock until the
+            # workers are out of the chat history & the tts model
+            if workers_running > 0:
+                cancel_event.set()
+            for worker in workers:
+                worker.join()
+            self.last_used_time = time.time()
+
+    # -------------------------------------------------------------------------------------------------
+    def response_worker(self, user_input_prompt, response_tokens, event_queue, sentence_queue, cancel_event):
+        """ a method for the response worker, each token becomes an event and with speech each finished
+        sentence goes to the speech worker
+            args: user_input_prompt, response_tokens, event_queue, sentence_queue or None, cancel_event
+            returns: none
+        """
+        sentence_segmenter_instance = sentence_segmenter()
+        try:
+            for token in self.send_prompt_stream(user_input_prompt, cancel_event):
+                response_tokens.append(token)
+                event_queue.put({"type": "token", "text": token})
+                if sentence_queue is not None:
+                    for sentence in sentence_segmenter_instance.feed(token):
+                        sentence_queue.put(sentence)
+            if sentence_queue is not None:
+                for sentence in sentence_segmenter_instance.flush():
+                    sentence_queue.put(sentence)
+        except Exception as e:
+            print(f"Failed to stream the response of session {self.session_id}. Reason: {e}")
+            event_queue.put({"type": "error", "text": f"{e}"})
+        finally:
+            if sentence_queue is not None:
+                sentence_queue.put(None)
+            event_queue.put(self.WORKER_DONE)
+
+    # -------------------------------------------------------------------------------------------------
+    def speech_worker(self, tts_processor_instance, sentence_queue, event_queue, cancel_event):
+        """ a method for the speech worker, each sentence is synthesized on the shared tts model and
+        sent as base64 16 bit mono pcm
+            args: tts_processor_instance, sentence_queue, event_queue, cancel_event
+            returns: none
+        """
+        voice_name_path = tts_processor_instance.get_voice_name_path(self.voice_name)
+        try:
+            for sentence in iter(sentence_queue.get, None):
+                # barge-in, the rest of the response is not spoken
+                if cancel_event.is_set():
+                    continue
+                try:
+                    tts_audio = tts_processor_instance.get_sentence_audio(sentence, voice_name_path)
+                    pcm_bytes = (np.clip(tts_audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+                    event_queue.put({"type": "audio", "text": sentence, "sample_rate": tts_processor_instance.sample_rate,
+                                     "format": "pcm_s16le", "data": base64.b64encode(pcm_bytes).decode("ascii")})
+                except Exception as e:
+                    print(f"Failed to synthesize speech for session {self.session_id}. Reason: {e}")
+                    event_queue.put({"type": "error", "text": f"{e}"})
+        finally:
+            event_queue.put(self.WORKER_DONE)
@@ -1,2 +1,5 @@
 #__init__.py
-from .tts_processor_class import tts_processor_class
\ No newline at end of file
+from .tts_processor_class import tts_processor_class
+from .audio_device_manager import audio_device_manager
+from .audio_capture_class import audio_capture_class
+from .stt_backend_manager import stt_backend_manager
\ No newline at end of file
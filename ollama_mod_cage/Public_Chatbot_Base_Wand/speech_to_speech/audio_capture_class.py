@@ -0,0 +1,293 @@
+""" audio_capture_class.py
+
+        A class for capturing the microphone into a preallocated ring buffer, the memory used stays
+    fixed however long the user talks. With voice activity endpointing each frame's energy is
+    compared against an adaptive noise floor, speech opens an utterance, a stretch of silence
+    closes it, and the finished utterance goes straight onto the utterance queue so recognition
+    starts without a hotkey. The frames of an open utterance are also handed to on_speech_frames
+    for incremental recognition. Frames come from a capture session on the audio_device_manager's
+    shared input stream, so the microphone is never opened per utterance. The hotkey mode records into the same ring buffer between
+    begin_utterance & end_utterance.
+"""
+
+import queue
+import threading
+import time
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+np = lazy_module("numpy")
+
+# -------------------------------------------------------------------------------------------------
+class audio_capture_class:
+    """ a class for the microphone capture & voice activity endpointing of the ollama_chatbot_base
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, audio_device_manager_instance, sample_rate=16000, frame_samples=512, max_utterance_seconds=30.0,
+                 pre_roll_seconds=0.3, silence_seconds=0.8, min_speech_seconds=0.25, min_energy=300.0,
+                 on_speech_start=None, on_speech_frames=None, on_speech_end=None):
+        """a method for initializing the class
+            args: colors, audio_device_manager_instance, sample_rate, frame_samples, max_utterance_seconds, pre_roll_seconds, silence_seconds,
+                min_speech_seconds, min_energy, on_speech_start(), run on its own thread when speech begins,
+                on_speech_frames(pcm_bytes, utterance_start, utterance_id) & on_speech_end(kept, utterance_id),
+                called on the capture thread so they must return quickly
+        """
+        self.colors = colors
+        self.audio_device_manager_instance = audio_device_manager_instance
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+        self.max_utterance_samples = int(max_utterance_seconds * sample_rate)
+        self.pre_roll_samples = int(pre_roll_seconds * sample_rate)
+        self.silence_samples = int(silence_seconds * sample_rate)
+        self.min_speech_samples = int(min_speech_seconds * sample_rate)
+        self.min_energy = min_energy
+        self.on_speech_start = on_speech_start
+        self.on_speech_frames = on_speech_frames
+        self.on_speech_end = on_speech_end
+
+        # int16 ring buffer, positions are absolute sample counts taken modulo the capacity
+        self.ring_capacity = self.max_utterance_samples + self.pre_roll_samples + 4 * frame_samples
+        self.ring_buffer = np.zeros(self.ring_capacity, dtype=np.int16)
+        self.total_samples = 0
+        self.lock = threading.Lock()
+
+        # voice activity state, utterances are only streamed & queued while the session is listening,
+        # otherwise speech onsets are still reported for barge-in
+        self.vad_flag = False
+        self.listening = False
+        self.utterance_listening = False
+        self.noise_floor = None
+        self.speech_frames = 0
+        self.utterance_start = None
+        self.last_speech_end = None
+        # each voice activity utterance is numbered, so its streamed text is matched to its audio
+        self.utterance_id = 0
+        # the hotkey mode utterance start & the time it was asked for
+        self.manual_start = None
+        self.manual_begin_time = None
+
+        self.utterance_queue = queue.Queue()
+        self.stats = {"utterances": 0, "dropped_short": 0, "forced_endpoints": 0, "speech_seconds": 0.0, "last_capture_start_seconds": 0.0}
+
+        self.capture_session = None
+
+    # -------------------------------------------------------------------------------------------------
+    def start(self):
+        """ a method for opening the capture session, frames arrive on the capture thread
+            args: none
+            returns: none
+        """
+        if self.capture_session is None:
+            self.capture_session = self.audio_device_manager_instance.open_capture_session(self.process_frames)
+
+    # -------------------------------------------------------------------------------------------------
+    def stop(self):
+        """ a method for closing the capture session, the shared input stream stays open
+            args: none
+            returns: none
+        """
+        if self.capture_session is not None:
+            self.audio_device_manager_instance.close_capture_session(self.capture_session)
+            self.capture_session = None
+
+    # -------------------------------------------------------------------------------------------------
+    def set_vad(self, flag):
+        """ a method for turning the voice activity endpointing on or off
+            args: flag
+            returns: none
+        """
+        with self.lock:
+            self.vad_flag = flag
+            self.speech_frames = 0
+            self.utterance_start = None
+        print(f"vad_flag FLAG STATE: {self.vad_flag}")
+
+    # -------------------------------------------------------------------------------------------------
+    def set_listening(self, flag):
+        """ a method for turning the queueing of utterances on or off, anything said before listening
+        starts is dropped
+            args: flag
+            returns: none
+        """
+        with self.lock:
+            self.listening = flag
+            self.speech_frames = 0
+            self.utterance_start = None
+            if flag is True:
+                while True:
+                    try:
+                        self.utterance_queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+    # -------------------------------------------------------------------------------------------------
+    def process_frames(self, pcm_bytes):
+        """ a method for writing captured frames into the ring buffer and running the endpointing
+            args: pcm_bytes, 16 bit mono
+            returns: none
+        """
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16)
+        if len(samples) == 0:
+            return
+        with self.lock:
+            if self.manual_begin_time is not None:
+                # the hotkey capture start latency, until the first frame after the key press
+                self.stats["last_capture_start_seconds"] = time.perf_counter() - self.manual_begin_time
+                self.manual_begin_time = None
+            self.write_ring(samples)
+            if self.vad_flag is True and self.manual_start is None:
+                self.update_vad(samples)
+
+    # -------------------------------------------------------------------------------------------------
+    def write_ring(self, samples):
+        """ a method for copying samples into the ring buffer, wrapping at the end
+            args: samples
+            returns: none
+        """
+        if len(samples) > self.ring_capacity:
+            samples = samples[-self.ring_capacity:]
+        write_pos = self.total_samples % self.ring_capacity
+        first_part = min(len(samples), self.ring_capacity - write_pos)
+        self.ring_buffer[write_pos:write_pos + first_part] = samples[:first_part]
+        self.ring_buffer[:len(samples) - first_part] = samples[first_part:]
+        self.total_samples += len(samples)
+
+    # -------------------------------------------------------------------------------------------------
+    def read_ring(self, start, end):
+        """ a method for copying the samples between two absolute positions out of the ring buffer
+            args: start, end
+            returns: pcm_bytes
+        """
+        start = max(start, end - self.ring_capacity, 0)
+        start_pos = start % self.ring_capacity
+        end_pos = end % self.ring_capacity
+        if start_pos < end_pos or start == end:
+            samples = self.ring_buffer[start_pos:end_pos]
+        else:
+            samples = np.concatenate((self.ring_buffer[start_pos:], self.ring_buffer[:end_pos]))
+        return samples.tobytes()
+
+    # -------------------------------------------------------------------------------------------------
+    def update_vad(self, samples):
+        """ a method for the energy endpointing, three loud frames open an utterance and silence_seconds
+        of quiet frames close it
+            args: samples
+            returns: none
+        """
+        energy = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        threshold = max(self.min_energy, self.noise_floor * 3.0)
+        is_speech = energy > threshold
+        frame_end = self.total_samples
+
+        if self.utterance_start is None:
+            if is_speech:
+                self.speech_frames += 1
+                if self.speech_frames >= 3:
+                    # keep the pre roll so the first syllable is not cut
+                    self.utterance_start = frame_end - self.speech_frames * len(samples) - self.pre_roll_samples
+                    self.last_speech_end = frame_end
+                    self.utterance_id += 1
+                    self.utterance_listening = self.listening
+                    if self.on_speech_start is not None:
+                        threading.Thread(target=self.on_speech_start, daemon=True).start()
+                    if self.on_speech_frames is not None and self.utterance_listening:
+                        self.on_speech_frames(self.read_ring(self.utterance_start, frame_end), True, self.utterance_id)
+            else:
+                self.speech_frames = 0
+                # the noise floor only follows the quiet frames
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+            return
+
+        if is_speech:
+            self.last_speech_end = frame_end
+        if self.on_speech_frames is not None and self.utterance_listening:
+            self.on_speech_frames(samples.tobytes(), False, self.utterance_id)
+        if frame_end - self.utterance_start >= self.max_utterance_samples:
+            self.stats["forced_endpoints"] += 1
+            self.end_vad_utterance(frame_end)
+        elif frame_end - self.last_speech_end >= self.silence_samples:
+            # the same padding after the last loud frame keeps the trailing consonant
+            self.end_vad_utterance(self.last_speech_end + self.pre_roll_samples)
+
+    # -------------------------------------------------------------------------------------------------
+    def end_vad_utterance(self, utterance_end):
+        """ a method for queueing the finished utterance, too short bursts are dropped as noise and
+        nothing is queued while the session is not listening
+            args: utterance_end
+            returns: none
+        """
+        if not self.utterance_listening:
+            self.utterance_start = None
+            self.speech_frames = 0
+            return
+        utterance_end = min(utterance_end, self.total_samples)
+        speech_samples = self.last_speech_end - self.utterance_start - self.pre_roll_samples
+        kept = speech_samples >= self.min_speech_samples
+        if self.on_speech_end is not None:
+            self.on_speech_end(kept, self.utterance_id)
+        if kept:
+            self.queue_utterance(self.read_ring(self.utterance_start, utterance_end), self.utterance_id)
+        else:
+            self.stats["dropped_short"] += 1
+        self.utterance_start = None
+        self.speech_frames = 0
+
+    # -------------------------------------------------------------------------------------------------
+    def queue_utterance(self, pcm_bytes, utterance_id):
+        """ a method for putting a finished utterance on the utterance queue
+            args: pcm_bytes, utterance_id
+            returns: none
+        """
+        self.stats["utterances"] += 1
+        self.stats["speech_seconds"] += len(pcm_bytes) / 2 / self.sample_rate
+        self.utterance_queue.put((utterance_id, pcm_bytes))
+
+    # -------------------------------------------------------------------------------------------------
+    def begin_utterance(self):
+        """ a method for starting a hotkey mode utterance, the pre roll already in the ring buffer is
+        kept so the first syllable is not lost to a late key press
+            args: none
+            returns: none
+        """
+        with self.lock:
+            self.manual_start = self.total_samples - self.pre_roll_samples
+            self.manual_begin_time = time.perf_counter()
+
+    # -------------------------------------------------------------------------------------------------
+    def end_utterance(self):
+        """ a method for ending the hotkey mode utterance, only the last max_utterance_seconds are kept
+            args: none
+            returns: pcm_bytes
+        """
+        with self.lock:
+            pcm_bytes = self.read_ring(self.manual_start, self.total_samples)
+            self.manual_start = None
+            self.stats["utterances"] += 1
+            self.stats["speech_seconds"] += len(pcm_bytes) / 2 / self.sample_rate
+        return pcm_bytes
+
+    # -------------------------------------------------------------------------------------------------
+    def get_utterance(self, timeout=None):
+        """ a method for waiting on the next voice activity utterance
+            args: timeout
+            returns: (utterance_id, pcm_bytes), or None on timeout
+        """
+        try:
+            return self.utterance_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    # -------------------------------------------------------------------------------------------------
+    def get_stats(self):
+        """ a method for getting the capture counters
+            args: none
+            returns: stats dict
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["noise_floor"] = self.noise_floor if self.noise_floor is not None else 0.0
+            stats["queued_utterances"] = self.utterance_queue.qsize()
+            stats["ring_buffer_seconds"] = self.ring_capacity / self.sample_rate
+        return stats
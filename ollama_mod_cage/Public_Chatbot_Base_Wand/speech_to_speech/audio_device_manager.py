@@ -0,0 +1,180 @@
+""" audio_device_manager.py
+
+        A class for owning the audio devices for the whole chatbot_main session, one pyaudio input
+    stream is opened once and its frames are handed to every open capture session, and one
+    sounddevice output stream is kept for the speech playback. Opening the devices is paid once
+    instead of per utterance, and the open time & each capture session's start latency, from
+    opening the session to its first frame, are kept for /audio stats.
+"""
+
+import threading
+import time
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+pyaudio = lazy_module("pyaudio")
+sd = lazy_module("sounddevice")
+
+# -------------------------------------------------------------------------------------------------
+class audio_device_manager:
+    """ a class for managing the persistent input & output streams of the ollama_chatbot_base
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, sample_rate=16000, frame_samples=512):
+        """a method for initializing the class
+            args: colors, sample_rate, frame_samples, of the input stream
+        """
+        self.colors = colors
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+
+        self.pyaudio_instance = None
+        self.input_stream = None
+        self.output_stream = None
+        self.output_sample_rate = None
+        self.output_lock = threading.Lock()
+
+        # replaced, never mutated, so the input callback reads it without the lock
+        self.capture_sessions = ()
+        self.session_lock = threading.Lock()
+
+        self.stats = {
+            "input_open_seconds": 0.0,
+            "output_open_seconds": 0.0,
+            "output_opens": 0,
+            "sessions_opened": 0,
+            "capture_starts": 0,
+            "capture_start_seconds": 0.0,
+            "last_capture_start_seconds": 0.0,
+            "input_overflows": 0,
+        }
+
+    # -------------------------------------------------------------------------------------------------
+    def start(self):
+        """ a method for opening the input stream, frames arrive on the pyaudio callback thread
+            args: none
+            returns: none
+        """
+        if self.input_stream is not None:
+            return
+        start_time = time.perf_counter()
+        self.pyaudio_instance = pyaudio.PyAudio()
+        self.input_stream = self.pyaudio_instance.open(format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+                                                       frames_per_buffer=self.frame_samples, stream_callback=self.input_callback)
+        self.input_stream.start_stream()
+        self.stats["input_open_seconds"] = time.perf_counter() - start_time
+        print(self.colors['OKCYAN'] + f"<<< MICROPHONE OPEN >>> in {self.stats['input_open_seconds']:.3f}s" + self.colors['END'])
+
+    # -------------------------------------------------------------------------------------------------
+    def close(self):
+        """ a method for closing every stream, at the end of the session
+            args: none
+            returns: none
+        """
+        if self.input_stream is not None:
+            self.input_stream.stop_stream()
+            self.input_stream.close()
+            self.pyaudio_instance.terminate()
+            self.input_stream = None
+            self.pyaudio_instance = None
+        self.abort_output()
+
+    # -------------------------------------------------------------------------------------------------
+    def input_callback(self, in_data, frame_count, time_info, status):
+        """ a method for the pyaudio callback, the frames go to every open capture session
+            args: in_data, frame_count, time_info, status
+            returns: (None, paContinue)
+        """
+        if status & pyaudio.paInputOverflow:
+            self.stats["input_overflows"] += 1
+        for capture_session in self.capture_sessions:
+            if capture_session["first_frame_seconds"] is None:
+                self.record_capture_start(capture_session)
+            try:
+                capture_session["on_frames"](in_data)
+            except Exception as e:
+                print(f"Failed to process captured frames. Reason: {e}")
+        return (None, pyaudio.paContinue)
+
+    # -------------------------------------------------------------------------------------------------
+    def open_capture_session(self, on_frames):
+        """ a method for opening a capture session on the shared input stream
+            args: on_frames(pcm_bytes), called on the capture thread
+            returns: capture_session
+        """
+        self.start()
+        capture_session = {"on_frames": on_frames, "open_time": time.perf_counter(), "first_frame_seconds": None}
+        with self.session_lock:
+            self.capture_sessions = self.capture_sessions + (capture_session,)
+            self.stats["sessions_opened"] += 1
+        return capture_session
+
+    # -------------------------------------------------------------------------------------------------
+    def close_capture_session(self, capture_session):
+        """ a method for closing a capture session, the input stream stays open
+            args: capture_session
+            returns: none
+        """
+        with self.session_lock:
+            self.capture_sessions = tuple(session for session in self.capture_sessions if session is not capture_session)
+
+    # -------------------------------------------------------------------------------------------------
+    def record_capture_start(self, capture_session):
+        """ a method for recording how long the capture session waited for its first frame
+            args: capture_session
+            returns: none
+        """
+        capture_session["first_frame_seconds"] = time.perf_counter() - capture_session["open_time"]
+        self.stats["capture_starts"] += 1
+        self.stats["capture_start_seconds"] += capture_session["first_frame_seconds"]
+        self.stats["last_capture_start_seconds"] = capture_session["first_frame_seconds"]
+
+    # -------------------------------------------------------------------------------------------------
+    def get_output_stream(self, sample_rate):
+        """ a method for getting the persistent output stream, it is only opened again when the
+        sample rate changes or after an abort
+            args: sample_rate
+            returns: output_stream
+        """
+        with self.output_lock:
+            if self.output_stream is not None and self.output_sample_rate != sample_rate:
+                self.output_stream.close()
+                self.output_stream = None
+            if self.output_stream is None:
+                start_time = time.perf_counter()
+                self.output_stream = sd.OutputStream(samplerate=sample_rate, channels=1, dtype="float32")
+                self.output_stream.start()
+                self.output_sample_rate = sample_rate
+                self.stats["output_open_seconds"] = time.perf_counter() - start_time
+                self.stats["output_opens"] += 1
+            return self.output_stream
+
+    # -------------------------------------------------------------------------------------------------
+    def abort_output(self):
+        """ a method for dropping the audio queued on the output stream, used for barge-in
+            args: none
+            returns: none
+        """
+        with self.output_lock:
+            if self.output_stream is not None:
+                try:
+                    self.output_stream.abort()
+                    self.output_stream.close()
+                except Exception as e:
+                    print(f"Failed to abort the output stream. Reason: {e}")
+                self.output_stream = None
+
+    # -------------------------------------------------------------------------------------------------
+    def print_stats(self):
+        """ a method for printing the device open times & capture start latency
+            args: none
+            returns: none
+        """
+        stats = dict(self.stats)
+        stats["open_capture_sessions"] = len(self.capture_sessions)
+        stats["average_capture_start_seconds"] = stats["capture_start_seconds"] / stats["capture_starts"] if stats["capture_starts"] else 0.0
+        for key, value in stats.items():
+            if isinstance(value, float):
+                value = f"{value:.3f}"
+            print(self.colors['OKCYAN'] + f"{key}: " + self.colors['OKBLUE'] + f"{value}" + self.colors['END'])
+        return
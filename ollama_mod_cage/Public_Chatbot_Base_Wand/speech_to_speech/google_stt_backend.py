@@ -0,0 +1,41 @@
+""" google_stt_backend.py
+
+        A class for the google web speech recognition backend of the stt_backend_manager, every
+    utterance is one network round trip so it has no partial results and needs internet access.
+"""
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+sr = lazy_module("speech_recognition")
+
+# -------------------------------------------------------------------------------------------------
+class google_stt_backend:
+    """ a class for recognizing speech with the google web speech api
+    """
+    supports_streaming = False
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, developer_tools_dict):
+        """a method for initializing the class
+            args: colors, developer_tools_dict
+        """
+        self.colors = colors
+        self.recognizer = None
+
+    # -------------------------------------------------------------------------------------------------
+    def load(self):
+        """ a method for building the recognizer
+            args: none
+            returns: none
+        """
+        if self.recognizer is None:
+            self.recognizer = sr.Recognizer()
+
+    # -------------------------------------------------------------------------------------------------
+    def transcribe(self, pcm_bytes, sample_rate):
+        """ a method for recognizing a finished utterance
+            args: pcm_bytes, 16 bit mono, sample_rate
+            returns: text
+        """
+        self.load()
+        return self.recognizer.recognize_google(sr.AudioData(pcm_bytes, sample_rate, 2))
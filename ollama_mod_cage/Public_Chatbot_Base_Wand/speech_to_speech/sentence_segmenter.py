@@ -0,0 +1,353 @@
+""" sentence_segmenter.py
+
+        A class for splitting the model response into speakable sentences as the tokens arrive,
+    each character is scanned once and a sentence is emitted as soon as its boundary is certain,
+    only waiting on the few characters of lookahead a boundary needs. Abbreviations, initials,
+    decimals, ellipses and numbered list items do not end a sentence, blank lines and list items
+    do, fenced code blocks are dropped from the speech and no sentence is split inside inline code
+    or a LaTeX span. Sentences longer than max_sentence_chars are split at the last comma or space,
+    which keeps the buffer bounded and the xtts input under its character limit.
+"""
+
+import re
+
+# -------------------------------------------------------------------------------------------------
+class sentence_segmenter:
+    """ a class for the incremental sentence splitting of the tts_processor_class
+    """
+    ABBREVIATIONS = frozenset([
+        "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e", "a.m", "p.m",
+        "u.s", "u.k", "approx", "dept", "est", "fig", "inc", "ltd", "co", "corp", "no", "vol", "ch", "sec",
+    ])
+    # characters the text state cares about, everything between them is skipped by one regex search
+    TEXT_SPECIAL_RE = re.compile(r"[.!?:…\n$`\\]")
+    END_MARKS = ".!?…"
+    CLOSERS = "\"')]}”’»"
+    LIST_MARKERS = "-*+#•"
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, max_sentence_chars=250, skip_code=True, abbreviations=None):
+        """a method for initializing the class
+            args: max_sentence_chars, skip_code, abbreviations
+            with skip_code False a fenced code block is emitted whole as one segment
+        """
+        self.max_sentence_chars = max_sentence_chars
+        self.skip_code = skip_code
+        self.abbreviations = self.ABBREVIATIONS if abbreviations is None else frozenset(abbreviations)
+        self.reset()
+
+    # -------------------------------------------------------------------------------------------------
+    def reset(self):
+        """ a method for clearing the segmenter state before a new response
+            args: none
+            returns: none
+        """
+        self.buffer = ""
+        # start of the sentence being built & the next character to scan
+        self.sentence_start = 0
+        self.pos = 0
+        # closing delimiter of the open code or LaTeX span, None in plain text
+        self.span_close = None
+        self.span_start = 0
+
+    # -------------------------------------------------------------------------------------------------
+    def feed(self, chunk):
+        """ a method for adding the next token chunk
+            args: chunk
+            returns: list of the sentences completed by the chunk
+        """
+        self.buffer += chunk
+        sentences = []
+        self.scan(sentences, final=False)
+        self.compact()
+        return sentences
+
+    # -------------------------------------------------------------------------------------------------
+    def flush(self):
+        """ a method for ending the response, the remaining text is the last sentence
+            args: none
+            returns: list of the remaining sentences
+        """
+        sentences = []
+        self.scan(sentences, final=True)
+        if self.span_close == "```":
+            if not self.skip_code:
+                self.emit_code(self.buffer[self.sentence_start:], sentences)
+        else:
+            self.emit(self.buffer[self.sentence_start:], sentences)
+        self.reset()
+        return sentences
+
+    # -------------------------------------------------------------------------------------------------
+    def split(self, text):
+        """ a method for splitting a complete text
+            args: text
+            returns: list of sentences
+        """
+        self.reset()
+        return self.feed(text) + self.flush()
+
+    # -------------------------------------------------------------------------------------------------
+    def scan(self, sentences, final):
+        """ a method for scanning the buffer until it runs out or needs more lookahead
+            args: sentences, final
+            returns: none
+        """
+        while True:
+            if self.span_close is None:
+                progressed = self.scan_text(sentences, final)
+            else:
+                progressed = self.scan_span(sentences, final)
+            if not progressed:
+                return
+
+    # -------------------------------------------------------------------------------------------------
+    def scan_text(self, sentences, final):
+        """ a method for scanning plain text up to the next character that may change the state
+            args: sentences, final
+            returns: progressed bool
+        """
+        buf = self.buffer
+        match = self.TEXT_SPECIAL_RE.search(buf, self.pos)
+        special_pos = match.start() if match else len(buf)
+        if special_pos - self.sentence_start > self.max_sentence_chars:
+            self.force_split(sentences)
+            return True
+        if match is None:
+            self.pos = len(buf)
+            return False
+
+        char = buf[special_pos]
+        if char in self.END_MARKS or char == ":":
+            return self.scan_end_mark(special_pos, sentences, final)
+        if char == "\n":
+            return self.scan_newline(special_pos, sentences, final)
+
+        # code & LaTeX openers need one or two characters of lookahead
+        lookahead = buf[special_pos + 1:special_pos + 3]
+        if not final:
+            partial_fence = char == "`" and len(lookahead) < 2 and lookahead.strip("`") == ""
+            if partial_fence or (char in "$\\" and not lookahead):
+                self.pos = special_pos
+                return False
+
+        if char == "`":
+            if buf.startswith("```", special_pos):
+                # a code block ends the sentence before it
+                self.emit(buf[self.sentence_start:special_pos], sentences)
+                self.sentence_start = special_pos
+                self.open_span("```", special_pos, 3)
+            else:
+                self.open_span("`", special_pos, 1)
+        elif char == "$":
+            if buf.startswith("$$", special_pos):
+                self.open_span("$$", special_pos, 2)
+            elif lookahead[:1] and not lookahead[0].isspace() and not lookahead[0].isdigit():
+                self.open_span("$", special_pos, 1)
+            else:
+                # a currency amount
+                self.pos = special_pos + 1
+        elif char == "\\" and lookahead[:1] == "[":
+            self.open_span("\\]", special_pos, 2)
+        elif char == "\\" and lookahead[:1] == "(":
+            self.open_span("\\)", special_pos, 2)
+        else:
+            self.pos = special_pos + 1
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def open_span(self, span_close, span_start, opener_length):
+        """ a method for entering a code or LaTeX span
+            args: span_close, span_start, opener_length
+            returns: none
+        """
+        self.span_close = span_close
+        self.span_start = span_start
+        self.pos = span_start + opener_length
+
+    # -------------------------------------------------------------------------------------------------
+    def scan_span(self, sentences, final):
+        """ a method for scanning to the closing delimiter of the open span
+            args: sentences, final
+            returns: progressed bool
+        """
+        buf = self.buffer
+        close_pos = buf.find(self.span_close, self.pos)
+
+        # inline code & math never cross a blank line, an unclosed opener is plain text
+        if self.span_close in ("`", "$"):
+            blank_pos = buf.find("\n\n", self.pos, close_pos if close_pos != -1 else len(buf))
+            if blank_pos != -1:
+                self.span_close = None
+                self.pos = max(self.span_start + 1, self.sentence_start)
+                return True
+
+        if self.span_close == "```":
+            if close_pos == -1:
+                # keep the last two characters, they may be the start of the closing fence
+                self.pos = max(self.pos, self.sentence_start, len(buf) - 2)
+                if self.skip_code:
+                    self.sentence_start = self.pos
+                return False
+            span_end = close_pos + 3
+            if not self.skip_code:
+                self.emit_code(buf[self.sentence_start:span_end], sentences)
+            self.sentence_start = span_end
+        else:
+            if (close_pos if close_pos != -1 else len(buf)) - self.sentence_start > self.max_sentence_chars:
+                self.force_split(sentences)
+                return True
+            if close_pos == -1:
+                self.pos = max(self.pos, len(buf) - 2)
+                if final:
+                    self.pos = len(buf)
+                return False
+            span_end = close_pos + len(self.span_close)
+
+        self.span_close = None
+        self.pos = span_end
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def scan_end_mark(self, mark_pos, sentences, final):
+        """ a method for deciding if the end mark run at mark_pos ends the sentence, it only does
+        when followed by whitespace
+            args: mark_pos, sentences, final
+            returns: progressed bool
+        """
+        buf = self.buffer
+        run_end = mark_pos + 1
+        if buf[mark_pos] != ":":
+            while run_end < len(buf) and buf[run_end] in self.END_MARKS:
+                run_end += 1
+        end = run_end
+        while end < len(buf) and buf[end] in self.CLOSERS:
+            end += 1
+        if end >= len(buf):
+            # wait for the character after the run, at the end of the text flush() emits it
+            self.pos = len(buf) if final else mark_pos
+            return False
+        if not buf[end].isspace():
+            # decimals, urls, times & file names
+            self.pos = end
+            return True
+
+        if self.is_boundary(mark_pos, buf[mark_pos:run_end]):
+            self.emit(buf[self.sentence_start:end], sentences)
+            self.sentence_start = end
+        self.pos = end
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def is_boundary(self, mark_pos, mark_run):
+        """ a method for checking the end mark run against the ellipsis, abbreviation, initial &
+        numbered list item rules
+            args: mark_pos, mark_run
+            returns: boundary bool
+        """
+        # an ellipsis trails off inside the sentence
+        if len(mark_run) > 1 and mark_run.strip(".…") == "":
+            return False
+        if mark_run == "…":
+            return False
+        if mark_run != ".":
+            return True
+
+        buf = self.buffer
+        word_start = mark_pos
+        while word_start > self.sentence_start and not buf[word_start - 1].isspace():
+            word_start -= 1
+        word = buf[word_start:mark_pos].lstrip("\"'([*")
+        if word.lower() in self.abbreviations:
+            return False
+        # an initial such as J. R. R. Tolkien
+        if len(word) == 1 and word.isupper():
+            return False
+        # a numbered list item, the number starts the sentence
+        if word.isdigit() and not buf[self.sentence_start:word_start].strip():
+            return False
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def scan_newline(self, newline_pos, sentences, final):
+        """ a method for deciding if the newline ends the sentence, a blank line or a following list
+        item does
+            args: newline_pos, sentences, final
+            returns: progressed bool
+        """
+        buf = self.buffer
+        next_pos = newline_pos + 1
+        while next_pos < len(buf) and buf[next_pos] in " \t":
+            next_pos += 1
+
+        # at most a list number & its marker of lookahead
+        marker_end = next_pos
+        if marker_end < len(buf) and buf[marker_end].isdigit():
+            while marker_end < len(buf) and buf[marker_end].isdigit() and marker_end - next_pos < 4:
+                marker_end += 1
+        if marker_end + 1 >= len(buf) and not final:
+            self.pos = newline_pos
+            return False
+
+        next_char = buf[next_pos:next_pos + 1]
+        after_marker = buf[marker_end + 1:marker_end + 2]
+        boundary = next_char == "\n"
+        if next_char and next_char in self.LIST_MARKERS and buf[next_pos + 1:next_pos + 2] in (" ", "\t"):
+            boundary = True
+        if next_char.isdigit() and buf[marker_end:marker_end + 1] in (".", ")") and after_marker in (" ", "\t"):
+            boundary = True
+
+        if boundary:
+            self.emit(buf[self.sentence_start:newline_pos], sentences)
+            self.sentence_start = newline_pos + 1
+        self.pos = newline_pos + 1
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def force_split(self, sentences):
+        """ a method for splitting an overlong sentence at its last comma or space
+            args: sentences
+            returns: none
+        """
+        window = self.buffer[self.sentence_start:self.sentence_start + self.max_sentence_chars]
+        cut = max(window.rfind(", "), window.rfind("; "))
+        if cut > 0:
+            cut += 1
+        else:
+            cut = window.rfind(" ")
+            if cut <= 0:
+                cut = len(window)
+        self.emit(window[:cut], sentences)
+        self.sentence_start += cut
+        self.pos = max(self.pos, self.sentence_start)
+
+    # -------------------------------------------------------------------------------------------------
+    def emit(self, text, sentences):
+        """ a method for adding a sentence with its whitespace collapsed, text with nothing to say is dropped
+            args: text, sentences
+            returns: none
+        """
+        sentence = " ".join(text.split())
+        if any(char.isalnum() for char in sentence):
+            sentences.append(sentence)
+
+    # -------------------------------------------------------------------------------------------------
+    def emit_code(self, text, sentences):
+        """ a method for adding a fenced code block as one segment with its layout kept
+            args: text, sentences
+            returns: none
+        """
+        if text.strip():
+            sentences.append(text.strip())
+
+    # -------------------------------------------------------------------------------------------------
+    def compact(self):
+        """ a method for dropping the emitted text from the front of the buffer
+            args: none
+            returns: none
+        """
+        if self.sentence_start > 0:
+            self.buffer = self.buffer[self.sentence_start:]
+            self.pos -= self.sentence_start
+            self.span_start -= self.sentence_start
+            self.sentence_start = 0
@@ -0,0 +1,112 @@
+""" sentence_segmenter_benchmark.py
+
+        A throughput benchmark for the sentence_segmenter, large model style responses are generated
+    with abbreviations, decimals, ellipses, numbered & bulleted lists, code blocks and LaTeX spans,
+    then split whole and streamed in small token sized chunks. The streamed sentences must match
+    the whole text sentences, and a flat chars per second across the corpus sizes shows the
+    segmenter stays linear. Run it from the ollama_mod_cage directory:
+
+        python -m Public_Chatbot_Base_Wand.speech_to_speech.sentence_segmenter_benchmark
+"""
+
+import random
+import time
+
+from Public_Chatbot_Base_Wand.speech_to_speech.sentence_segmenter import sentence_segmenter
+
+CORPUS_SIZES = [256 * 1024, 1024 * 1024, 4 * 1024 * 1024]
+
+WORDS = ["the", "model", "voice", "agent", "quickly", "renders", "a", "sentence", "with", "speech", "over",
+         "minecraft", "zombie", "llama", "of", "latency", "and", "buffer", "token", "stream", "cpu"]
+
+# -------------------------------------------------------------------------------------------------
+def generate_sentence(rng):
+    """ a method for generating one plain sentence
+        args: rng
+        returns: sentence
+    """
+    words = [rng.choice(WORDS) for _ in range(rng.randint(4, 18))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice([".", ".", ".", "?", "!", "?!", "..."])
+
+# -------------------------------------------------------------------------------------------------
+def generate_corpus(target_chars, seed=0):
+    """ a method for generating a model style response corpus of about target_chars
+        args: target_chars, seed
+        returns: corpus
+    """
+    rng = random.Random(seed)
+    parts = []
+    total_chars = 0
+    while total_chars < target_chars:
+        kind = rng.random()
+        if kind < 0.55:
+            part = " ".join(generate_sentence(rng) for _ in range(rng.randint(1, 5)))
+        elif kind < 0.65:
+            part = f"Dr. Smith measured {rng.randint(0, 99)}.{rng.randint(0, 99)} ms, e.g. on the U.S. servers. {generate_sentence(rng)}"
+        elif kind < 0.75:
+            part = "Here are the steps:\n" + "\n".join(f"{n}. {generate_sentence(rng)}" for n in range(1, rng.randint(3, 7)))
+        elif kind < 0.82:
+            part = "\n".join(f"- {generate_sentence(rng)}" for _ in range(rng.randint(2, 5)))
+        elif kind < 0.9:
+            part = f"Run this:\n```python\nx = {rng.random():.3f}. print(x)\nfor i in range(3): pass\n```\n{generate_sentence(rng)}"
+        else:
+            part = f"The term $a_{{{rng.randint(1, 9)}}}. b$ and \\[ x^2. y \\] hold. {generate_sentence(rng)}"
+        parts.append(part)
+        total_chars += len(part) + 2
+    return "\n\n".join(parts)
+
+# -------------------------------------------------------------------------------------------------
+def split_streamed(corpus, seed=0):
+    """ a method for splitting the corpus fed in token sized chunks
+        args: corpus, seed
+        returns: sentences
+    """
+    rng = random.Random(seed)
+    # cut the chunks up front so only the segmenter is timed
+    chunks = []
+    chunk_start = 0
+    while chunk_start < len(corpus):
+        chunk_end = chunk_start + rng.randint(1, 8)
+        chunks.append(corpus[chunk_start:chunk_end])
+        chunk_start = chunk_end
+
+    sentence_segmenter_instance = sentence_segmenter()
+    sentences = []
+    start_time = time.perf_counter()
+    for chunk in chunks:
+        sentences.extend(sentence_segmenter_instance.feed(chunk))
+    sentences.extend(sentence_segmenter_instance.flush())
+    return sentences, time.perf_counter() - start_time
+
+# -------------------------------------------------------------------------------------------------
+def run_segmenter_benchmark(corpus_sizes=CORPUS_SIZES):
+    """ a method for measuring the whole text & streamed segmenter throughput on each corpus size
+        args: corpus_sizes
+        returns: results list of dicts
+    """
+    results = []
+    print(f"{'chars':>10}{'sentences':>12}{'whole MB/s':>13}{'streamed MB/s':>16}{'match':>8}")
+    for corpus_size in corpus_sizes:
+        corpus = generate_corpus(corpus_size)
+
+        start_time = time.perf_counter()
+        whole_sentences = sentence_segmenter().split(corpus)
+        whole_seconds = time.perf_counter() - start_time
+
+        streamed_sentences, streamed_seconds = split_streamed(corpus)
+        megabytes = len(corpus) / (1024 * 1024)
+        result = {
+            "chars": len(corpus),
+            "sentences": len(whole_sentences),
+            "whole_mb_per_second": megabytes / whole_seconds,
+            "streamed_mb_per_second": megabytes / streamed_seconds,
+            "match": whole_sentences == streamed_sentences,
+        }
+        results.append(result)
+        print(f"{result['chars']:>10}{result['sentences']:>12}{result['whole_mb_per_second']:>13.2f}"
+              f"{result['streamed_mb_per_second']:>16.2f}{str(result['match']):>8}")
+    return results
+
+if __name__ == "__main__":
+    run_segmenter_benchmark()
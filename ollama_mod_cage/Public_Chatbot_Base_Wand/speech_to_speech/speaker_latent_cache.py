@@ -0,0 +1,92 @@
+""" speaker_latent_cache.py
+
+        A class for caching the xtts speaker conditioning latents for each voice reference wav,
+    the gpt conditioning latent & speaker embedding are computed once per voice, kept in a
+    small LRU in memory, and saved to the speech library keyed by the reference wav's content
+    hash so later sentences, voice swaps and sessions skip the conditioning step.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+torch = lazy_module("torch")
+
+# -------------------------------------------------------------------------------------------------
+class speaker_latent_cache:
+    """ a class for managing the xtts speaker latents for the tts_processor_class
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, xtts_model, cache_dir, device, max_voices=8):
+        """a method for initializing the class
+            args: xtts_model, cache_dir, device, max_voices
+            xtts_model & device may be set after construction while the model is still loading
+        """
+        self.xtts_model = xtts_model
+        self.cache_dir = cache_dir
+        self.device = device
+        self.max_voices = max_voices
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # content hash -> (gpt_cond_latent, speaker_embedding)
+        self.speaker_latents = OrderedDict()
+        # (path, size, mtime) -> content hash, so the wav is only hashed again when it changes
+        self.wav_hashes = {}
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    # -------------------------------------------------------------------------------------------------
+    def hash_reference_wav(self, voice_name_path):
+        """ a method for getting the content hash of the voice reference wav
+            args: voice_name_path
+            returns: wav_hash
+        """
+        wav_stat = os.stat(voice_name_path)
+        wav_key = (voice_name_path, wav_stat.st_size, wav_stat.st_mtime)
+        if wav_key not in self.wav_hashes:
+            sha256 = hashlib.sha256()
+            with open(voice_name_path, "rb") as wav_file:
+                for block in iter(lambda: wav_file.read(1 << 20), b""):
+                    sha256.update(block)
+            self.wav_hashes[wav_key] = sha256.hexdigest()
+        return self.wav_hashes[wav_key]
+
+    # -------------------------------------------------------------------------------------------------
+    def get_speaker_latents(self, voice_name_path):
+        """ a method for getting the speaker latents from memory, then the cache file, and only
+        computing them from the reference wav when neither has them
+            args: voice_name_path
+            returns: gpt_cond_latent, speaker_embedding
+        """
+        with self.lock:
+            wav_hash = self.hash_reference_wav(voice_name_path)
+            if wav_hash in self.speaker_latents:
+                self.speaker_latents.move_to_end(wav_hash)
+                self.stats["memory_hits"] += 1
+                return self.speaker_latents[wav_hash]
+
+            cache_file = os.path.join(self.cache_dir, f"{wav_hash}.pth")
+            latents = None
+            if os.path.isfile(cache_file):
+                try:
+                    cached = torch.load(cache_file, map_location=self.device, weights_only=True)
+                    latents = (cached["gpt_cond_latent"], cached["speaker_embedding"])
+                    self.stats["disk_hits"] += 1
+                except Exception as e:
+                    print(f"Failed to load speaker latents {cache_file}. Reason: {e}")
+
+            if latents is None:
+                latents = self.xtts_model.get_conditioning_latents(audio_path=[voice_name_path])
+                self.stats["misses"] += 1
+                try:
+                    torch.save({"gpt_cond_latent": latents[0], "speaker_embedding": latents[1]}, cache_file)
+                except Exception as e:
+                    print(f"Failed to save speaker latents {cache_file}. Reason: {e}")
+
+            self.speaker_latents[wav_hash] = latents
+            while len(self.speaker_latents) > self.max_voices:
+                self.speaker_latents.popitem(last=False)
+            return latents
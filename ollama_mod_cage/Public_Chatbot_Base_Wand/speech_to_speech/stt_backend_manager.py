@@ -0,0 +1,243 @@
+""" stt_backend_manager.py
+
+        A class for selecting the speech recognition backend of the ollama_chatbot_base, google web
+    speech, offline faster-whisper or offline vosk. A backend provides load & transcribe, and a
+    streaming backend also provides start_stream, accept_audio & finish_stream. While the user is
+    talking the voice activity frames are recognized on a worker thread and the partial text is
+    printed, so the final text is ready soon after the utterance ends. The latency from the end of
+    each utterance to its text is kept per backend for comparing them with /stt stats.
+"""
+
+import queue
+import threading
+import time
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+from Public_Chatbot_Base_Wand.speech_to_speech.google_stt_backend import google_stt_backend
+from Public_Chatbot_Base_Wand.speech_to_speech.whisper_stt_backend import whisper_stt_backend
+from Public_Chatbot_Base_Wand.speech_to_speech.vosk_stt_backend import vosk_stt_backend
+
+sr = lazy_module("speech_recognition")
+
+# -------------------------------------------------------------------------------------------------
+class stt_backend_manager:
+    """ a class for managing the speech recognition backends
+    """
+    BACKENDS = {
+        "google": google_stt_backend,
+        "whisper": whisper_stt_backend,
+        "vosk": vosk_stt_backend,
+    }
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, developer_tools_dict, sample_rate=16000):
+        """a method for initializing the class
+            args: colors, developer_tools_dict, sample_rate
+        """
+        self.colors = colors
+        self.developer_tools_dict = developer_tools_dict
+        self.sample_rate = sample_rate
+        self.backend_instances = {}
+        self.backend_name = "google"
+        self.stats = {}
+
+        # voice activity frames are recognized on the stream worker, in order, and each result is
+        # tagged with its utterance id so a late result is never taken for the next utterance
+        self.stream_queue = queue.Queue()
+        self.stream_results = queue.Queue()
+        self.stream_thread = None
+
+        self.set_backend(developer_tools_dict.get('stt_backend', "google"))
+
+    # -------------------------------------------------------------------------------------------------
+    def get_backend(self, backend_name=None):
+        """ a method for getting a backend instance, loaded models are kept when swapping backends
+            args: backend_name, defaults to the selected backend
+            returns: backend_instance
+        """
+        backend_name = backend_name or self.backend_name
+        if backend_name not in self.backend_instances:
+            self.backend_instances[backend_name] = self.BACKENDS[backend_name](self.colors, self.developer_tools_dict)
+        return self.backend_instances[backend_name]
+
+    # -------------------------------------------------------------------------------------------------
+    def set_backend(self, backend_name):
+        """ a method for selecting the speech recognition backend, the model loads in the background
+            args: backend_name
+            returns: none
+        """
+        if backend_name not in self.BACKENDS:
+            print(self.colors['FAIL'] + f"Unknown stt backend {backend_name}, choose from {', '.join(self.BACKENDS)}" + self.colors['END'])
+            return
+        self.backend_name = backend_name
+        threading.Thread(target=self.load_backend, args=(self.get_backend(),), daemon=True).start()
+        print(f"stt_backend STATE: {self.backend_name}")
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def load_backend(self, backend_instance):
+        """ a method for loading a backend model, run on a worker thread
+            args: backend_instance
+            returns: none
+        """
+        try:
+            backend_instance.load()
+        except Exception as e:
+            print(self.colors['FAIL'] + f"Failed to load the stt backend. Reason: {e}" + self.colors['END'])
+
+    # -------------------------------------------------------------------------------------------------
+    def speech_frames(self, pcm_bytes, utterance_start, utterance_id):
+        """ a method for receiving the voice activity frames of the utterance, called from the capture thread
+            args: pcm_bytes, utterance_start bool, True for the first frames of an utterance, utterance_id
+            returns: none
+        """
+        if self.stream_thread is None:
+            self.stream_thread = threading.Thread(target=self.stream_worker, daemon=True)
+            self.stream_thread.start()
+        if utterance_start is True:
+            self.stream_queue.put(("start", utterance_id))
+        self.stream_queue.put(("frames", pcm_bytes))
+
+    # -------------------------------------------------------------------------------------------------
+    def speech_end(self, kept, utterance_id):
+        """ a method for receiving the end of the voice activity utterance, called from the capture thread
+            args: kept bool, False when the utterance was dropped as noise, utterance_id
+            returns: none
+        """
+        self.stream_queue.put(("end", (kept, utterance_id)))
+
+    # -------------------------------------------------------------------------------------------------
+    def stream_worker(self):
+        """ a method for the incremental recognition worker, frames that piled up while a partial was
+        decoding are joined so the worker keeps up with the microphone
+            args: none
+            returns: none
+        """
+        stream_backend = None
+        last_partial = ""
+        pending_event = None
+        while True:
+            event, value = pending_event if pending_event is not None else self.stream_queue.get()
+            pending_event = None
+            try:
+                if event == "start":
+                    stream_backend = self.get_backend()
+                    if stream_backend.supports_streaming:
+                        stream_backend.start_stream(self.sample_rate)
+                    else:
+                        stream_backend = None
+                    last_partial = ""
+                elif event == "frames" and stream_backend is not None:
+                    frames = [value]
+                    while pending_event is None:
+                        try:
+                            next_event = self.stream_queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if next_event[0] == "frames":
+                            frames.append(next_event[1])
+                        else:
+                            pending_event = next_event
+                    partial = stream_backend.accept_audio(b"".join(frames))
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        print(self.colors['OKCYAN'] + f">>{partial}<<" + self.colors['END'])
+                elif event == "end":
+                    text = None
+                    if stream_backend is not None:
+                        text = stream_backend.finish_stream()
+                    stream_backend = None
+                    if value[0] is True:
+                        # None tells recognize to transcribe the whole utterance
+                        self.stream_results.put((value[1], text))
+            except Exception as e:
+                print(f"Failed to recognize the speech stream. Reason: {e}")
+                if stream_backend is not None and event == "end" and value[0] is True:
+                    self.stream_results.put((value[1], None))
+                stream_backend = None
+
+    # -------------------------------------------------------------------------------------------------
+    def recognize(self, pcm_bytes, sample_rate, utterance_id=None):
+        """ a method for recognizing a finished utterance, a streamed utterance takes the text the
+        stream worker already decoded
+            args: pcm_bytes, sample_rate, utterance_id, of a voice activity utterance, None for hotkey audio
+            returns: text
+        """
+        start_time = time.perf_counter()
+        backend_name = self.backend_name
+        text = None
+        if utterance_id is not None:
+            text = self.get_stream_result(utterance_id, timeout=60)
+        try:
+            if text is None:
+                text = self.get_backend(backend_name).transcribe(pcm_bytes, sample_rate)
+        except Exception:
+            self.record_latency(backend_name, pcm_bytes, sample_rate, start_time, failed=True)
+            raise
+        self.record_latency(backend_name, pcm_bytes, sample_rate, start_time)
+        if not text or not text.strip():
+            raise sr.UnknownValueError()
+        return text.strip()
+
+    # -------------------------------------------------------------------------------------------------
+    def clear_results(self):
+        """ a method for dropping the stream results not yet taken, when listening starts
+            args: none
+            returns: none
+        """
+        while True:
+            try:
+                self.stream_results.get_nowait()
+            except queue.Empty:
+                break
+
+    # -------------------------------------------------------------------------------------------------
+    def get_stream_result(self, utterance_id, timeout):
+        """ a method for waiting on the stream worker's text of an utterance, the late results of
+        earlier utterances are dropped
+            args: utterance_id, timeout
+            returns: text, or None when the worker has no text for it in time
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                result_id, text = self.stream_results.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return None
+            if result_id == utterance_id:
+                return text
+            if result_id > utterance_id:
+                # a later utterance's text, left for its own recognize call
+                self.stream_results.put((result_id, text))
+                return None
+
+    # -------------------------------------------------------------------------------------------------
+    def record_latency(self, backend_name, pcm_bytes, sample_rate, start_time, failed=False):
+        """ a method for adding an utterance to the backend latency counters
+            args: backend_name, pcm_bytes, sample_rate, start_time, failed
+            returns: none
+        """
+        latency = time.perf_counter() - start_time
+        backend_stats = self.stats.setdefault(backend_name, {"utterances": 0, "failures": 0, "latency_seconds": 0.0, "last_latency_seconds": 0.0, "audio_seconds": 0.0})
+        backend_stats["utterances"] += 1
+        backend_stats["failures"] += 1 if failed else 0
+        backend_stats["latency_seconds"] += latency
+        backend_stats["last_latency_seconds"] = latency
+        backend_stats["audio_seconds"] += len(pcm_bytes) / 2 / sample_rate
+        print(self.colors['OKCYAN'] + f"stt {backend_name} latency: {latency:.3f}s" + self.colors['END'])
+
+    # -------------------------------------------------------------------------------------------------
+    def print_stats(self):
+        """ a method for printing the recognition latency of each backend used
+            args: none
+            returns: none
+        """
+        if not self.stats:
+            print(self.colors['OKCYAN'] + "no utterances recognized yet" + self.colors['END'])
+            return
+        print(f"{'backend':<10}{'utterances':>12}{'failures':>10}{'avg latency':>13}{'last latency':>14}{'audio s':>10}")
+        for backend_name, backend_stats in self.stats.items():
+            average_latency = backend_stats["latency_seconds"] / backend_stats["utterances"]
+            print(f"{backend_name:<10}{backend_stats['utterances']:>12}{backend_stats['failures']:>10}{average_latency:>13.3f}"
+                  f"{backend_stats['last_latency_seconds']:>14.3f}{backend_stats['audio_seconds']:>10.1f}")
+        return
@@ -0,0 +1,99 @@
+""" tts_cpu_optimizer.py
+
+        A class for preparing the xtts model for cpu only hosts, torch thread counts are matched to
+    the physical cores, the gpt transformer's Conv1D projections are swapped for equivalent Linear
+    layers, and every Linear layer is dynamically quantized to int8 when the torch build has a
+    quantized cpu engine. Synthesis itself runs under torch.inference_mode in the tts_processor_class.
+"""
+
+import os
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+torch = lazy_module("torch")
+
+# -------------------------------------------------------------------------------------------------
+class tts_cpu_optimizer:
+    """ a class for applying the cpu inference optimizations to the xtts model
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, num_threads=None):
+        """a method for initializing the class
+            args: colors, num_threads, defaults to the physical core estimate
+        """
+        self.colors = colors
+        self.num_threads = num_threads
+
+    # -------------------------------------------------------------------------------------------------
+    def set_thread_counts(self):
+        """ a method for setting the torch thread pools, hyper threads slow the gemm kernels down so
+        the intra op pool gets one thread per physical core
+            args: none
+            returns: num_threads
+        """
+        num_threads = self.num_threads or max(1, (os.cpu_count() or 2) // 2)
+        torch.set_num_threads(num_threads)
+        try:
+            # only allowed before the first parallel op has run
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+        return num_threads
+
+    # -------------------------------------------------------------------------------------------------
+    def convert_conv1d_to_linear(self, module):
+        """ a method for replacing the transformers Conv1D layers of the gpt with Linear layers, Conv1D
+        is a transposed Linear that quantize_dynamic does not recognize
+            args: module
+            returns: converted_count
+        """
+        converted_count = 0
+        for child_name, child in module.named_children():
+            if type(child).__name__ == "Conv1D" and hasattr(child, "nf"):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features, bias=child.bias is not None)
+                with torch.no_grad():
+                    linear.weight.copy_(child.weight.t())
+                    if child.bias is not None:
+                        linear.bias.copy_(child.bias)
+                setattr(module, child_name, linear.to(child.weight.device))
+                converted_count += 1
+            else:
+                converted_count += self.convert_conv1d_to_linear(child)
+        return converted_count
+
+    # -------------------------------------------------------------------------------------------------
+    def quantize_dynamic_int8(self, module):
+        """ a method for dynamically quantizing the Linear layers to int8 in place, skipped when
+        the torch build has no quantized cpu engine
+            args: module
+            returns: quantized bool
+        """
+        supported_engines = torch.backends.quantized.supported_engines
+        for engine in ("fbgemm", "x86", "qnnpack"):
+            if engine in supported_engines:
+                torch.backends.quantized.engine = engine
+                break
+        else:
+            print(self.colors['WARNING'] + "int8 quantization is not supported by this torch build, using full precision" + self.colors['END'])
+            return False
+        # in place, the gpt inference wrapper keeps references to the same transformer blocks
+        torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return True
+
+    # -------------------------------------------------------------------------------------------------
+    def optimize(self, xtts_model):
+        """ a method for applying every cpu optimization to the xtts model
+            args: xtts_model
+            returns: none
+        """
+        num_threads = self.set_thread_counts()
+        xtts_model.eval()
+        quantized = False
+        try:
+            converted_count = self.convert_conv1d_to_linear(xtts_model.gpt)
+            quantized = self.quantize_dynamic_int8(xtts_model.gpt)
+        except Exception as e:
+            converted_count = 0
+            print(self.colors['WARNING'] + f"Failed to quantize the tts model, using full precision. Reason: {e}" + self.colors['END'])
+        print(self.colors['OKCYAN'] + f"<<< TTS CPU MODE >>> threads: {num_threads}, Conv1D converted: {converted_count}, int8: {quantized}" + self.colors['END'])
@@ -0,0 +1,201 @@
+""" tts_phrase_cache.py
+
+        A class for caching the generated speech of short repeated phrases, greetings, model swap
+    notices, flag acknowledgements and canned warnings are spoken from the cache instead of
+    running xtts again. Phrases are content addressed by the normalized sentence, voice, language,
+    speed, model id and cpu optimization, stored as flac files and evicted least recently used past
+    the size cap. Only a phrase generated a second time is stored, one off sentences of a response
+    are only counted in memory, and the flac encode & write run on a background writer thread so
+    speech generation never waits on the disk.
+"""
+
+import os
+import re
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+np = lazy_module("numpy")
+sf = lazy_module("soundfile")
+
+# -------------------------------------------------------------------------------------------------
+class tts_phrase_cache:
+    """ a class for managing the synthesized phrase cache for the tts_processor_class
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, cache_dir, sample_rate, max_bytes=64 * 1024 * 1024, max_phrase_chars=160, store_after_uses=2, max_seen_phrases=1024, max_pending_writes=16):
+        """a method for initializing the class
+            args: cache_dir, sample_rate, max_bytes, max_phrase_chars, store_after_uses, generations of a
+                phrase before it is stored, max_seen_phrases, phrase keys counted in memory,
+                max_pending_writes, phrases waiting on the writer before new ones are dropped
+        """
+        self.cache_dir = cache_dir
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_phrase_chars = max_phrase_chars
+        self.store_after_uses = max(1, store_after_uses)
+        self.max_seen_phrases = max_seen_phrases
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "dropped_writes": 0}
+
+        # phrase key -> generations of a phrase not stored yet, oldest first
+        self.seen_phrases = OrderedDict()
+
+        # the writer thread is started on the first store
+        self.write_queue = queue.Queue(maxsize=max_pending_writes)
+        self.writer_thread = None
+
+        # phrase key -> file size, oldest use first
+        self.phrase_index = OrderedDict()
+        self.total_bytes = 0
+        self.load_index()
+
+    # -------------------------------------------------------------------------------------------------
+    def load_index(self):
+        """ a method for rebuilding the LRU index from the cache files, ordered by last use
+            args: none
+            returns: none
+        """
+        cache_files = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".flac.tmp"):
+                # a write cut off by the last exit
+                os.remove(os.path.join(self.cache_dir, filename))
+            elif filename.endswith(".flac"):
+                file_stat = os.stat(os.path.join(self.cache_dir, filename))
+                cache_files.append((file_stat.st_mtime, filename[:-len(".flac")], file_stat.st_size))
+        for _, phrase_key, file_size in sorted(cache_files):
+            self.phrase_index[phrase_key] = file_size
+            self.total_bytes += file_size
+
+    # -------------------------------------------------------------------------------------------------
+    def get_phrase_key(self, sentence, voice_id, language, speed, model_id, cpu_optimize_flag=False):
+        """ a method for building the content address of a phrase
+            args: sentence, voice_id, language, speed, model_id, cpu_optimize_flag, the quantized cpu
+                model speaks slightly differently
+            returns: phrase_key, or None when the phrase is too long to be worth caching
+        """
+        normalized = re.sub(r"\s+", " ", sentence).strip().lower()
+        if not normalized or len(normalized) > self.max_phrase_chars:
+            return None
+        key_str = "\x1f".join([normalized, str(voice_id), str(language), str(speed), str(model_id), str(bool(cpu_optimize_flag))])
+        return hashlib.sha256(key_str.encode("utf-8")).hexdigest()
+
+    # -------------------------------------------------------------------------------------------------
+    def get_phrase_path(self, phrase_key):
+        """ a method for getting the cache file path of a phrase
+            args: phrase_key
+            returns: phrase_path
+        """
+        return os.path.join(self.cache_dir, f"{phrase_key}.flac")
+
+    # -------------------------------------------------------------------------------------------------
+    def get(self, phrase_key):
+        """ a method for reading a phrase from the cache
+            args: phrase_key
+            returns: audio_data, or None on a cache miss
+        """
+        if phrase_key is None:
+            return None
+        with self.lock:
+            if phrase_key not in self.phrase_index:
+                self.stats["misses"] += 1
+                return None
+            self.phrase_index.move_to_end(phrase_key)
+        phrase_path = self.get_phrase_path(phrase_key)
+        try:
+            audio_data, _ = sf.read(phrase_path, dtype="float32")
+            # refresh the last use time so the LRU order survives a restart
+            os.utime(phrase_path)
+        except Exception as e:
+            print(f"Failed to read cached phrase {phrase_path}. Reason: {e}")
+            with self.lock:
+                self.total_bytes -= self.phrase_index.pop(phrase_key, 0)
+                self.stats["misses"] += 1
+            return None
+        with self.lock:
+            self.stats["hits"] += 1
+        return audio_data
+
+    # -------------------------------------------------------------------------------------------------
+    def put(self, phrase_key, audio_data):
+        """ a method for counting a generated phrase & handing it to the writer thread once it was
+        generated store_after_uses times, never blocks on the disk
+            args: phrase_key, audio_data
+            returns: none
+        """
+        if phrase_key is None:
+            return
+        with self.lock:
+            if phrase_key in self.phrase_index:
+                return
+            uses = self.seen_phrases.pop(phrase_key, 0) + 1
+            if uses < self.store_after_uses:
+                self.seen_phrases[phrase_key] = uses
+                while len(self.seen_phrases) > self.max_seen_phrases:
+                    self.seen_phrases.popitem(last=False)
+                return
+            if self.writer_thread is None:
+                self.writer_thread = threading.Thread(target=self.write_worker, daemon=True)
+                self.writer_thread.start()
+        try:
+            self.write_queue.put_nowait((phrase_key, audio_data))
+        except queue.Full:
+            with self.lock:
+                self.stats["dropped_writes"] += 1
+
+    # -------------------------------------------------------------------------------------------------
+    def write_worker(self):
+        """ a method for the writer thread, encoding the stored phrases to flac & evicting the least
+        recently used phrases past the size cap
+            args: none
+            returns: none
+        """
+        while True:
+            phrase_key, audio_data = self.write_queue.get()
+            phrase_path = self.get_phrase_path(phrase_key)
+            temp_path = f"{phrase_path}.tmp"
+            try:
+                # written aside & renamed so a reader never sees a partial file
+                sf.write(temp_path, np.clip(audio_data, -1.0, 1.0), self.sample_rate, format="FLAC", subtype="PCM_16")
+                os.replace(temp_path, phrase_path)
+                file_size = os.path.getsize(phrase_path)
+            except Exception as e:
+                print(f"Failed to cache phrase {phrase_path}. Reason: {e}")
+                continue
+
+            evicted_keys = []
+            with self.lock:
+                self.total_bytes += file_size - self.phrase_index.pop(phrase_key, 0)
+                self.phrase_index[phrase_key] = file_size
+                self.stats["stores"] += 1
+                while self.total_bytes > self.max_bytes and len(self.phrase_index) > 1:
+                    old_key, old_size = self.phrase_index.popitem(last=False)
+                    self.total_bytes -= old_size
+                    self.stats["evictions"] += 1
+                    evicted_keys.append(old_key)
+            for old_key in evicted_keys:
+                try:
+                    os.remove(self.get_phrase_path(old_key))
+                except OSError as e:
+                    print(f"Failed to evict cached phrase {old_key}. Reason: {e}")
+
+    # -------------------------------------------------------------------------------------------------
+    def get_stats(self):
+        """ a method for getting the phrase cache counters
+            args: none
+            returns: stats dict
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["phrases"] = len(self.phrase_index)
+            stats["seen_phrases"] = len(self.seen_phrases)
+            stats["cache_bytes"] = self.total_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
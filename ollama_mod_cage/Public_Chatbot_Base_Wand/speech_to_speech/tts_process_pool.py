@@ -0,0 +1,80 @@
+""" tts_process_pool.py
+
+        A class for sharding the speech generation across a pool of worker processes, each worker
+    holds its own xtts model copy so sentences are synthesized in parallel on multi core cpu only
+    hosts. Workers are spawned, never forked, so no torch or audio state is shared with the
+    chatbot process, and the cpu threads are divided between the workers. Each model copy costs
+    its own memory, so the pool is off unless tts_pool_workers is set in developer_custom.json.
+"""
+
+import os
+import multiprocessing
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+np = lazy_module("numpy")
+torch = lazy_module("torch")
+
+# the tts processor of this worker process, built by init_tts_worker
+worker_tts_processor = None
+
+# -------------------------------------------------------------------------------------------------
+def init_tts_worker(colors, developer_tools_dict, cpu_optimize, threads_per_worker):
+    """ a method for building the xtts model in a pool worker process
+        args: colors, developer_tools_dict, cpu_optimize, threads_per_worker
+        returns: none
+    """
+    global worker_tts_processor
+    # imported here, the chatbot process only needs the pool
+    from Public_Chatbot_Base_Wand.speech_to_speech.tts_processor_class import tts_processor_class
+
+    torch.set_num_threads(threads_per_worker)
+    worker_tts_processor = tts_processor_class(colors, developer_tools_dict, cpu_optimize=cpu_optimize, cpu_threads=threads_per_worker, tts_pool_workers=0)
+    worker_tts_processor.wait_for_tts_model()
+
+# -------------------------------------------------------------------------------------------------
+def synthesize_in_worker(sentence, voice_name_path):
+    """ a method for synthesizing one sentence in a pool worker process
+        args: sentence, voice_name_path
+        returns: tts_audio
+    """
+    tts_audio = worker_tts_processor.synthesize_sentence(sentence, voice_name_path)
+    return np.array(tts_audio, dtype=np.float32)
+
+# -------------------------------------------------------------------------------------------------
+class tts_process_pool:
+    """ a class for managing the speech generation worker processes for the tts_processor_class
+    """
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, developer_tools_dict, num_workers, cpu_optimize=False):
+        """a method for initializing the class
+            args: colors, developer_tools_dict, num_workers, cpu_optimize
+        """
+        self.colors = colors
+        self.num_workers = max(1, int(num_workers))
+        # split the physical cores between the workers so they do not fight over them
+        self.threads_per_worker = max(1, ((os.cpu_count() or 2) // 2) // self.num_workers)
+
+        self.pool = multiprocessing.get_context("spawn").Pool(
+            processes=self.num_workers,
+            initializer=init_tts_worker,
+            initargs=(colors, developer_tools_dict, cpu_optimize, self.threads_per_worker),
+        )
+        print(self.colors['OKCYAN'] + f"<<< TTS PROCESS POOL >>> workers: {self.num_workers}, threads per worker: {self.threads_per_worker}" + self.colors['END'])
+
+    # -------------------------------------------------------------------------------------------------
+    def synthesize(self, sentence, voice_name_path):
+        """ a method for synthesizing one sentence on the next free worker, blocks until it is done
+            args: sentence, voice_name_path
+            returns: tts_audio
+        """
+        return self.pool.apply(synthesize_in_worker, (sentence, voice_name_path))
+
+    # -------------------------------------------------------------------------------------------------
+    def close(self):
+        """ a method for shutting the worker processes down
+            args: none
+            returns: none
+        """
+        self.pool.close()
+        self.pool.join()
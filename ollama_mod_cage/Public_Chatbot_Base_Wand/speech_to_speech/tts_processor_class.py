@@ -8,26 +8,38 @@ created on: 4/20/2024
 by @LeoBorcherding
 """
 
-import sounddevice as sd
-import soundfile as sf
 import threading
 import os
-import torch
 import re
 import queue
-from TTS.api import TTS
-import numpy as np
 import shutil
+import time
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+from Public_Chatbot_Base_Wand.speech_to_speech.tts_scheduler_class import tts_scheduler_class
+from Public_Chatbot_Base_Wand.speech_to_speech.speaker_latent_cache import speaker_latent_cache
+from Public_Chatbot_Base_Wand.speech_to_speech.tts_phrase_cache import tts_phrase_cache
+from Public_Chatbot_Base_Wand.speech_to_speech.tts_cpu_optimizer import tts_cpu_optimizer
+from Public_Chatbot_Base_Wand.speech_to_speech.tts_process_pool import tts_process_pool
+from Public_Chatbot_Base_Wand.speech_to_speech.sentence_segmenter import sentence_segmenter
+
+# heavy dependencies are imported on first use
+sd = lazy_module("sounddevice")
+sf = lazy_module("soundfile")
+np = lazy_module("numpy")
+torch = lazy_module("torch")
+tts_api = lazy_module("TTS.api")
 
 # -------------------------------------------------------------------------------------------------
 class tts_processor_class:
     """ a class for managing the text to speech conversation between the user, ollama, & coqui-tts.
     """
     # -------------------------------------------------------------------------------------------------
-    def __init__(self, colors, developer_tools_dict):
+    def __init__(self, colors, developer_tools_dict, cpu_optimize=None, cpu_threads=None, tts_pool_workers=None):
         """a method for initializing the class
+            args: colors, developer_tools_dict, cpu_optimize, defaults to tts_cpu_optimize in developer_custom.json,
+                cpu_threads, tts_pool_workers, defaults to tts_pool_workers in developer_custom.json
         """ 
-        #TODO ADD SHUT UP FUNCTION TO INTERJECT AND CUT OFF AI MID PROMPT
         self.developer_tools_dict = developer_tools_dict
         self.current_dir = developer_tools_dict['current_dir']
         self.parent_dir = developer_tools_dict['parent_dir']
@@ -43,16 +55,167 @@ class tts_processor_class:
         # self.tts_voice_ref_wav_pack_path = os.path.join(self.parent_dir, "AgentFiles\\Ignored_pipeline\\public_speech\\Public_Voice_Reference_Pack")
         # self.conversation_library = os.path.join(self.parent_dir, "AgentFiles\\Ignored_pipeline\\conversation_library")
         self.colors = colors
-        
-        if torch.cuda.is_available():
-            self.device = "cuda"
-        else:
-            self.device = "cpu"
-            print("CUDA-compatible GPU is not available. Using CPU instead. If you believe this should not be the case, reinstall torch-audio with the correct version.")
 
-        self.tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(self.device)
+        self.tts_model_name = "tts_models/multilingual/multi-dataset/xtts_v2"
+        self.tts_language = "en"
+        self.tts_speed = 3
         self.audio_queue = queue.Queue()
 
+        # int8 quantized, thread tuned inference when running without cuda
+        if cpu_optimize is None:
+            cpu_optimize = str(developer_tools_dict.get('tts_cpu_optimize', False)).lower() == "true"
+        self.cpu_optimize_flag = cpu_optimize
+        self.cpu_threads = cpu_threads
+
+        # xtts speaker latents are computed once per voice reference wav
+        self.speaker_latent_cache_dir = os.path.join(self.speech_dir, "speaker_latent_cache")
+        self.speaker_latent_cache_instance = speaker_latent_cache(None, self.speaker_latent_cache_dir, None)
+
+        # sentences are sharded across worker processes, each with its own model copy
+        if tts_pool_workers is None:
+            try:
+                tts_pool_workers = int(developer_tools_dict.get('tts_pool_workers', 0))
+            except ValueError:
+                tts_pool_workers = 0
+        self.tts_pool_workers = max(0, tts_pool_workers)
+        self.tts_process_pool_instance = None
+
+        # the xtts model is built on a worker thread, callers only block when they need audio, with
+        # the pool on every sentence runs in the workers and this process loads no model of its own
+        self.device = None
+        self.tts = None
+        self.tts_load_time = None
+        self.tts_load_error = None
+        self.tts_ready_event = threading.Event()
+        self.tts_inference_lock = threading.Lock()
+        self.tts_load_lock = threading.Lock()
+        self.tts_load_start_time = None
+        self.tts_load_thread = None
+        if self.tts_pool_workers == 0:
+            self.start_tts_model_load()
+
+        # in memory playback, generated audio is only written to disk when archiving
+        self.sample_rate = 22050
+        self.audio_output_stream = None
+        # set by the chatbot so playback shares the session's persistent output stream
+        self.audio_device_manager_instance = None
+        self.archive_audio_flag = False
+        self.archive_response_id = None
+        # playback is written in short blocks so a barge-in cuts the sentence off mid word
+        self.playback_block_seconds = 0.1
+
+        # barge-in cancellation token, set by interrupt() from a hotkey or voice activity
+        self.tts_cancel_event = threading.Event()
+
+        # repeated short phrases are played from the phrase cache without running xtts
+        self.tts_phrase_cache_dir = os.path.join(self.speech_dir, "phrase_cache")
+        self.tts_phrase_cache_instance = tts_phrase_cache(self.tts_phrase_cache_dir, self.sample_rate)
+
+        # generation & playback workers, started on the first response
+        self.tts_lookahead_depth = 3
+        self.tts_scheduler_instance = None
+
+        # short sentences of a full response are grouped into fewer xtts calls
+        self.tts_batch_flag = False
+        self.tts_batch_max_chars = 200
+
+    # -------------------------------------------------------------------------------------------------
+    def start_tts_model_load(self):
+        """ a method for starting the model load thread, once
+            args: none
+            returns: none
+        """
+        with self.tts_load_lock:
+            if self.tts_load_thread is None:
+                self.tts_load_start_time = time.perf_counter()
+                self.tts_load_thread = threading.Thread(target=self.load_tts_model, daemon=True)
+                self.tts_load_thread.start()
+
+    # -------------------------------------------------------------------------------------------------
+    def load_tts_model(self):
+        """ a method for building the xtts model, run on the model load thread
+            args: none
+            returns: none
+        """
+        try:
+            if torch.cuda.is_available():
+                self.device = "cuda"
+            else:
+                self.device = "cpu"
+                print("CUDA-compatible GPU is not available. Using CPU instead. If you believe this should not be the case, reinstall torch-audio with the correct version.")
+
+            self.tts = tts_api.TTS(self.tts_model_name).to(self.device)
+            if self.device == "cpu" and self.cpu_optimize_flag is True:
+                tts_cpu_optimizer(self.colors, self.cpu_threads).optimize(self.tts.synthesizer.tts_model)
+            self.speaker_latent_cache_instance.xtts_model = self.tts.synthesizer.tts_model
+            self.speaker_latent_cache_instance.device = self.device
+            self.tts_load_time = time.perf_counter() - self.tts_load_start_time
+            print(self.colors['OKCYAN'] + f"<<< TTS MODEL READY >>> loaded in {self.tts_load_time:.2f}s on {self.device}" + self.colors['END'])
+        except Exception as e:
+            self.tts_load_error = e
+            print(self.colors['FAIL'] + f"Failed to load the TTS model. Reason: {e}" + self.colors['END'])
+        finally:
+            self.tts_ready_event.set()
+
+    # -------------------------------------------------------------------------------------------------
+    def wait_for_tts_model(self):
+        """ a method for blocking until the xtts model has finished loading
+            args: none
+            returns: tts
+        """
+        self.start_tts_model_load()
+        if not self.tts_ready_event.is_set():
+            print(self.colors['OKCYAN'] + "<<< WAITING FOR TTS MODEL >>>" + self.colors['END'])
+            self.tts_ready_event.wait()
+        if self.tts_load_error is not None:
+            raise RuntimeError(f"TTS model failed to load: {self.tts_load_error}")
+        return self.tts
+
+    # -------------------------------------------------------------------------------------------------
+    def get_tts_status(self):
+        """ a method for getting the xtts model readiness state
+            args: none
+            returns: tts_status dict
+        """
+        if self.tts_load_thread is None:
+            state = f"in {self.tts_pool_workers} pool workers"
+            load_time = None
+        elif not self.tts_ready_event.is_set():
+            state = "loading"
+            load_time = time.perf_counter() - self.tts_load_start_time
+        elif self.tts_load_error is not None:
+            state = "failed"
+            load_time = None
+        else:
+            state = "ready"
+            load_time = self.tts_load_time
+        return {"state": state, "device": self.device, "load_seconds": load_time, "error": self.tts_load_error}
+
+    # -------------------------------------------------------------------------------------------------
+    def print_tts_status(self):
+        """ a method for printing the xtts model readiness state
+            args: none
+            returns: none
+        """
+        tts_status = self.get_tts_status()
+        load_seconds = tts_status["load_seconds"]
+        load_str = f"{load_seconds:.2f}s" if load_seconds is not None else "n/a"
+        print(self.colors['OKCYAN'] + f"tts model: {tts_status['state']}, device: {tts_status['device']}, load time: {load_str}" + self.colors['END'])
+        if tts_status["error"] is not None:
+            print(self.colors['FAIL'] + f"tts error: {tts_status['error']}" + self.colors['END'])
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def clear_vram_cache(self):
+        """ a method for clearing the cuda cache of the model in this process, with the pool on or on
+        the cpu torch is never imported or initialized for it
+            args: none
+            returns: none
+        """
+        if self.tts_pool_workers > 0 or self.device != "cuda":
+            return
+        torch.cuda.empty_cache()
+
     # -------------------------------------------------------------------------------------------------
     def process_tts_responses(self, response, voice_name):
         """A method for managing the response preprocessing methods.
@@ -60,17 +223,148 @@ class tts_processor_class:
             returns: none
         """
         # Clear VRAM cache
-        torch.cuda.empty_cache()
+        self.clear_vram_cache()
         # Call Sentence Splitter
         tts_response_sentences = self.split_into_sentences(response)
-        
-        # Clear the directories
-        self.clear_directory(self.recognize_speech_dir)
-        self.clear_directory(self.generate_speech_dir)
+        if self.tts_batch_flag is True:
+            tts_response_sentences = self.group_sentences(tts_response_sentences, self.tts_batch_max_chars)
 
         self.generate_play_audio_loop(tts_response_sentences, voice_name)
         return
 
+    # -------------------------------------------------------------------------------------------------
+    def process_tts_stream(self, response_stream, voice_name):
+        """A method for speaking the model response while it is still being generated, each sentence
+        is queued for speech generation as soon as the sentence splitter finds its end.
+            args: response_stream, voice_name
+            returns: response
+        """
+        # Clear VRAM cache
+        self.clear_vram_cache()
+
+        # Each sentence goes to the generation worker as soon as its end is found
+        response_tokens = []
+        tts_response_sentences = self.split_stream_into_sentences(response_stream, response_tokens)
+        try:
+            self.generate_play_audio_loop(tts_response_sentences, voice_name)
+        finally:
+            # an interrupted response closes the stream, so the model stops generating it
+            tts_response_sentences.close()
+        return "".join(response_tokens)
+
+    # -------------------------------------------------------------------------------------------------
+    def interrupt(self):
+        """ a method for cutting off the speech mid response, the sentence playing stops, queued
+        sentences are dropped and the sentence generating is thrown away at its end
+            args: none
+            returns: none
+        """
+        self.tts_cancel_event.set()
+        if self.tts_scheduler_instance is not None:
+            self.tts_scheduler_instance.cancel()
+        try:
+            # stops play_audio_from_file
+            sd.stop()
+        except Exception as e:
+            print(f"Failed to stop audio playback. Reason: {e}")
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def is_speaking(self):
+        """ a method for checking if a response is still being spoken
+            args: none
+            returns: speaking bool
+        """
+        return self.tts_scheduler_instance is not None and not self.tts_scheduler_instance.response_done_event.is_set()
+
+    # -------------------------------------------------------------------------------------------------
+    def get_tts_scheduler(self):
+        """ a method for getting the running generation & playback scheduler
+            args: none
+            returns: tts_scheduler_instance
+        """
+        if self.tts_scheduler_instance is None:
+            # one generation worker per pool process keeps every process busy
+            num_generate_workers = 1
+            if self.tts_pool_workers > 0:
+                self.get_tts_process_pool()
+                num_generate_workers = self.tts_pool_workers
+            self.tts_scheduler_instance = tts_scheduler_class(self.generate_audio, self.play_audio_buffer, self.tts_lookahead_depth, num_generate_workers)
+            self.tts_scheduler_instance.start()
+        return self.tts_scheduler_instance
+
+    # -------------------------------------------------------------------------------------------------
+    def set_lookahead_depth(self, lookahead_depth):
+        """ a method for changing how many sentences of audio are generated ahead of playback
+            args: lookahead_depth
+            returns: none
+        """
+        self.tts_lookahead_depth = max(1, int(lookahead_depth))
+        # the audio queue is bounded on creation, restart the workers with the new depth
+        if self.tts_scheduler_instance is not None:
+            self.tts_scheduler_instance.stop()
+            self.tts_scheduler_instance = None
+        print(f"tts_lookahead_depth STATE: {self.tts_lookahead_depth}")
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def get_tts_process_pool(self):
+        """ a method for getting the speech generation worker processes, started on first use
+            args: none
+            returns: tts_process_pool_instance, or None when the pool is off
+        """
+        if self.tts_pool_workers > 0 and self.tts_process_pool_instance is None:
+            self.tts_process_pool_instance = tts_process_pool(self.colors, self.developer_tools_dict, self.tts_pool_workers, self.cpu_optimize_flag)
+        return self.tts_process_pool_instance
+
+    # -------------------------------------------------------------------------------------------------
+    def set_pool_workers(self, tts_pool_workers):
+        """ a method for changing the number of speech generation worker processes, 0 turns the pool off
+            args: tts_pool_workers
+            returns: none
+        """
+        self.tts_pool_workers = max(0, int(tts_pool_workers))
+        # the generation workers are sized to the pool, restart both
+        if self.tts_scheduler_instance is not None:
+            self.tts_scheduler_instance.stop()
+            self.tts_scheduler_instance = None
+        if self.tts_process_pool_instance is not None:
+            self.tts_process_pool_instance.close()
+            self.tts_process_pool_instance = None
+        # back in process, the local model is loaded on the first switch
+        if self.tts_pool_workers == 0:
+            self.start_tts_model_load()
+        print(f"tts_pool_workers STATE: {self.tts_pool_workers}")
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def tts_batch(self, flag):
+        """ a method for changing the tts batch flag, grouping the short sentences of a full response
+        into fewer speech generation calls
+            args: flag
+            returns: none
+        """
+        self.tts_batch_flag = flag
+        print(f"tts_batch_flag FLAG STATE: {self.tts_batch_flag}")
+        return
+
+    # -------------------------------------------------------------------------------------------------
+    def print_tts_scheduler_stats(self):
+        """ a method for printing the generation & playback queue counters and the speech cache counters
+            args: none
+            returns: none
+        """
+        stats = self.get_tts_scheduler().get_stats()
+        for key, value in self.tts_phrase_cache_instance.get_stats().items():
+            stats[f"phrase_cache_{key}"] = value
+        for key, value in self.speaker_latent_cache_instance.stats.items():
+            stats[f"speaker_latent_{key}"] = value
+        for key, value in stats.items():
+            if isinstance(value, float):
+                value = f"{value:.3f}"
+            print(self.colors['OKCYAN'] + f"{key}: " + self.colors['OKBLUE'] + f"{value}" + self.colors['END'])
+        return
+
     # -------------------------------------------------------------------------------------------------
     def play_audio_from_file(self, filename):
         """A method for audio playback from file."""
@@ -89,60 +383,199 @@ class tts_processor_class:
         except Exception as e:
             print(f"Failed to play audio from file {filename}. Reason: {e}")
 
+    # -------------------------------------------------------------------------------------------------
+    def play_audio_buffer(self, audio_data):
+        """A method for audio playback straight from the generated numpy buffer, sentences are written
+        back to back into one continuous output stream.
+            args: audio_data
+            returns: none
+        """
+        # generation failed for this sentence
+        if audio_data is None:
+            return
+        try:
+            audio_output_stream = self.get_audio_output_stream()
+            # write blocks until the buffer has been handed to the sound device
+            audio_data = audio_data.reshape(-1, 1)
+            block_size = max(1, int(self.sample_rate * self.playback_block_seconds))
+            for block_start in range(0, len(audio_data), block_size):
+                if self.tts_cancel_event.is_set():
+                    self.abort_audio_output_stream()
+                    return
+                audio_output_stream.write(audio_data[block_start:block_start + block_size])
+        except Exception as e:
+            print(f"Failed to play audio buffer. Reason: {e}")
+
+    # -------------------------------------------------------------------------------------------------
+    def get_audio_output_stream(self):
+        """ a method for getting the continuous audio output stream, the device manager's when the
+        chatbot shares one
+            args: none
+            returns: audio_output_stream
+        """
+        if self.audio_device_manager_instance is not None:
+            return self.audio_device_manager_instance.get_output_stream(self.sample_rate)
+        if self.audio_output_stream is None:
+            self.audio_output_stream = sd.OutputStream(samplerate=self.sample_rate, channels=1, dtype="float32")
+            self.audio_output_stream.start()
+        return self.audio_output_stream
+
+    # -------------------------------------------------------------------------------------------------
+    def abort_audio_output_stream(self):
+        """ a method for dropping the audio already handed to the device instead of draining it
+            args: none
+            returns: none
+        """
+        if self.audio_device_manager_instance is not None:
+            self.audio_device_manager_instance.abort_output()
+        elif self.audio_output_stream is not None:
+            self.audio_output_stream.abort()
+            self.audio_output_stream.close()
+            self.audio_output_stream = None
+
+    # -------------------------------------------------------------------------------------------------
+    def close_audio_output_stream(self):
+        """ a method for closing the continuous audio output stream
+            args: none
+            returns: none
+        """
+        if self.audio_output_stream is not None:
+            self.audio_output_stream.stop()
+            self.audio_output_stream.close()
+            self.audio_output_stream = None
+
     # -------------------------------------------------------------------------------------------------
     def generate_audio(self, sentence, voice_name_path, ticker):
         """ a method to generate the audio for the chatbot
             args: sentence, voice_name_path, ticker
-            returns: none
+            returns: tts_audio
         """
-        # Generate TTS audio (replace with your actual TTS logic)
-        print("starting speech generation:")
-        tts_audio = self.tts.tts(text=sentence, speaker_wav=voice_name_path, language="en", speed=3)
+        # The response was interrupted while this sentence waited its turn
+        if self.tts_cancel_event.is_set():
+            return None
+
+        tts_audio = self.get_sentence_audio(sentence, voice_name_path)
+
+        # Only touch the disk when the audio archive is turned on
+        if self.archive_audio_flag is True:
+            self.archive_audio(tts_audio, ticker)
+        return tts_audio
 
-        # Convert to NumPy array (adjust dtype as needed)
-        tts_audio = np.array(tts_audio, dtype=np.float32)
 
-        # Save the audio with a unique name
-        filename = os.path.join(self.generate_speech_dir, f"audio_{ticker}.wav")
-        sf.write(filename, tts_audio, 22050)
-    
     # -------------------------------------------------------------------------------------------------
-    def generate_play_audio_loop(self, tts_response_sentences, voice_name):
-        """ a method to generate and play the audio for the chatbot
-            args: tts_sentences
-            returns: none
+    def get_sentence_audio(self, sentence, voice_name_path):
+        """ a method to get the audio of one sentence, from the phrase cache or from xtts, safe to call
+        from many threads at once
+            args: sentence, voice_name_path
+            returns: tts_audio
         """
-        ticker = 0  # Initialize ticker
-        voice_name_path = os.path.join(self.tts_voice_ref_wav_pack_path, f"{voice_name}\\clone_speech.wav")
+        # Check the phrase cache before running the model
+        voice_id = self.speaker_latent_cache_instance.hash_reference_wav(voice_name_path)
+        phrase_key = self.tts_phrase_cache_instance.get_phrase_key(sentence, voice_id, self.tts_language, self.tts_speed, self.tts_model_name, self.cpu_optimize_flag)
+        tts_audio = self.tts_phrase_cache_instance.get(phrase_key)
+        if tts_audio is not None:
+            print("speech loaded from phrase cache:")
+        else:
+            print("starting speech generation:")
+            tts_audio = self.synthesize_sentence(sentence, voice_name_path)
+            self.tts_phrase_cache_instance.put(phrase_key, np.array(tts_audio, dtype=np.float32))
 
-        # Generate the audio for the first sentence
-        audio_thread = threading.Thread(target=self.generate_audio, args=(tts_response_sentences[0], voice_name_path, ticker))
-        audio_thread.start()
+        # Convert to NumPy array (adjust dtype as needed)
+        return np.array(tts_audio, dtype=np.float32)
 
-        for sentence in tts_response_sentences[1:]:
-            # Wait for the audio file to be generated
-            audio_thread.join()
+    # -------------------------------------------------------------------------------------------------
+    def synthesize_sentence(self, sentence, voice_name_path):
+        """ a method to run xtts on one sentence from the cached speaker latents, on a pool worker
+        process when the pool is on
+            args: sentence, voice_name_path
+            returns: tts_audio
+        """
+        tts_process_pool_instance = self.get_tts_process_pool()
+        if tts_process_pool_instance is not None:
+            return tts_process_pool_instance.synthesize(sentence, voice_name_path)
+        self.wait_for_tts_model()
+        gpt_cond_latent, speaker_embedding = self.speaker_latent_cache_instance.get_speaker_latents(voice_name_path)
+        # one model in this process, callers sharing it take turns
+        with self.tts_inference_lock, torch.inference_mode():
+            tts_audio = self.tts.synthesizer.tts_model.inference(sentence, self.tts_language, gpt_cond_latent, speaker_embedding, speed=self.tts_speed)["wav"]
+        return tts_audio
 
-            # Construct the filename
-            filename = os.path.join(self.generate_speech_dir, f"audio_{ticker}.wav")
+    # -------------------------------------------------------------------------------------------------
+    def archive_audio(self, tts_audio, ticker):
+        """ a method for saving the generated audio to the generate speech library
+            args: tts_audio, ticker
+            returns: none
+        """
+        try:
+            filename = os.path.join(self.generate_speech_dir, f"audio_{self.archive_response_id}_{ticker}.wav")
+            sf.write(filename, tts_audio, self.sample_rate)
+        except Exception as e:
+            print(f"Failed to archive audio {ticker}. Reason: {e}")
 
-            # Play the audio from file in a separate thread
-            play_thread = threading.Thread(target=self.play_audio_from_file, args=(filename,))
-            play_thread.start()
+    # -------------------------------------------------------------------------------------------------
+    def audio_archive(self, flag):
+        """ a method for changing the audio archive flag
+            args: flag
+            returns: none
+        """
+        self.archive_audio_flag = flag
+        print(f"archive_audio_flag FLAG STATE: {self.archive_audio_flag}")
+        return
+    
+    # -------------------------------------------------------------------------------------------------
+    def get_voice_name_path(self, voice_name):
+        """ a method for getting the reference wav path for the voice name
+            args: voice_name
+            returns: voice_name_path
+        """
+        return os.path.join(self.tts_voice_ref_wav_pack_path, voice_name, "clone_speech.wav")
 
-            ticker += 1  # Increment ticker
+    # -------------------------------------------------------------------------------------------------
+    def load_voice(self, voice_name):
+        """ a method for loading the speaker latents for the voice ahead of the first sentence
+            args: voice_name
+            returns: none
+        """
+        # the pool workers compute the latents of their own model copies
+        if self.tts_pool_workers > 0:
+            return
+        try:
+            self.wait_for_tts_model()
+            self.speaker_latent_cache_instance.get_speaker_latents(self.get_voice_name_path(voice_name))
+        except Exception as e:
+            print(f"Failed to load voice {voice_name}. Reason: {e}")
+        return
 
-            # Start generating the audio for the next sentence
-            audio_thread = threading.Thread(target=self.generate_audio, args=(sentence, voice_name_path, ticker))
-            audio_thread.start()
+    # -------------------------------------------------------------------------------------------------
+    def begin_response(self, voice_name):
+        """ a method for starting the speech of a new response, the sentences are then queued on the
+        scheduler with put_sentence and closed with end_response, without waiting for the playback
+            args: voice_name
+            returns: tts_scheduler, voice_name_path
+        """
+        self.archive_response_id = time.strftime("%Y%m%d_%H%M%S")
+        self.tts_cancel_event.clear()
+        return self.get_tts_scheduler(), self.get_voice_name_path(voice_name)
 
-            # Wait for the audio to finish playing before moving on to the next sentence
-            play_thread.join()
+    # -------------------------------------------------------------------------------------------------
+    def generate_play_audio_loop(self, tts_response_sentences, voice_name):
+        """ a method to generate and play the audio for the chatbot
+            args: tts_sentences
+            returns: none
+        """
+        tts_scheduler, voice_name_path = self.begin_response(voice_name)
 
-        # Handle the last sentence
-        audio_thread.join()
-        filename = os.path.join(self.generate_speech_dir, f"audio_{ticker}.wav")
-        self.play_audio_from_file(filename)
+        # Sentences may be a list or a live generator from the response stream, the generation
+        # worker runs up to tts_lookahead_depth sentences ahead of the playback worker
+        try:
+            for sentence in tts_response_sentences:
+                # barge-in, stop reading sentences from the response
+                if self.tts_cancel_event.is_set():
+                    break
+                tts_scheduler.put_sentence(sentence, voice_name_path)
+        finally:
+            tts_scheduler.end_response()
+            tts_scheduler.wait_for_response()
 
     # -------------------------------------------------------------------------------------------------
     def clear_directory(self, directory):
@@ -168,33 +601,54 @@ class tts_processor_class:
         Returns:
             list[str]: List of sentences.
         """
-        # Add spaces around punctuation marks for consistent splitting
-        text = " " + text + " "
-        text = text.replace("\n", " ")
-
-        # Handle common abbreviations and special cases
-        text = re.sub(r"(Mr|Mrs|Ms|Dr|i\.e)\.", r"\1<prd>", text)
-        text = re.sub(r"\.\.\.", r"<prd><prd><prd>", text)
+        return sentence_segmenter().split(text)
 
-        # Split on period, question mark, exclamation mark, or colon followed by optional spaces
-        sentences = re.split(r"(?<=\d\.)\s+|(?<=[.!?:])\s+", text)
+    # -------------------------------------------------------------------------------------------------
+    def group_sentences(self, sentences, max_chars=200):
+        """A method for grouping neighbouring sentences into chunks of up to max_chars, so a long
+        response of short sentences runs fewer xtts calls, xtts warns past 250 characters for english.
+        Args:
+            sentences (list[str]): The split sentences, in order.
+            max_chars (int): The longest chunk to build, a longer sentence is kept on its own.
+        Returns:
+            list[str]: List of sentence groups, in order.
+        """
+        sentence_groups = []
+        current_group = ""
+        for sentence in sentences:
+            if current_group and len(current_group) + 1 + len(sentence) > max_chars:
+                sentence_groups.append(current_group)
+                current_group = sentence
+            else:
+                current_group = f"{current_group} {sentence}" if current_group else sentence
+        if current_group:
+            sentence_groups.append(current_group)
+        return sentence_groups
 
-        # Remove empty sentences
-        sentences = [s.strip() for s in sentences if s.strip()]
+    # -------------------------------------------------------------------------------------------------
+    def split_stream_into_sentences(self, response_stream, response_tokens):
+        """A method for splitting the streamed LLAMA response into sentences as the tokens arrive.
+        Args:
+            response_stream: iterable of response tokens
+            response_tokens (list[str]): collects every token received
+        Returns:
+            generator of sentences, each yielded as soon as the segmenter is certain of its end
+        """
+        sentence_segmenter_instance = sentence_segmenter()
+        try:
+            for token in response_stream:
+                response_tokens.append(token)
+                for sentence in sentence_segmenter_instance.feed(token):
+                    yield sentence
+        finally:
+            # closing the sentences closes the token stream underneath
+            if hasattr(response_stream, "close"):
+                response_stream.close()
 
-        # Combine the number with its corresponding sentence
-        combined_sentences = []
-        i = 0
-        while i < len(sentences):
-            if re.match(r"^\d+\.", sentences[i]):
-                combined_sentences.append(f"{sentences[i]} {sentences[i + 1]}")
-                i += 2
-            else:
-                combined_sentences.append(sentences[i])
-                i += 1
+        # Flush the remaining partial sentence
+        for sentence in sentence_segmenter_instance.flush():
+            yield sentence
 
-        return combined_sentences
-    
     # -------------------------------------------------------------------------------------------------
     def file_name_voice_filter(self, input):
         """ a method for preprocessing the voice recognition with a filter before forwarding the agent file names.
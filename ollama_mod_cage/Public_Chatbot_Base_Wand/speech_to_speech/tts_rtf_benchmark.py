@@ -0,0 +1,80 @@
+""" tts_rtf_benchmark.py
+
+        A real time factor benchmark for the tts_processor_class, the default full precision model
+    and the cpu optimized model each speak the same sentences in every voice of the
+    Public_Voice_Reference_Pack. The real time factor is synthesis time divided by the length of the
+    generated audio, below 1.0 speech is generated faster than it plays. The cpu optimizations only
+    apply without cuda, so run it on the cpu only host being tuned, from the
+    ollama_mod_cage directory after /developer new has written developer_tools.json:
+
+        python -m Public_Chatbot_Base_Wand.speech_to_speech.tts_rtf_benchmark
+"""
+
+import os
+import gc
+import time
+
+from Public_Chatbot_Base_Wand.ollama_add_on_library import ollama_commands
+from Public_Chatbot_Base_Wand.read_write_symbol_collector import read_write_symbol_collector
+from Public_Chatbot_Base_Wand.speech_to_speech.tts_processor_class import tts_processor_class
+
+BENCHMARK_SENTENCES = [
+    "Hello there, how can I help you today?",
+    "Watch out, that is a zombie, hurry up and kill it or run away.",
+    "The quick brown fox jumps over the lazy dog while the sun sets behind the hills.",
+    "Model changed to llama3.",
+]
+
+# -------------------------------------------------------------------------------------------------
+def benchmark_tts_processor(tts_processor_instance, voice_names, sentences, warmup=1):
+    """ a method for measuring the real time factor of every voice
+        args: tts_processor_instance, voice_names, sentences, warmup
+        returns: rtf_dict of voice_name -> real time factor
+    """
+    tts_processor_instance.wait_for_tts_model()
+    output_sample_rate = tts_processor_instance.tts.synthesizer.output_sample_rate
+    rtf_dict = {}
+    for voice_name in voice_names:
+        voice_name_path = tts_processor_instance.get_voice_name_path(voice_name)
+        # the first sentences also pay for the speaker latents & kernel warm up
+        for sentence in sentences[:warmup]:
+            tts_processor_instance.synthesize_sentence(sentence, voice_name_path)
+
+        synthesis_seconds = 0.0
+        audio_seconds = 0.0
+        for sentence in sentences:
+            start_time = time.perf_counter()
+            tts_audio = tts_processor_instance.synthesize_sentence(sentence, voice_name_path)
+            synthesis_seconds += time.perf_counter() - start_time
+            audio_seconds += len(tts_audio) / output_sample_rate
+        rtf_dict[voice_name] = synthesis_seconds / audio_seconds if audio_seconds else float("inf")
+    return rtf_dict
+
+# -------------------------------------------------------------------------------------------------
+def run_rtf_benchmark(sentences=BENCHMARK_SENTENCES):
+    """ a method for comparing the default and cpu optimized real time factor on the voice pack
+        args: sentences
+        returns: results dict of mode -> rtf_dict
+    """
+    developer_tools_dict = read_write_symbol_collector().read_developer_tools_json()
+    colors = ollama_commands(None, developer_tools_dict).colors
+    voice_pack_dir = developer_tools_dict['tts_voice_ref_wav_pack_path_dir']
+    voice_names = sorted(voice_name for voice_name in os.listdir(voice_pack_dir)
+                         if os.path.isfile(os.path.join(voice_pack_dir, voice_name, "clone_speech.wav")))
+
+    results = {}
+    for mode, cpu_optimize in (("default", False), ("cpu_optimized", True)):
+        tts_processor_instance = tts_processor_class(colors, developer_tools_dict, cpu_optimize=cpu_optimize)
+        results[mode] = benchmark_tts_processor(tts_processor_instance, voice_names, sentences)
+        del tts_processor_instance
+        gc.collect()
+
+    print(f"{'voice':<20}{'default rtf':>15}{'cpu optimized rtf':>20}{'speedup':>10}")
+    for voice_name in voice_names:
+        default_rtf = results["default"][voice_name]
+        optimized_rtf = results["cpu_optimized"][voice_name]
+        print(f"{voice_name:<20}{default_rtf:>15.3f}{optimized_rtf:>20.3f}{default_rtf / optimized_rtf:>9.2f}x")
+    return results
+
+if __name__ == "__main__":
+    run_rtf_benchmark()
@@ -0,0 +1,281 @@
+""" tts_scheduler_class.py
+
+        A class for scheduling the speech generation and playback for the tts_processor_class,
+    persistent generation workers and a persistent playback worker are joined by a bounded
+    lookahead, so up to N sentences of audio are generated ahead of the sentence playing.
+    With more than one generation worker sentences are generated in parallel and put back in
+    order before playback. Queue depth & underrun counters are kept for tuning the lookahead on
+    CPU only hosts. A barge-in cancels every queued, generating and buffered sentence at once.
+"""
+
+import queue
+import threading
+import time
+
+# -------------------------------------------------------------------------------------------------
+class tts_scheduler_class:
+    """ a class for running the text to speech generation & playback workers for the tts_processor_class
+    """
+    # stops the generation workers
+    STOP = object()
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, generate_audio, play_audio, lookahead_depth=3, num_generate_workers=1):
+        """a method for initializing the class
+            args: generate_audio(sentence, voice_name_path, ticker) -> audio, play_audio(audio),
+                lookahead_depth, num_generate_workers
+        """
+        self.generate_audio = generate_audio
+        self.play_audio = play_audio
+        self.num_generate_workers = max(1, int(num_generate_workers))
+        # every generation worker needs a free slot to make progress
+        self.lookahead_depth = max(self.num_generate_workers, int(lookahead_depth))
+
+        self.sentence_queue = queue.Queue()
+        # one slot per sentence generating or waiting to play
+        self.lookahead_slots = threading.Semaphore(self.lookahead_depth)
+
+        # ticker -> generated audio, played strictly in ticker order
+        self.audio_buffers = {}
+        self.audio_condition = threading.Condition()
+        self.next_ticker = 0
+        self.play_ticker = 0
+        self.response_end_ticker = None
+        self.response_done_event = threading.Event()
+        self.response_done_event.set()
+        self.stop_flag = False
+        # sentences below the cancel ticker are dropped instead of generated or played
+        self.cancel_ticker = 0
+
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+        self.generate_threads = []
+        self.play_thread = None
+
+    # -------------------------------------------------------------------------------------------------
+    def start(self):
+        """ a method for starting the persistent generation & playback workers
+            args: none
+            returns: none
+        """
+        if self.play_thread is not None:
+            return
+        self.stop_flag = False
+        self.generate_threads = [threading.Thread(target=self.generate_worker, daemon=True) for _ in range(self.num_generate_workers)]
+        self.play_thread = threading.Thread(target=self.play_worker, daemon=True)
+        for generate_thread in self.generate_threads:
+            generate_thread.start()
+        self.play_thread.start()
+
+    # -------------------------------------------------------------------------------------------------
+    def stop(self):
+        """ a method for stopping the workers once the queued sentences are done
+            args: none
+            returns: none
+        """
+        if self.play_thread is None:
+            return
+        self.wait_for_response()
+        for _ in self.generate_threads:
+            self.sentence_queue.put(self.STOP)
+        for generate_thread in self.generate_threads:
+            generate_thread.join()
+        with self.audio_condition:
+            self.stop_flag = True
+            self.audio_condition.notify_all()
+        self.play_thread.join()
+        self.generate_threads = []
+        self.play_thread = None
+
+    # -------------------------------------------------------------------------------------------------
+    def put_sentence(self, sentence, voice_name_path):
+        """ a method for queueing a sentence for speech generation
+            args: sentence, voice_name_path
+            returns: none
+        """
+        with self.audio_condition:
+            ticker = self.next_ticker
+            self.next_ticker += 1
+            self.response_end_ticker = None
+            self.response_done_event.clear()
+        self.sentence_queue.put((ticker, sentence, voice_name_path))
+
+    # -------------------------------------------------------------------------------------------------
+    def end_response(self):
+        """ a method for marking the end of the current response
+            args: none
+            returns: none
+        """
+        with self.audio_condition:
+            self.response_end_ticker = self.next_ticker
+            if self.play_ticker >= self.response_end_ticker:
+                self.response_done_event.set()
+            self.audio_condition.notify_all()
+
+    # -------------------------------------------------------------------------------------------------
+    def cancel(self):
+        """ a method for dropping every sentence queued so far, queued sentences are skipped, the
+        sentence generating is thrown away once it finishes and the buffered audio is never played
+            args: none
+            returns: none
+        """
+        with self.audio_condition:
+            self.cancel_ticker = self.next_ticker
+            dropped_tickers = [ticker for ticker in self.audio_buffers if ticker < self.cancel_ticker]
+            for ticker in dropped_tickers:
+                del self.audio_buffers[ticker]
+                self.lookahead_slots.release()
+            self.play_ticker = max(self.play_ticker, self.cancel_ticker)
+            if self.response_end_ticker is not None and self.play_ticker >= self.response_end_ticker:
+                self.response_done_event.set()
+            self.audio_condition.notify_all()
+        with self.stats_lock:
+            self.stats["cancels"] += 1
+            self.stats["sentences_dropped"] += len(dropped_tickers)
+
+    # -------------------------------------------------------------------------------------------------
+    def is_cancelled(self, ticker):
+        """ a method for checking if a sentence was dropped by a cancel
+            args: ticker
+            returns: cancelled bool
+        """
+        with self.audio_condition:
+            return ticker < self.cancel_ticker
+
+    # -------------------------------------------------------------------------------------------------
+    def wait_for_response(self):
+        """ a method for blocking until every sentence of the response has been played
+            args: none
+            returns: none
+        """
+        self.response_done_event.wait()
+
+    # -------------------------------------------------------------------------------------------------
+    def generate_worker(self):
+        """ a method for a generation worker, a worker blocks once lookahead_depth sentences are
+        generating or waiting to play
+            args: none
+            returns: none
+        """
+        while True:
+            # take the slot before the sentence, so every dequeued sentence already owns a slot and
+            # the next sentence to play can never be starved by the ones after it
+            self.lookahead_slots.acquire()
+            item = self.sentence_queue.get()
+            if item is self.STOP:
+                self.lookahead_slots.release()
+                return
+
+            ticker, sentence, voice_name_path = item
+            if self.is_cancelled(ticker):
+                self.lookahead_slots.release()
+                with self.stats_lock:
+                    self.stats["sentences_dropped"] += 1
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                audio_data = self.generate_audio(sentence, voice_name_path, ticker)
+            except Exception as e:
+                print(f"Failed to generate audio for sentence {ticker}. Reason: {e}")
+                audio_data = None
+            generate_time = time.perf_counter() - start_time
+
+            with self.audio_condition:
+                cancelled = ticker < self.cancel_ticker
+                if cancelled:
+                    self.lookahead_slots.release()
+                else:
+                    # a failed sentence is stored as None so playback moves past it
+                    self.audio_buffers[ticker] = audio_data
+                queue_depth = sum(1 for buffered in self.audio_buffers if buffered >= self.play_ticker)
+                self.audio_condition.notify_all()
+            if cancelled:
+                with self.stats_lock:
+                    self.stats["sentences_dropped"] += 1
+            elif audio_data is not None:
+                with self.stats_lock:
+                    self.stats["sentences_generated"] += 1
+                    self.stats["generate_seconds"] += generate_time
+                    self.stats["queue_depth_total"] += queue_depth
+                    self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], queue_depth)
+
+    # -------------------------------------------------------------------------------------------------
+    def play_worker(self):
+        """ a method for the playback worker, an underrun is counted whenever the previous sentence
+        has finished playing and the next one is not generated yet
+            args: none
+            returns: none
+        """
+        mid_response = False
+        while True:
+            with self.audio_condition:
+                wait_start = None
+                while self.play_ticker not in self.audio_buffers:
+                    if self.response_end_ticker is not None and self.play_ticker >= self.response_end_ticker:
+                        mid_response = False
+                        self.response_done_event.set()
+                    if self.stop_flag:
+                        return
+                    if wait_start is None:
+                        wait_start = time.perf_counter()
+                    self.audio_condition.wait()
+                audio_data = self.audio_buffers.pop(self.play_ticker)
+                self.play_ticker += 1
+
+            if wait_start is not None and mid_response:
+                with self.stats_lock:
+                    self.stats["underruns"] += 1
+                    self.stats["underrun_seconds"] += time.perf_counter() - wait_start
+
+            if audio_data is not None:
+                start_time = time.perf_counter()
+                self.play_audio(audio_data)
+                with self.stats_lock:
+                    self.stats["sentences_played"] += 1
+                    self.stats["play_seconds"] += time.perf_counter() - start_time
+                mid_response = True
+            self.lookahead_slots.release()
+
+            with self.audio_condition:
+                if self.response_end_ticker is not None and self.play_ticker >= self.response_end_ticker:
+                    mid_response = False
+                    self.response_done_event.set()
+
+    # -------------------------------------------------------------------------------------------------
+    def reset_stats(self):
+        """ a method for resetting the scheduler counters
+            args: none
+            returns: none
+        """
+        with self.stats_lock:
+            self.stats = {
+                "sentences_generated": 0,
+                "sentences_played": 0,
+                "generate_seconds": 0.0,
+                "play_seconds": 0.0,
+                "queue_depth_total": 0,
+                "max_queue_depth": 0,
+                "underruns": 0,
+                "underrun_seconds": 0.0,
+                "cancels": 0,
+                "sentences_dropped": 0,
+            }
+
+    # -------------------------------------------------------------------------------------------------
+    def get_stats(self):
+        """ a method for getting a snapshot of the scheduler counters
+            args: none
+            returns: stats dict
+        """
+        with self.stats_lock:
+            stats = dict(self.stats)
+        with self.audio_condition:
+            stats["queue_depth"] = len(self.audio_buffers)
+        stats["lookahead_depth"] = self.lookahead_depth
+        stats["generate_workers"] = self.num_generate_workers
+        generated = stats["sentences_generated"]
+        stats["average_queue_depth"] = stats["queue_depth_total"] / generated if generated else 0.0
+        stats["average_generate_seconds"] = stats["generate_seconds"] / generated if generated else 0.0
+        return stats
@@ -0,0 +1,94 @@
+""" vosk_stt_backend.py
+
+        A class for the offline vosk speech recognition backend of the stt_backend_manager, the
+    kaldi recognizer decodes the frames as they arrive so the partial result follows the user and
+    the final result only waits on the last few frames. Download a model from
+    https://alphacephei.com/vosk/models and set stt_vosk_model_dir in developer_custom.json.
+"""
+
+import json
+import threading
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+vosk = lazy_module("vosk")
+
+# -------------------------------------------------------------------------------------------------
+class vosk_stt_backend:
+    """ a class for recognizing speech locally with vosk
+    """
+    supports_streaming = True
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, developer_tools_dict):
+        """a method for initializing the class
+            args: colors, developer_tools_dict
+        """
+        self.colors = colors
+        self.model_dir = developer_tools_dict.get('stt_vosk_model_dir')
+        self.model = None
+        self.load_lock = threading.Lock()
+
+        self.recognizer = None
+        self.stream_text_parts = []
+
+    # -------------------------------------------------------------------------------------------------
+    def load(self):
+        """ a method for loading the vosk model
+            args: none
+            returns: none
+        """
+        with self.load_lock:
+            if self.model is None:
+                if not self.model_dir:
+                    raise RuntimeError("stt_vosk_model_dir is not set in developer_custom.json")
+                vosk.SetLogLevel(-1)
+                self.model = vosk.Model(self.model_dir)
+                print(self.colors['OKCYAN'] + "<<< VOSK READY >>>" + self.colors['END'])
+
+    # -------------------------------------------------------------------------------------------------
+    def transcribe(self, pcm_bytes, sample_rate):
+        """ a method for recognizing a finished utterance
+            args: pcm_bytes, 16 bit mono, sample_rate
+            returns: text
+        """
+        self.load()
+        recognizer = vosk.KaldiRecognizer(self.model, sample_rate)
+        recognizer.AcceptWaveform(pcm_bytes)
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+    # -------------------------------------------------------------------------------------------------
+    def start_stream(self, sample_rate):
+        """ a method for starting the incremental recognition of a new utterance
+            args: sample_rate
+            returns: none
+        """
+        self.load()
+        self.recognizer = vosk.KaldiRecognizer(self.model, sample_rate)
+        self.stream_text_parts = []
+
+    # -------------------------------------------------------------------------------------------------
+    def accept_audio(self, pcm_bytes):
+        """ a method for adding the next frames of the utterance
+            args: pcm_bytes
+            returns: partial text
+        """
+        if self.recognizer.AcceptWaveform(pcm_bytes):
+            # vosk found a pause, the text so far is final
+            self.stream_text_parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(part for part in self.stream_text_parts + [partial] if part)
+
+    # -------------------------------------------------------------------------------------------------
+    def finish_stream(self):
+        """ a method for the final recognition of the utterance
+            args: none
+            returns: text
+        """
+        final = json.loads(self.recognizer.FinalResult()).get("text", "")
+        text = " ".join(part for part in self.stream_text_parts + [final] if part)
+        self.recognizer = None
+        self.stream_text_parts = []
+        return text
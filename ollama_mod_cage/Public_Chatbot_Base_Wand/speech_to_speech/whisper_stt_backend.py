@@ -0,0 +1,94 @@
+""" whisper_stt_backend.py
+
+        A class for the offline faster-whisper speech recognition backend of the stt_backend_manager,
+    the model runs int8 on the cpu. Whisper decodes whole windows, so while the user is talking
+    the audio so far is decoded again every partial_interval_seconds for the partial result, and
+    the final pass decodes the whole utterance once it ends. Set the model size with
+    stt_whisper_model in developer_custom.json, the .en models are faster for english.
+"""
+
+import os
+import threading
+
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
+
+np = lazy_module("numpy")
+faster_whisper = lazy_module("faster_whisper")
+
+# -------------------------------------------------------------------------------------------------
+class whisper_stt_backend:
+    """ a class for recognizing speech locally with faster-whisper
+    """
+    supports_streaming = True
+
+    # -------------------------------------------------------------------------------------------------
+    def __init__(self, colors, developer_tools_dict, partial_interval_seconds=1.0):
+        """a method for initializing the class
+            args: colors, developer_tools_dict, partial_interval_seconds
+        """
+        self.colors = colors
+        self.model_name = developer_tools_dict.get('stt_whisper_model', "base.en")
+        self.partial_interval_seconds = partial_interval_seconds
+        self.model = None
+        self.load_lock = threading.Lock()
+
+        self.stream_chunks = []
+        self.stream_sample_rate = 16000
+        self.samples_since_partial = 0
+
+    # -------------------------------------------------------------------------------------------------
+    def load(self):
+        """ a method for loading the whisper model, the first call downloads it
+            args: none
+            returns: none
+        """
+        with self.load_lock:
+            if self.model is None:
+                cpu_threads = max(1, (os.cpu_count() or 2) // 2)
+                self.model = faster_whisper.WhisperModel(self.model_name, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+                print(self.colors['OKCYAN'] + f"<<< WHISPER {self.model_name} READY >>>" + self.colors['END'])
+
+    # -------------------------------------------------------------------------------------------------
+    def transcribe(self, pcm_bytes, sample_rate):
+        """ a method for recognizing a finished utterance, whisper expects 16 kHz audio
+            args: pcm_bytes, 16 bit mono, sample_rate
+            returns: text
+        """
+        self.load()
+        audio = np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+        language = "en" if self.model_name.endswith(".en") else None
+        segments, _ = self.model.transcribe(audio, language=language, beam_size=1, condition_on_previous_text=False)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+    # -------------------------------------------------------------------------------------------------
+    def start_stream(self, sample_rate):
+        """ a method for starting the incremental recognition of a new utterance
+            args: sample_rate
+            returns: none
+        """
+        self.stream_chunks = []
+        self.stream_sample_rate = sample_rate
+        self.samples_since_partial = 0
+
+    # -------------------------------------------------------------------------------------------------
+    def accept_audio(self, pcm_bytes):
+        """ a method for adding the next frames of the utterance
+            args: pcm_bytes
+            returns: partial text, or None when no new partial was decoded
+        """
+        self.stream_chunks.append(pcm_bytes)
+        self.samples_since_partial += len(pcm_bytes) // 2
+        if self.samples_since_partial < self.partial_interval_seconds * self.stream_sample_rate:
+            return None
+        self.samples_since_partial = 0
+        return self.transcribe(b"".join(self.stream_chunks), self.stream_sample_rate)
+
+    # -------------------------------------------------------------------------------------------------
+    def finish_stream(self):
+        """ a method for the final recognition of the utterance
+            args: none
+            returns: text
+        """
+        text = self.transcribe(b"".join(self.stream_chunks), self.stream_sample_rate)
+        self.stream_chunks = []
+        return text
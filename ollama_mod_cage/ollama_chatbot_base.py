@@ -30,22 +30,32 @@
 import os
 import re
 import time
-import ollama
-import base64
-import keyboard
-import pyaudio
-import speech_recognition as sr
+import asyncio
+import threading
 
+from Public_Chatbot_Base_Wand.lazy_import import lazy_module
 from Public_Chatbot_Base_Wand.ollama_add_on_library import ollama_commands
+from Public_Chatbot_Base_Wand.ollama_add_on_library import ollama_client_manager
 from Public_Chatbot_Base_Wand.speech_to_speech import tts_processor_class
+from Public_Chatbot_Base_Wand.speech_to_speech import audio_device_manager
+from Public_Chatbot_Base_Wand.speech_to_speech import audio_capture_class
+from Public_Chatbot_Base_Wand.speech_to_speech import stt_backend_manager
 from Public_Chatbot_Base_Wand.directory_manager import directory_manager_class
-from Public_Chatbot_Base_Wand.latex_render import latex_render_class
 from Public_Chatbot_Base_Wand.data_set_manipulator import data_set_constructor
 from Public_Chatbot_Base_Wand.write_modelfile import model_write_class
 from Public_Chatbot_Base_Wand.chat_history import json_chat_history
+from Public_Chatbot_Base_Wand.chat_history import conversation_memory
+from Public_Chatbot_Base_Wand.chat_history import jsonl_conversation_store
+from Public_Chatbot_Base_Wand.chat_history import conversation_search_index
 from Public_Chatbot_Base_Wand.read_write_symbol_collector import read_write_symbol_collector
 from Public_Chatbot_Base_Wand.data_set_manipulator import screen_shot_collector
+from Public_Chatbot_Base_Wand.data_set_manipulator import llava_response_cache
+from Public_Chatbot_Base_Wand.data_set_manipulator import llava_vision_sampler
 from Public_Chatbot_Base_Wand.create_convert_model import create_convert_manager
+from Public_Chatbot_Base_Wand.session_engine import chatbot_session_engine
+
+# heavy dependencies are imported on first use
+sr = lazy_module("speech_recognition")
 
 # TODO setup sebdg emotional classifyer keras 
 # from tensorflow.keras.models import load_model
@@ -71,7 +81,6 @@ class ollama_chatbot_base:
 
         # initialize chat
         self.chat_history = []
-        self.llava_history = []
 
         # Default Agent Voice Reference
         self.voice_name = "C3PO"
@@ -80,12 +89,6 @@ class ollama_chatbot_base:
         self.save_name = "default"
         self.load_name = "default"
 
-        # TODO Connect api
-        self.url = "http://localhost:11434/api/chat" #TODO REMOVE
-
-        # Setup chat_history
-        self.headers = {'Content-Type': 'application/json'}
-
         # get base path
         self.current_dir = os.getcwd()
         self.parent_dir = os.path.abspath(os.path.join(self.current_dir, os.pardir))
@@ -100,6 +103,9 @@ class ollama_chatbot_base:
         if hasattr(self, 'developer_tools'):
             self.developer_tools_dict = self.read_write_symbol_collector_instance.read_developer_tools_json()
 
+        # one keep-alive client per ollama server, shared by every chatbot in the process, set ollama_url in developer_custom.json
+        self.ollama_client_manager_instance = ollama_client_manager.get_shared(self.developer_tools_dict)
+
         # setup base paths from developer tools path library
         self.ignored_agents = self.developer_tools_dict['ignored_agents_dir']
         self.llava_library = self.developer_tools_dict['llava_library_dir']
@@ -111,6 +117,14 @@ class ollama_chatbot_base:
 
         # TEXT SECTION:
         self.latex_flag = False
+        # multi turn memory, trimmed to the model's context budget, set memory_context_tokens in developer_custom.json to override num_ctx
+        self.memory_flag = True
+        self.conversation_memory_instance = conversation_memory(self.ollama_client_manager_instance, self.developer_tools_dict.get('memory_context_tokens'))
+        # every turn is appended to the conversation log, /save as starts a new log under its name & /load as reads its last turns
+        self.autosave_flag = str(self.developer_tools_dict.get('conversation_autosave', True)).lower() == "true"
+        self.conversation_name = "autosave"
+        self.conversation_load_turns = int(self.developer_tools_dict.get('conversation_load_turns') or 50)
+        self.turn_start_index = None
         self.cmd_run_flag = None
 
         # SPEECH SECTION:
@@ -118,6 +132,19 @@ class ollama_chatbot_base:
         self.listen_flag = False # TODO TURN ON FOR MINECRAFT
         self.chunk_flag = False
         self.auto_speech_flag = False #TODO KEEP OFF BY DEFAULT FOR MINECRAFT, TURN ON TO START
+        self.stream_flag = False
+        self.tts_lookahead_depth = 3
+        self.tts_pool_workers = 0
+        # barge-in cancellation token for the streamed response, set by interrupt()
+        self.interrupt_event = threading.Event()
+        # voice activity endpointing listens hands free, barge-in interrupts the agent when the user talks over it
+        self.vad_flag = False
+        self.vad_barge_in_flag = False
+        self.audio_capture_instance = None
+        # google, whisper or vosk, set stt_backend in developer_custom.json
+        self.stt_backend_manager_instance = None
+        # start building the tts model in the background at startup, set tts_preload in developer_custom.json
+        self.tts_preload_flag = str(self.developer_tools_dict.get('tts_preload', False)).lower() == "true"
 
         # VISION SECTION:
         self.llava_flag = False # TODO TURN ON FOR MINECRAFT
@@ -125,11 +152,24 @@ class ollama_chatbot_base:
         self.screen_shot_flag = False
 
         # ollama chatbot base setup wand class instantiation
-        self.ollama_command_instance = ollama_commands(self.user_input_model_select, self.developer_tools_dict)
+        self.ollama_command_instance = ollama_commands(self.user_input_model_select, self.developer_tools_dict, self.ollama_client_manager_instance)
         self.colors = self.ollama_command_instance.colors
+        # one input & output stream for the whole session, opened on first use
+        self.audio_device_manager_instance = audio_device_manager(self.colors)
         # get data
         self.screen_shot_collector_instance = screen_shot_collector(self.developer_tools_dict)
+        # near identical screenshots reuse the last llava description, set llava_hash_threshold & llava_cache_seconds in developer_custom.json
+        self.llava_response_cache_instance = llava_response_cache(int(self.developer_tools_dict.get('llava_hash_threshold') or 4),
+                                                                  max_age_seconds=float(self.developer_tools_dict.get('llava_cache_seconds') or 60))
+        # with /llava flow the screen is described in the background every llava_sample_seconds, 0 describes it on each prompt instead
+        self.llava_sample_seconds = float(self.developer_tools_dict.get('llava_sample_seconds', 2) or 0)
+        self.llava_vision_sampler_instance = llava_vision_sampler(self.screen_shot_collector_instance, lambda screenshot, screenshot_hash: self.llava_prompt(screenshot, screenshot_hash, None), self.llava_sample_seconds or 2.0)
         self.json_chat_history_instance = json_chat_history(self.developer_tools_dict)
+        self.jsonl_conversation_store_instance = jsonl_conversation_store(self.conversation_library)
+        # full text index of every saved conversation, caught up with the library on a worker thread
+        self.conversation_search_index_instance = conversation_search_index(self.conversation_library)
+        threading.Thread(target=self.conversation_search_index_instance.sync_library, daemon=True).start()
+        self.search_query = None
         self.data_set_video_process_instance = data_set_constructor(self.developer_tools_dict)
         # generate
         self.model_write_class_instance = model_write_class(self.colors, self.developer_tools_dict)
@@ -148,6 +188,7 @@ class ollama_chatbot_base:
         """ a method to call when swapping models
         """
         self.chat_history = []
+        self.conversation_memory_instance.reset()
         self.user_input_model_select = input(self.colors['HEADER']+ "<<< PROVIDE AGENT NAME TO SWAP >>> " + self.colors['OKBLUE'])
         print(f"Model changed to {self.user_input_model_select}")
         return
@@ -205,16 +246,18 @@ class ollama_chatbot_base:
         return sys_prompt_select
     
     # -------------------------------------------------------------------------------------------------   
-    def send_prompt(self, user_input_prompt):
-        """ a method for prompting the model
-            args: user_input_prompt, user_input_model_select, search_google
+    def build_prompt_history(self, user_input_prompt):
+        """ a method for building the chat history sent with the user prompt
+            args: user_input_prompt
             returns: none
         """
-        #TODO ADD IF MEM OFF CLEAR HISTORY
-        self.chat_history = []
-        #TODO ADD screen shot {clock & manager}
-        self.screenshot_path = os.path.join(self.llava_library, "screenshot.png")
-
+        # keep the history up to the token budget, the trimmed turns are summarized
+        if self.memory_flag is True:
+            self.chat_history = self.conversation_memory_instance.fit(self.chat_history, self.user_input_model_select, {"role": "user", "content": user_input_prompt})
+        else:
+            self.chat_history = []
+        # the messages from here on are the turn autosaved after the response
+        self.turn_start_index = len(self.chat_history)
         # start prompt shot if flag is True TODO setup modular custom prompt selection
         self.prompt_shot_flag = False # TODO SETUP FLAG LOGIC
         if self.prompt_shot_flag is True:
@@ -225,20 +268,35 @@ class ollama_chatbot_base:
         self.chat_history.append({"role": "user", "content": user_input_prompt})
 
         # get the llava response and append it to the chat history only if an image is provided
-        if self.llava_flag is True:
-            # load the screenshot and convert it to a base64 string
-            with open(f'{self.screenshot_path}', 'rb') as f:
-                user_screenshot_raw2 = base64.b64encode(f.read()).decode('utf-8')
-                self.user_screenshot_raw = user_screenshot_raw2
+        llava_response = None
+        if self.llava_flag is True and self.llava_vision_sampler_instance.is_running():
+            # the freshest background description, bounded by the observed llava call time so a slow cpu
+            # llava still gives the last scene right away, only a missing or stale one is waited on
+            llava_cycle_seconds = self.llava_vision_sampler_instance.get_cycle_seconds()
+            llava_response = self.llava_vision_sampler_instance.get_latest_description(max_age_seconds=2 * llava_cycle_seconds, wait_seconds=llava_cycle_seconds)
+        elif self.llava_flag is True and self.screen_shot_collector_instance.latest_screenshot is not None:
+            # the screenshot was downscaled & base64 encoded once in memory when it was taken
+            user_screenshot_raw2, screenshot_hash = self.screen_shot_collector_instance.latest_screenshot
+            self.user_screenshot_raw = user_screenshot_raw2
             #TODO manage user_input_prompt for llava model during conversation
-            llava_response = self.llava_prompt(user_screenshot_raw2, user_input_prompt)
+            llava_response = self.llava_prompt(user_screenshot_raw2, screenshot_hash, user_input_prompt)
+        if llava_response is not None:
             print(f"LLAVA SOURCE: {llava_response}")
             # TODO DOES THIS DO ANYTHING? I DONT THINK SO
             self.chat_history.append({"role": "assistant", "content": f"LLAVA_DATA: {llava_response}"})
             self.chat_history.append({"role": "user", "content": "Based on the information in LLAVA_DATA please direct the user immediatedly, prioritize the order in which to inform the player of the identified objects, items, hills, trees and passive and hostile mobs etc. Do not output the dictionary list, instead conversationally express what the player needs to do quickly so that they can ask you more questions."})
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def send_prompt(self, user_input_prompt):
+        """ a method for prompting the model
+            args: user_input_prompt, user_input_model_select, search_google
+            returns: none
+        """
+        self.build_prompt_history(user_input_prompt)
 
         try:
-            response = ollama.chat(model=self.user_input_model_select, messages=(self.chat_history), stream=False )
+            response = self.ollama_client_manager_instance.chat(model=self.user_input_model_select, messages=(self.chat_history), stream=False )
             if isinstance(response, dict) and "message" in response:
                 model_response = response.get("message")
                 self.chat_history.append(model_response)
@@ -247,25 +305,107 @@ class ollama_chatbot_base:
                 return "Error: Response from model is not in the expected format"
         except Exception as e:
             return f"Error: {e}"
-        
+
     # -------------------------------------------------------------------------------------------------   
-    def llava_prompt(self, user_screenshot_raw2, llava_user_input_prompt):
-        """ a method for prompting the model
-            args: user_input_prompt, user_input_model_select, search_google
-            returns: none
+    def send_prompt_stream(self, user_input_prompt):
+        """ a method for prompting the model with a streamed response
+            args: user_input_prompt
+            returns: generator of response tokens
+        """
+        self.build_prompt_history(user_input_prompt)
+
+        response_tokens = []
+        response_stream = None
+        try:
+            response_stream = self.ollama_client_manager_instance.chat(model=self.user_input_model_select, messages=(self.chat_history), stream=True )
+            for chunk in response_stream:
+                # barge-in, stop reading the response
+                if self.interrupt_event.is_set():
+                    break
+                token = chunk["message"]["content"]
+                response_tokens.append(token)
+                yield token
+        except Exception as e:
+            yield f"Error: {e}"
+        finally:
+            # closing the stream drops the request, so ollama stops generating an interrupted response
+            if hasattr(response_stream, "close"):
+                response_stream.close()
+            # an interrupted response is kept as far as it was heard
+            if response_tokens:
+                self.chat_history.append({"role": "assistant", "content": "".join(response_tokens)})
+
+    # -------------------------------------------------------------------------------------------------   
+    async def send_prompt_stream_async(self, user_input_prompt):
+        """ a method for prompting the model with a streamed response on the async client, used by
+        the session engine so no thread is held per response
+            args: user_input_prompt
+            returns: async generator of response tokens
+        """
+        # the llava prompt is still a blocking request
+        await asyncio.to_thread(self.build_prompt_history, user_input_prompt)
+
+        response_tokens = []
+        response_stream = None
+        try:
+            response_stream = await self.ollama_client_manager_instance.async_chat(model=self.user_input_model_select, messages=(self.chat_history), stream=True )
+            async for chunk in response_stream:
+                # barge-in, stop reading the response
+                if self.interrupt_event.is_set():
+                    break
+                token = chunk["message"]["content"]
+                response_tokens.append(token)
+                yield token
+        except Exception as e:
+            yield f"Error: {e}"
+        finally:
+            # closing the stream drops the request, so ollama stops generating an interrupted response
+            if hasattr(response_stream, "aclose"):
+                await response_stream.aclose()
+            # an interrupted response is kept as far as it was heard
+            if response_tokens:
+                self.chat_history.append({"role": "assistant", "content": "".join(response_tokens)})
+
+    # -------------------------------------------------------------------------------------------------   
+    def print_response_stream(self, response_stream):
+        """ a method for printing the streamed response tokens as they pass through
+            args: response_stream
+            returns: generator of response tokens
+        """
+        print(self.colors["RED"] + f"<<< {self.user_input_model_select} >>> ", end="", flush=True)
+        try:
+            for token in response_stream:
+                print(token, end="", flush=True)
+                yield token
+        finally:
+            response_stream.close()
+            print(self.colors["END"])
+
+    # -------------------------------------------------------------------------------------------------   
+    def llava_prompt(self, user_screenshot_raw2, image_hash, llava_user_input_prompt):
+        """ a method for prompting the model, the messages are built per call so the sampler thread &
+        a foreground prompt never share them
+            args: user_screenshot_raw2, image_hash, the hash of that same screenshot, llava_user_input_prompt
+            returns: llava response
         """
         self.llava_user_input_prompt = llava_user_input_prompt
-        self.llava_history = []
-        self.llava_history.append({"role": "system", "content": "You are a minecraft llava image recognizer, search for passive mobs, hostile mobs, trees, hills, blocks, and items, given the provided screenshot please provide a dictionary of the objects recognized paired with key attributed about each object, and only 1 sentence to describe anything else that is not captured by the dictionary, do not use more sentences, only list objects with which you have high confidence of recognizing and for low confidence describe shape and object type more heavily to gage hard recognitions. Objects around the perimeter are usually player held items like swords or food, gui elements like items, health, hunger, breath, or status affects, please differentiate these objects in the list from the 3D landscape objects in the forward facing perspective, the items are held by the player traversing the world and can place and remove blocks. Return dictionary and 1 summary sentence:"})
+        llava_messages = []
+        llava_messages.append({"role": "system", "content": "You are a minecraft llava image recognizer, search for passive mobs, hostile mobs, trees, hills, blocks, and items, given the provided screenshot please provide a dictionary of the objects recognized paired with key attributed about each object, and only 1 sentence to describe anything else that is not captured by the dictionary, do not use more sentences, only list objects with which you have high confidence of recognizing and for low confidence describe shape and object type more heavily to gage hard recognitions. Objects around the perimeter are usually player held items like swords or food, gui elements like items, health, hunger, breath, or status affects, please differentiate these objects in the list from the 3D landscape objects in the forward facing perspective, the items are held by the player traversing the world and can place and remove blocks. Return dictionary and 1 summary sentence:"})
         message = {"role": "user", "content": "given the provided screenshot please provide a dictionary of key value pairs for each object in with image with its relative position, do not use sentences, if you cannot recognize the enemy describe the color and shape as an enemy in the dictionary"}
 
-        image_message = None
+        # the screen has barely changed since a cached description, skip the llava call
+        cached_response = self.llava_response_cache_instance.get(image_hash, "llava", message["content"])
+        if cached_response is not None:
+            return cached_response
+
         if user_screenshot_raw2 is not None:
             # Assuming user_input_image is a base64 encoded image
             message["images"] = [user_screenshot_raw2]
-            image_message = message
+        llava_messages.append(message)
         try:
-            response_llava = ollama.chat(model="llava", messages=(self.llava_history + [image_message]), stream=False )
+            start_time = time.perf_counter()
+            response_llava = self.ollama_client_manager_instance.chat(model="llava", messages=llava_messages, stream=False )
+            llava_seconds = time.perf_counter() - start_time
         except Exception as e:
             return f"Error: {e}"
 
@@ -273,12 +413,7 @@ class ollama_chatbot_base:
             
             # print(f"LAVA_RECOGNITION: {message}")
             model_response = response_llava.get("message")
-            self.llava_history.append({"role": "assistant", "content": model_response["content"]})
-            # print(f"LLAVA HISTORY: {self.llava_history}")
-
-            # Keep only the last 2 responses in llava_history
-            self.llava_history = self.llava_history[-2:]
-
+            self.llava_response_cache_instance.put(image_hash, "llava", message["content"], model_response["content"], llava_seconds)
             return model_response["content"]
         else:
             return "Error: Response from model is not in the expected format"
@@ -302,6 +437,20 @@ class ollama_chatbot_base:
         user_input_prompt = re.sub(r"activate latex on", "/latex on", user_input_prompt, flags=re.IGNORECASE)
         user_input_prompt = re.sub(r"activate latex off", "/latex off", user_input_prompt, flags=re.IGNORECASE)
         user_input_prompt = re.sub(r"activate show model", "/show model", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate stream on", "/stream on", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate stream off", "/stream off", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate memory on", "/memory on", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate memory off", "/memory off", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate memory clear", "/memory clear", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate llava stats", "/llava stats", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate splice stats", "/splice stats", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate search history", "/search history", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate autosave on", "/autosave on", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate autosave off", "/autosave off", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate vad barge on", "/vad barge on", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate vad barge off", "/vad barge off", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate vad on", "/vad on", user_input_prompt, flags=re.IGNORECASE)
+        user_input_prompt = re.sub(r"activate vad off", "/vad off", user_input_prompt, flags=re.IGNORECASE)
 
         # Parse for Token Specific Arg Commands
         # Parse for the name after 'forward slash voice swap'
@@ -322,7 +471,7 @@ class ollama_chatbot_base:
         match = re.search(r"(activate save as|/save as) ([^/.]*)", user_input_prompt, flags=re.IGNORECASE)
         if match:
             self.save_name = match.group(2)
-            self.save_name = self.tts_processor_instance.file_name_conversation_history_filter(self.save_name)
+            self.save_name = re.sub(' ', '_', self.save_name.strip()).lower()
             print(f"save_name string: {self.save_name}")
         else:
             self.save_name = None
@@ -331,11 +480,28 @@ class ollama_chatbot_base:
         match = re.search(r"(activate load as|/load as) ([^/.]*)", user_input_prompt, flags=re.IGNORECASE)
         if match:
             self.load_name = match.group(2)
-            self.load_name = self.tts_processor_instance.file_name_conversation_history_filter(self.load_name)
+            self.load_name = re.sub(' ', '_', self.load_name.strip()).lower()
             print(f"load_name string: {self.load_name}")
         else:
             self.load_name = None
 
+        # Parse for the query after 'forward slash search history'
+        match = re.search(r"(activate search history|/search history) (.*)", user_input_prompt, flags=re.IGNORECASE)
+        if match:
+            self.search_query = match.group(2).strip()
+        else:
+            self.search_query = None
+
+        # Parse for the sentence count after 'forward slash tts lookahead'
+        match = re.search(r"(activate tts lookahead|/tts lookahead) (\d+)", user_input_prompt, flags=re.IGNORECASE)
+        if match:
+            self.tts_lookahead_depth = int(match.group(2))
+
+        # Parse for the process count after 'forward slash tts workers'
+        match = re.search(r"(activate tts workers|/tts workers) (\d+)", user_input_prompt, flags=re.IGNORECASE)
+        if match:
+            self.tts_pool_workers = int(match.group(2))
+
         # Parse for the name after 'forward slash voice swap'
         match = re.search(r"(activate convert tensor|/convert tensor) ([^\s]*)", user_input_prompt, flags=re.IGNORECASE)
         if match:
@@ -353,8 +519,12 @@ class ollama_chatbot_base:
         command_library = {
             "/swap": lambda: self.swap(),
             "/voice swap": lambda: self.voice_swap(),
-            "/save as": lambda: self.json_chat_history_instance.save_to_json(),
-            "/load as": lambda: self.json_chat_history_instance.load_from_json(),
+            "/save as": lambda: self.save_conversation(),
+            "/load as": lambda: self.load_conversation(),
+            "/llava stats": lambda: self.print_llava_stats(),
+            "/search history": lambda: self.conversation_search_index_instance.print_search(self.colors, self.search_query),
+            "/autosave on": lambda: self.autosave(True),
+            "/autosave off": lambda: self.autosave(False),
             "/write modelfile": lambda: self.model_write_class_instance.write_model_file(),
             "/convert tensor": lambda: self.create_convert_manager_instance.safe_tensor_gguf_convert(self.tensor_name),
             "/convert gguf": lambda: self.model_write_class_instance.write_model_file_and_run_agent_create_gguf(self.listen_flag, self.model_git),
@@ -366,19 +536,44 @@ class ollama_chatbot_base:
             "/speech off": lambda: self.speech(True, False),
             "/latex on": lambda: self.latex(True),
             "/latex off": lambda: self.latex(False),
+            "/audio archive on": lambda: self.instance_tts_processor().audio_archive(True),
+            "/audio archive off": lambda: self.instance_tts_processor().audio_archive(False),
+            "/tts lookahead": lambda: self.instance_tts_processor().set_lookahead_depth(self.tts_lookahead_depth),
+            "/tts batch on": lambda: self.instance_tts_processor().tts_batch(True),
+            "/tts batch off": lambda: self.instance_tts_processor().tts_batch(False),
+            "/tts workers": lambda: self.instance_tts_processor().set_pool_workers(self.tts_pool_workers),
+            "/tts stats": lambda: self.instance_tts_processor().print_tts_scheduler_stats(),
+            "/tts status": lambda: self.instance_tts_processor().print_tts_status(),
+            "/vad on": lambda: self.vad(True),
+            "/vad off": lambda: self.vad(False),
+            "/vad barge on": lambda: self.vad_barge_in(True),
+            "/vad barge off": lambda: self.vad_barge_in(False),
+            "/stt google": lambda: self.instance_stt_backend_manager().set_backend("google"),
+            "/stt whisper": lambda: self.instance_stt_backend_manager().set_backend("whisper"),
+            "/stt vosk": lambda: self.instance_stt_backend_manager().set_backend("vosk"),
+            "/stt stats": lambda: self.instance_stt_backend_manager().print_stats(),
+            "/audio stats": lambda: self.print_audio_stats(),
+            "/memory on": lambda: self.memory(True),
+            "/memory off": lambda: self.memory(False),
+            "/memory clear": lambda: self.memory_clear(),
+            "/memory stats": lambda: self.conversation_memory_instance.print_stats(self.colors, self.chat_history, self.user_input_model_select),
+            "/stream on": lambda: self.stream(True),
+            "/stream off": lambda: self.stream(False),
             "/command auto on": lambda: self.auto_commands(True),
             "/command auto off": lambda: self.auto_commands(False),
             "/llava flow": lambda: self.llava_flow(True),
             "/llava freeze": lambda: self.llava_flow(False),
             "/auto on": lambda: self.auto_speech_set(True),
             "/auto off": lambda: self.auto_speech_set(False),
-            "/quit": lambda: self.ollama_command_instance.quit(),
+            "/quit": lambda: self.quit(),
             "/ollama create": lambda: self.ollama_command_instance.ollama_create(),
             "/ollama show": lambda: self.ollama_command_instance.ollama_show_modelfile(),
             "/ollama template": lambda: self.ollama_command_instance.ollama_show_template(),
             "/ollama license": lambda: self.ollama_command_instance.ollama_show_license(),
             "/ollama list": lambda: self.ollama_command_instance.ollama_list(),
+            "/ollama stats": lambda: self.ollama_client_manager_instance.print_stats(self.colors),
             "/splice video": lambda: self.data_set_video_process_instance.generate_image_data(),
+            "/splice stats": lambda: self.data_set_video_process_instance.print_dedup_stats(self.colors),
             "/developer new" : lambda: self.read_write_symbol_collector_instance.developer_tools_generate()
         }
 
@@ -401,42 +596,98 @@ class ollama_chatbot_base:
             return cmd_run_flag
 
     # -------------------------------------------------------------------------------------------------   
-    def get_audio(self):
-        """ a method for getting the user audio from the microphone
+    def get_vad_audio(self):
+        """ a method for waiting on the next utterance endpointed by voice activity, polled so turning
+        listen or vad off stops the wait
+            args: none
+            returns: audio, utterance_id, or None, None when listen or vad was turned off
+        """
+        audio_capture = self.instance_audio_capture()
+        print(">>LISTENING<<")
+        utterance = None
+        while utterance is None:
+            if self.listen_flag is False or self.vad_flag is False:
+                return None, None
+            utterance = audio_capture.get_utterance(timeout=0.25)
+        utterance_id, pcm_bytes = utterance
+        print(">>AUDIO RECEIVED<<")
+        return sr.AudioData(pcm_bytes, audio_capture.sample_rate, 2), utterance_id
+
+    # -------------------------------------------------------------------------------------------------   
+    def instance_audio_capture(self):
+        """ a method for getting the microphone capture, the input stream stays open once started
             args: none
+            returns: audio_capture_instance
         """
-        print(">>AUDIO RECORDING<<")
-        p = pyaudio.PyAudio()
-        stream = p.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=1024)
-        frames = []
+        if self.audio_capture_instance is None:
+            stt_backend_manager_instance = self.instance_stt_backend_manager()
+            self.audio_capture_instance = audio_capture_class(self.colors, self.audio_device_manager_instance, on_speech_start=self.on_speech_start,
+                                                              on_speech_frames=stt_backend_manager_instance.speech_frames,
+                                                              on_speech_end=stt_backend_manager_instance.speech_end)
+            self.audio_capture_instance.set_listening(self.listen_flag)
+            self.audio_capture_instance.start()
+        return self.audio_capture_instance
 
-        while self.auto_speech_flag and not self.chunk_flag:
-            data = stream.read(1024)
-            frames.append(data)
+    # -------------------------------------------------------------------------------------------------   
+    def instance_stt_backend_manager(self):
+        """ a method for getting the speech recognition backend manager
+            args: none
+            returns: stt_backend_manager_instance
+        """
+        if self.stt_backend_manager_instance is None:
+            self.stt_backend_manager_instance = stt_backend_manager(self.colors, self.developer_tools_dict)
+        return self.stt_backend_manager_instance
 
-        print(">>AUDIO RECEIVED<<")
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-        # Convert the audio data to an AudioData object
-        audio = sr.AudioData(b''.join(frames), 16000, 2)
-        self.chunk_flag = False  # Set chunk_flag to False here to indicate that the audio has been received
-        return audio
+    # -------------------------------------------------------------------------------------------------   
+    def print_audio_stats(self):
+        """ a method for printing the audio device open times & capture start latency
+            args: none
+            returns: none
+        """
+        self.audio_device_manager_instance.print_stats()
+        if self.audio_capture_instance is not None:
+            for key, value in self.audio_capture_instance.get_stats().items():
+                if isinstance(value, float):
+                    value = f"{value:.3f}"
+                print(self.colors['OKCYAN'] + f"{key}: " + self.colors['OKBLUE'] + f"{value}" + self.colors['END'])
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def quit(self):
+        """ a method for closing the audio devices before quitting
+            args: none
+            returns: none
+        """
+        if self.audio_device_manager_instance is not None:
+            self.audio_device_manager_instance.close()
+        self.llava_vision_sampler_instance.stop()
+        self.jsonl_conversation_store_instance.close()
+        self.conversation_search_index_instance.close()
+        self.ollama_command_instance.quit()
+
+    # -------------------------------------------------------------------------------------------------   
+    def on_speech_start(self):
+        """ a method called by the voice activity endpointing when the user starts talking
+            args: none
+            returns: none
+        """
+        tts_processor_instance = getattr(self, 'tts_processor_instance', None)
+        if self.vad_barge_in_flag is True and tts_processor_instance is not None and tts_processor_instance.is_speaking():
+            self.interrupt()
     
     # -------------------------------------------------------------------------------------------------   
-    def recognize_speech(self, audio):
+    def recognize_speech(self, audio, utterance_id=None):
         """ a method for calling the speech recognizer
-            args: audio
+            args: audio, utterance_id, of a voice activity utterance recognized while it was spoken
             returns: speech_str
         """
-        speech_str = sr.Recognizer().recognize_google(audio)
+        speech_str = self.instance_stt_backend_manager().recognize(audio.get_raw_data(), audio.sample_rate, utterance_id)
         print(f">>{speech_str}<<")
         return speech_str
     
     # -------------------------------------------------------------------------------------------------
     def chatbot_main(self):
-        """ a method for managing the current chatbot instance loop 
+        """ a method for running the current chatbot instance session
             args: None
             returns: None
         """
@@ -444,70 +695,15 @@ class ollama_chatbot_base:
         self.latex_render_instance = None
         self.tts_processor_instance = None
 
-        print(self.colors["OKCYAN"] + "Press space bar to record audio:" + self.colors["OKCYAN"])
-        print(self.colors["GREEN"] + f"<<< USER >>> " + self.colors["END"])
-
-        keyboard.add_hotkey('ctrl+w', self.auto_speech_set, args=(True,))
-        keyboard.add_hotkey('ctrl+s', self.chunk_speech, args=(True,))
+        # warm up the tts model on a worker thread while the user types
+        if self.tts_preload_flag is True:
+            self.tts_processor_instance = self.instance_tts_processor()
 
-        while True:
-            user_input_prompt = ""
-            speech_done = False
-            cmd_run_flag = False
+        print(self.colors["OKCYAN"] + "Press space bar to record audio:" + self.colors["OKCYAN"])
 
-            if self.listen_flag | self.auto_speech_flag is True:
-                self.tts_processor_instance = self.instance_tts_processor()
-                while self.auto_speech_flag is True:  # user holds down the space bar
-                    try:
-                        # Record audio from microphone
-                        audio = self.get_audio()
-                        if self.listen_flag is True:
-                            # Recognize speech to text from audio
-                            user_input_prompt = self.recognize_speech(audio)
-                            print(f">>SPEECH RECOGNIZED<< >> {user_input_prompt} <<")
-                            speech_done = True
-                            self.chunk_flag = False
-                            print(f"CHUNK FLAG STATE: {self.chunk_flag}")
-                            self.auto_speech_flag = False
-                    except sr.UnknownValueError:
-                        print(self.colors["OKCYAN"] + "Google Speech Recognition could not understand audio" + self.colors["OKCYAN"])
-                    except sr.RequestError as e:
-                        print(self.colors["OKCYAN"] + "Could not request results from Google Speech Recognition service; {0}".format(e) + self.colors["OKCYAN"])
-            elif self.listen_flag is False:
-                print(self.colors["OKCYAN"] + "Please type your selected prompt:" + self.colors["OKCYAN"])
-                user_input_prompt = input(self.colors["GREEN"] + f"<<< USER >>> " + self.colors["END"])
-                speech_done = True
-            user_input_prompt = self.voice_command_select_filter(user_input_prompt)
-            cmd_run_flag = self.command_select(user_input_prompt)
-            # get screenshot
-            if self.llava_flag is True:
-                self.screen_shot_flag = self.screen_shot_collector_instance.get_screenshot()
-            # splice videos
-            if self.splice_flag == True:
-                self.data_set_video_process_instance.generate_image_data()
-            if cmd_run_flag == False and speech_done == True:
-                print(self.colors["YELLOW"] + f"{user_input_prompt}" + self.colors["OKCYAN"])
-                # Send the prompt to the assistant
-                if self.screen_shot_flag is True:
-                    response = self.send_prompt(user_input_prompt)
-                    self.screen_shot_flag = False
-                else:
-                    response = self.send_prompt(user_input_prompt)
-                print(self.colors["RED"] + f"<<< {self.user_input_model_select} >>> " + self.colors["RED"] + f"{response}" + self.colors["RED"])
-                # Check for latex and add to queue
-                if self.latex_flag:
-                    # Create a new instance
-                    latex_render_instance = latex_render_class()
-                    latex_render_instance.add_latex_code(response, self.user_input_model_select)
-                # Preprocess for text to speech, add flag for if text to speech enable handle canche otherwise do /leap or smt
-                # Clear speech cache and split the response into sentences for next TTS cache
-                if self.leap_flag is not None and isinstance(self.leap_flag, bool):
-                    if self.leap_flag != True:
-                        self.tts_processor_instance.process_tts_responses(response, self.voice_name)
-                elif self.leap_flag is None:
-                    pass
-                # Start the mainloop in the main thread
-                print(self.colors["GREEN"] + f"<<< USER >>> " + self.colors["END"])
+        # capture, recognition, llm, tts & playback run as concurrent stages until /quit
+        self.session_engine_instance = chatbot_session_engine(self)
+        self.session_engine_instance.run()
 
     # -------------------------------------------------------------------------------------------------   
     def chunk_speech(self, value):
@@ -523,10 +719,52 @@ class ollama_chatbot_base:
 
     # -------------------------------------------------------------------------------------------------
     def instance_tts_processor(self):
+        """ a method for getting the tts processor, the xtts model is built on a worker thread
+        so this returns right away and the first speech generation waits for the model
+            args: none
+            returns: tts_processor_instance
+        """
         if not hasattr(self, 'tts_processor_instance') or self.tts_processor_instance is None:
             self.tts_processor_instance = tts_processor_class(self.colors, self.developer_tools_dict)
+            self.tts_processor_instance.audio_device_manager_instance = self.audio_device_manager_instance
         return self.tts_processor_instance
     
+    # -------------------------------------------------------------------------------------------------   
+    def interrupt(self):
+        """ a method for barging in on the model mid response, the streamed response is closed and
+        the speech stops, called from the ctrl+x hotkey or voice activity
+            args: none
+            returns: none
+        """
+        self.interrupt_event.set()
+        if getattr(self, 'tts_processor_instance', None) is not None:
+            self.tts_processor_instance.interrupt()
+        print(self.colors["OKCYAN"] + "<<< INTERRUPTED >>>" + self.colors["END"])
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def vad(self, flag):
+        """ a method for changing the voice activity flag, with listen on each utterance is recognized
+        as soon as the user stops talking instead of waiting for ctrl+s
+            args: flag
+            returns: none
+        """
+        self.vad_flag = flag
+        self.instance_audio_capture().set_vad(flag)
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def vad_barge_in(self, flag):
+        """ a method for changing the barge-in flag, talking over the agent interrupts its speech
+            args: flag
+            returns: none
+        """
+        self.vad_barge_in_flag = flag
+        if flag is True and self.vad_flag is False:
+            self.vad(True)
+        print(f"vad_barge_in_flag FLAG STATE: {self.vad_barge_in_flag}")
+        return
+
     # -------------------------------------------------------------------------------------------------   
     def leap(self, flag):
         """ a method for changing the leap flag 
@@ -548,7 +786,7 @@ class ollama_chatbot_base:
         if flag2 == True:
             self.tts_processor_instance = self.instance_tts_processor()
         self.leap_flag = flag1
-        self.listen_flag = flag2
+        self.set_listen_flag(flag2)
         print(f"listen_flag FLAG STATE: {self.listen_flag}")
         print(f"leap_flag FLAG STATE: {self.leap_flag}")
         return
@@ -562,6 +800,112 @@ class ollama_chatbot_base:
         print(f"latex_flag FLAG STATE: {self.latex_flag}")        
         return
     
+    # -------------------------------------------------------------------------------------------------   
+    def memory(self, flag):
+        """ a method for changing the memory flag, with memory off every prompt starts a new conversation
+            args: flag
+            returns: none
+        """
+        self.memory_flag = flag
+        print(f"memory_flag FLAG STATE: {self.memory_flag}")
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def memory_clear(self):
+        """ a method for forgetting the conversation so far
+            args: none
+            returns: none
+        """
+        self.chat_history = []
+        self.conversation_memory_instance.reset()
+        # a later /load as starts from the cleared conversation
+        if self.autosave_flag is True:
+            try:
+                self.jsonl_conversation_store_instance.reset(self.user_input_model_select, self.conversation_name)
+            except Exception as e:
+                print(f"Failed to clear the conversation log {self.conversation_name}. Reason: {e}")
+        print(self.colors["OKCYAN"] + "<<< MEMORY CLEARED >>>" + self.colors["END"])
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def autosave(self, flag):
+        """ a method for changing the autosave flag, with autosave on every turn is appended to the conversation log
+            args: flag
+            returns: none
+        """
+        self.autosave_flag = flag
+        print(f"autosave_flag FLAG STATE: {self.autosave_flag}")
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def autosave_turn(self):
+        """ a method for appending the messages of the last turn to the conversation log, called after
+        each response
+            args: none
+            returns: none
+        """
+        turn_start_index = self.turn_start_index
+        self.turn_start_index = None
+        if self.autosave_flag is False or turn_start_index is None:
+            return
+        try:
+            self.jsonl_conversation_store_instance.append(self.user_input_model_select, self.conversation_name, self.chat_history[turn_start_index:])
+            self.conversation_search_index_instance.sync_conversation(self.user_input_model_select, self.conversation_name)
+        except Exception as e:
+            print(f"Failed to autosave the conversation {self.conversation_name}. Reason: {e}")
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def save_conversation(self):
+        """ a method for saving the conversation as save_name, the following turns are autosaved to it
+            args: none
+            returns: none
+        """
+        if not self.save_name:
+            print("Invalid choice. Please provide a conversation name.")
+            return
+        try:
+            self.jsonl_conversation_store_instance.reset(self.user_input_model_select, self.save_name, self.chat_history)
+            self.conversation_search_index_instance.sync_conversation(self.user_input_model_select, self.save_name)
+            self.conversation_name = self.save_name
+            print(self.colors["OKCYAN"] + f"<<< CONVERSATION SAVED AS {self.save_name} >>>" + self.colors["END"])
+        except Exception as e:
+            print(f"Failed to save the conversation {self.save_name}. Reason: {e}")
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def load_conversation(self):
+        """ a method for loading the last conversation_load_turns turns of load_name, conversations saved
+        before the jsonl logs are read from their json file
+            args: none
+            returns: none
+        """
+        if not self.load_name:
+            print("Invalid choice. Please provide a conversation name.")
+            return
+        try:
+            chat_history = self.jsonl_conversation_store_instance.tail(self.user_input_model_select, self.load_name, self.conversation_load_turns)
+            if chat_history is None:
+                chat_history = self.json_chat_history_instance.load_from_json(self.load_name, self.user_input_model_select)
+        except Exception as e:
+            print(f"Failed to load the conversation {self.load_name}. Reason: {e}")
+            return
+        self.chat_history = chat_history
+        self.conversation_memory_instance.reset()
+        self.conversation_name = self.load_name
+        print(self.colors["OKCYAN"] + f"<<< CONVERSATION LOADED FROM {self.load_name}, {len(self.chat_history)} MESSAGES >>>" + self.colors["END"])
+        return
+
+    # -------------------------------------------------------------------------------------------------   
+    def stream(self, flag):
+        """ a method for changing the response stream flag, speaking each sentence as it is generated
+            args: flag
+            returns: none
+        """
+        self.stream_flag = flag
+        print(f"stream_flag FLAG STATE: {self.stream_flag}")
+        return
+    
     # -------------------------------------------------------------------------------------------------   
     def llava_flow(self, flag):
         """ a method for changing the llava image recognition flag 
@@ -569,8 +913,22 @@ class ollama_chatbot_base:
             returns: none
         """
         self.llava_flag = flag
+        if flag is True and self.llava_sample_seconds > 0:
+            self.llava_vision_sampler_instance.start()
+        else:
+            self.llava_vision_sampler_instance.stop()
         print(f"llava_flag FLAG STATE: {self.llava_flag}")
         return
+
+    # -------------------------------------------------------------------------------------------------   
+    def print_llava_stats(self):
+        """ a method for printing the llava response cache & background sampler counters
+            args: none
+            returns: none
+        """
+        self.llava_response_cache_instance.print_stats(self.colors)
+        self.llava_vision_sampler_instance.print_stats(self.colors)
+        return
     
     # -------------------------------------------------------------------------------------------------   
     def voice_swap(self):
@@ -579,6 +937,8 @@ class ollama_chatbot_base:
             returns: none
         """
         # Search for the name after 'forward slash voice swap'
+        if self.tts_processor_instance is not None:
+            threading.Thread(target=self.tts_processor_instance.load_voice, args=(self.voice_name,), daemon=True).start()
         print(f"Agent voice swapped to {self.voice_name}")
         print(self.colors['GREEN'] + f"<<< USER >>> " + self.colors['OKGREEN'])
         return
@@ -589,10 +949,23 @@ class ollama_chatbot_base:
             args: flag
             return: none
         """
-        self.listen_flag = flag
+        self.set_listen_flag(flag)
         print(f"listen_flag FLAG STATE: {self.listen_flag}")
         return
 
+    # -------------------------------------------------------------------------------------------------   
+    def set_listen_flag(self, flag):
+        """ a method for setting the listen flag on the microphone capture, the utterances & stream
+        results left from before listening started are dropped
+            args: flag
+            returns: none
+        """
+        self.listen_flag = flag
+        if self.audio_capture_instance is not None:
+            self.audio_capture_instance.set_listening(flag)
+        if flag is True and self.stt_backend_manager_instance is not None:
+            self.stt_backend_manager_instance.clear_results()
+
     # -------------------------------------------------------------------------------------------------   
     def auto_commands(self, flag):
         """ a method for auto_command flag 